@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/6.0/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -45,11 +46,12 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     # 'corsheaders.middleware.CorsMiddleware',  # Add CORS middleware
     'django.middleware.security.SecurityMiddleware',
+    'core.middleware.QueryBudgetMiddleware',  # Per-request query/template budgets, see core/profiling.py
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
-    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.middleware.CachedAuthenticationMiddleware',  # AuthenticationMiddleware with a short-lived user cache
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
@@ -57,7 +59,7 @@ ROOT_URLCONF = 'ExamSystem.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'core.template_backends.TimedDjangoTemplates',  # DjangoTemplates with render timing
         'DIRS': [BASE_DIR / 'templates'],  # Add templates directory
         'APP_DIRS': True,
         'OPTIONS': {
@@ -83,6 +85,39 @@ DATABASES = {
         'NAME': BASE_DIR / 'db.sqlite3',
     }
 }
+
+# High-concurrency SQLite mode (opt-in, see README.md): set EXAM_SQLITE_HIGH_CONCURRENCY=1.
+# WAL lets readers run alongside the single writer, busy_timeout makes writers queue instead of
+# failing with "database is locked", and IMMEDIATE transactions take the write lock up front so
+# short write transactions (e.g. exam submission) never deadlock while upgrading a read lock.
+SQLITE_HIGH_CONCURRENCY = os.environ.get('EXAM_SQLITE_HIGH_CONCURRENCY') == '1'
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',  # Safe with WAL; only the last commits may be lost on power failure
+    'busy_timeout': 20000,  # Milliseconds
+    'mmap_size': 268435456,  # 256 MB
+}
+if SQLITE_HIGH_CONCURRENCY:
+    DATABASES['default']['CONN_MAX_AGE'] = 600  # Persistent connections
+    DATABASES['default']['CONN_HEALTH_CHECKS'] = True
+    DATABASES['default']['OPTIONS'] = {
+        'timeout': 20,
+        'transaction_mode': 'IMMEDIATE',
+    }
+
+# Read replica for reporting views (opt-in): set EXAM_REPLICA_DB to the replica's SQLite file
+# and keep it in sync with `python manage.py sync_replica --interval 60`.
+# Views decorated with @use_replica read from it while it is at most REPLICA_MAX_LAG_SECONDS old.
+REPLICA_DATABASE_ALIAS = 'replica'
+REPLICA_MAX_LAG_SECONDS = 300
+if os.environ.get('EXAM_REPLICA_DB'):
+    DATABASES[REPLICA_DATABASE_ALIAS] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.environ['EXAM_REPLICA_DB'],
+        'TEST': {'MIRROR': 'default'},
+    }
+DATABASE_ROUTERS = ['core.routers.ReplicaRouter']
+
 # settings.py faylida DATABASES qismi
 # DATABASES = {
 #     'default': {
@@ -120,6 +155,20 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# The first hasher is used for staff accounts. Student accounts are hashed with STUDENT_PASSWORD_HASHER,
+# and a login with a hash from another policy is transparently re-hashed (see core/hashers.py).
+# Set STUDENT_PASSWORD_HASHER = 'default' to give students the full work factor as well.
+PASSWORD_HASHERS = [
+    'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+    'core.hashers.StudentPBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+]
+STUDENT_PASSWORD_HASHER = 'pbkdf2_sha256_student'
+STUDENT_PASSWORD_ITERATIONS = 100000
+
 
 # Internationalization
 # https://docs.djangoproject.com/en/6.0/topics/i18n/
@@ -164,3 +213,83 @@ CORS_ALLOWED_ORIGINS = [
 SESSION_COOKIE_AGE = 3600  # 1 hour
 SESSION_SAVE_EVERY_REQUEST = True
 SESSION_EXPIRE_AT_BROWSER_CLOSE = True
+
+# Coalesced sessions (opt-in, see README.md): set EXAM_COALESCED_SESSIONS=1.
+# Sessions are served from the 'sessions' cache; a request that only slides the expiry writes
+# the database row at most once per SESSION_DB_WRITE_INTERVAL seconds.
+# With several worker processes, point EXAM_SESSION_CACHE_URL at a shared Redis instance.
+SESSION_DB_WRITE_INTERVAL = 60
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'sessions': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'exam-sessions',
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+}
+if os.environ.get('EXAM_SESSION_CACHE_URL'):
+    CACHES['sessions'] = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ['EXAM_SESSION_CACHE_URL'],
+    }
+if os.environ.get('EXAM_COALESCED_SESSIONS') == '1':
+    SESSION_ENGINE = 'core.sessions'
+    SESSION_CACHE_ALIAS = 'sessions'
+
+# Seconds CachedAuthenticationMiddleware may serve request.user (every column but the passwords) from the
+# cache instead of the database. Saving or deleting a user invalidates it at once in this process;
+# other processes see the change within the TTL unless AUTH_USER_CACHE_ALIAS is a shared cache.
+# Set to 0 to load the user on every request.
+AUTH_USER_CACHE_TTL = 30
+AUTH_USER_CACHE_ALIAS = 'default'
+
+# Number of published test snapshots each worker keeps in memory
+TEST_SNAPSHOT_CACHE_SIZE = 128
+
+# Exam admission control (see core/admission.py): per test, up to ADMISSION_BURST students start at once,
+# then ADMISSION_RATE per second; the rest wait in a FIFO queue. Set either to 0 to disable.
+# With several worker processes, point ADMISSION_CACHE_ALIAS at a shared cache so they share one queue.
+ADMISSION_RATE = 20
+ADMISSION_BURST = 20
+ADMISSION_CACHE_ALIAS = 'default'
+ADMISSION_STATE_TTL = 6 * 3600  # Seconds the queue state of an idle test is kept
+
+# Completed results older than this are moved to the archive table by `manage.py archive_results`
+RESULT_ARCHIVE_AFTER_DAYS = 730
+
+# Request budgets checked by QueryBudgetMiddleware. Views can override these in QUERY_BUDGETS in core/urls.py;
+# None means unlimited. Requests over budget are logged to 'core.slow_requests'; in strict mode
+# (EXAM_QUERY_BUDGET_STRICT=1, or override_settings in tests) they raise QueryBudgetExceeded.
+QUERY_BUDGET_DEFAULTS = {
+    'queries': 30,
+    'db_ms': 500,
+    'template_ms': 500,
+    'response_bytes': None,
+}
+QUERY_BUDGET_STRICT = os.environ.get('EXAM_QUERY_BUDGET_STRICT') == '1'
+
+# Worker cold-start budget checked by `manage.py startup_profile`: seconds to load the WSGI application and
+# URLconf in a fresh interpreter, and its peak RSS in MB. None means unlimited.
+STARTUP_BUDGET = {
+    'seconds': 0.6,
+    'rss_mb': 64,
+}
+
+# Exam metrics (core/metrics.py), served to Admins at /metrics/ in the Prometheus text format.
+# With several worker processes set EXAM_METRICS_DIR to a local directory (emptied before the server starts):
+# each worker writes its values there every METRICS_FLUSH_INTERVAL seconds and /metrics/ adds them up.
+METRICS_DIR = os.environ.get('EXAM_METRICS_DIR') or None
+METRICS_FLUSH_INTERVAL = 1.0
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'core.slow_requests': {'handlers': ['console'], 'level': 'WARNING', 'propagate': False},
+    },
+}
@@ -14,3 +14,9 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ExamSystem.settings')
 
 application = get_wsgi_application()
+
+# Pre-exam warm-up (see core/warmup.py): set EXAM_WARMUP=1 so every worker pays its start-up
+# costs when it boots, not on the first logins of an exam
+if os.environ.get('EXAM_WARMUP') == '1':
+    from core.warmup import warm_up
+    warm_up()
@@ -1,8 +1,69 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
-from .models import CustomUser, Subject, Test, Question, Answer, StudentResult
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+from .models import CustomUser, StudentGroup, Course, Direction, Subject, Test, TestAssignment, TestEligibility, Question, Answer, StudentResult, ArchivedStudentResult, RegradeAudit
+from .question_search import matching_question_ids
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator that uses the database's row estimate for unfiltered changelists on large tables
+    instead of running an exact COUNT(*). Filtered changelists still get an exact count.
+    """
+    # Below this many rows an exact count is cheap enough and always correct
+    exact_count_threshold = 10000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimate = self._estimated_count(queryset)
+            if estimate is not None and estimate > self.exact_count_threshold:
+                return estimate
+        return super().count
+
+    def _estimated_count(self, queryset):
+        connection = connections[queryset.db]
+        table = queryset.model._meta.db_table
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE relname = %s', [table])
+            elif connection.vendor == 'mysql':
+                cursor.execute(
+                    'SELECT table_rows FROM information_schema.tables WHERE table_schema = DATABASE() AND table_name = %s',
+                    [table],
+                )
+            elif connection.vendor == 'sqlite':
+                # Only available once ANALYZE has been run
+                cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sqlite_stat1'")
+                if cursor.fetchone() is None:
+                    return None
+                cursor.execute('SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1', [table])
+            else:
+                return None
+            row = cursor.fetchone()
+        if not row or row[0] is None:
+            return None
+        try:
+            return int(str(row[0]).split()[0])
+        except ValueError:
+            return None
+
+
+class ScalableModelAdmin(admin.ModelAdmin):
+    """
+    Defaults for changelists over large tables: estimated counts and no second full count.
+    """
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
 
 class CustomUserAdmin(UserAdmin):
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     # Add 'role' to the standard fieldsets
     fieldsets = UserAdmin.fieldsets + (
         ('Role Info', {'fields': ('role',)}),
@@ -16,44 +77,117 @@ class CustomUserAdmin(UserAdmin):
     # Add 'role' to the filters
     list_filter = UserAdmin.list_filter + ('role',)
 
-class SubjectAdmin(admin.ModelAdmin):
+
+class CohortAdmin(admin.ModelAdmin):
+    list_display = ('name',)
+    search_fields = ('^name',)
+
+
+class SubjectAdmin(ScalableModelAdmin):
     list_display = ('name', 'created_by', 'created_at')
-    list_filter = ('created_at', 'created_by')
+    list_filter = ('created_at',)
+    list_select_related = ('created_by',)
+    autocomplete_fields = ('created_by',)
     search_fields = ('name', 'description')
     readonly_fields = ('created_at',)
 
 
-class TestAdmin(admin.ModelAdmin):
+class TestAdmin(ScalableModelAdmin):
     list_display = ('test_name', 'subject', 'created_by', 'status', 'total_time_minutes', 'created_at')
-    list_filter = ('status', 'subject', 'created_by', 'created_at')
+    list_filter = ('status', 'created_at')
+    list_select_related = ('subject', 'created_by')
+    autocomplete_fields = ('subject', 'created_by')
     search_fields = ('test_name', 'subject__name')
     readonly_fields = ('created_at', 'updated_at')
 
 
-class QuestionAdmin(admin.ModelAdmin):
+class QuestionAdmin(ScalableModelAdmin):
     list_display = ('question_text', 'test', 'question_type', 'points_value', 'created_at')
-    list_filter = ('question_type', 'test', 'created_at')
+    list_filter = ('question_type', 'created_at')
+    list_select_related = ('test',)
+    autocomplete_fields = ('test',)
+    # Substring search; get_search_results() answers question text from the full-text index when it exists
     search_fields = ('question_text', 'test__test_name')
     readonly_fields = ('created_at',)
 
+    def get_search_results(self, request, queryset, search_term):
+        # Question and answer text through the full-text index instead of LIKE scans
+        matching_ids = matching_question_ids(search_term)
+        if matching_ids is None:
+            return super().get_search_results(request, queryset, search_term)
+        return queryset.filter(Q(id__in=matching_ids) | Q(test__test_name__icontains=search_term.strip())), False
 
-class AnswerAdmin(admin.ModelAdmin):
+
+class AnswerAdmin(ScalableModelAdmin):
     list_display = ('answer_text', 'question', 'is_correct', 'created_at')
-    list_filter = ('is_correct', 'question', 'created_at')
+    list_filter = ('is_correct', 'created_at')
+    list_select_related = ('question',)
+    raw_id_fields = ('question',)
     search_fields = ('answer_text', 'question__question_text')
     readonly_fields = ('created_at',)
 
 
-class StudentResultAdmin(admin.ModelAdmin):
-    list_display = ('student', 'test', 'score_achieved', 'total_score', 'time_taken', 'completion_date')
-    list_filter = ('completion_date', 'student', 'test')
+class StudentResultAdmin(ScalableModelAdmin):
+    list_display = ('student', 'test', 'score_achieved', 'total_score', 'time_taken', 'completion_date', 'status')
+    list_filter = ('status', 'completion_date')
+    list_select_related = ('student', 'test')
+    autocomplete_fields = ('student', 'test')
     search_fields = ('student__username', 'test__test_name')
     readonly_fields = ('completion_date',)
 
 
+class ArchivedStudentResultAdmin(ScalableModelAdmin):
+    list_display = ('student', 'test', 'score_achieved', 'total_score', 'completion_date', 'archived_at')
+    list_filter = ('completion_date',)
+    list_select_related = ('student', 'test')
+    autocomplete_fields = ('student', 'test')
+    search_fields = ('student__username', 'test__test_name')
+    readonly_fields = ('archived_at',)
+
+
+
+class TestAssignmentAdmin(ScalableModelAdmin):
+    list_display = ('test', 'student_group', 'course', 'direction', 'student', 'created_at')
+    list_select_related = ('test', 'student_group', 'course', 'direction', 'student')
+    autocomplete_fields = ('test', 'student')
+    raw_id_fields = ('student_group', 'course', 'direction')
+    search_fields = ('test__test_name',)
+    readonly_fields = ('created_at',)
+
+
+class TestEligibilityAdmin(ScalableModelAdmin):
+    """Read-only: rows are maintained by core/eligibility.py."""
+    list_display = ('student', 'test', 'can_start')
+    list_filter = ('can_start',)
+    list_select_related = ('student', 'test')
+    search_fields = ('student__username', 'test__test_name')
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+class RegradeAuditAdmin(ScalableModelAdmin):
+    list_display = ('test', 'performed_by', 'attempts_checked', 'attempts_changed', 'attempts_skipped', 'created_at')
+    list_filter = ('created_at',)
+    list_select_related = ('test', 'performed_by')
+    raw_id_fields = ('test', 'performed_by')
+    search_fields = ('test__test_name',)
+    readonly_fields = ('created_at',)
+
+
 admin.site.register(CustomUser, CustomUserAdmin)
+admin.site.register(StudentGroup, CohortAdmin)
+admin.site.register(Course, CohortAdmin)
+admin.site.register(Direction, CohortAdmin)
 admin.site.register(Subject, SubjectAdmin)
 admin.site.register(Test, TestAdmin)
+admin.site.register(TestAssignment, TestAssignmentAdmin)
+admin.site.register(TestEligibility, TestEligibilityAdmin)
 admin.site.register(Question, QuestionAdmin)
 admin.site.register(Answer, AnswerAdmin)
 admin.site.register(StudentResult, StudentResultAdmin)
+admin.site.register(ArchivedStudentResult, ArchivedStudentResultAdmin)
+admin.site.register(RegradeAudit, RegradeAuditAdmin)
@@ -0,0 +1,122 @@
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+# Ticket numbers a student holds, per test id, for the life of their session
+ADMISSION_SESSION_KEY = '_admission_tickets'
+
+
+class AdmissionController:
+    """
+    Per-test admission control for take_test_view: a token bucket of ADMISSION_BURST tokens refilled at
+    ADMISSION_RATE per second, in front of a FIFO queue of numbered tickets.
+    Each arriving student takes the next ticket; tickets are admitted in order, one per token.
+
+    State lives in the ADMISSION_CACHE_ALIAS cache, so all workers share one queue when that cache is shared.
+    It is two cache entries updated with atomic operations only: the ticket counter (cache.add/incr) and the
+    bucket's epoch. Ticket n is admitted once burst + rate * (now - epoch) >= n, so admissions are derived from
+    the clock rather than stored, and reading positions or counters writes nothing.
+    """
+
+    def __init__(self, test_id, rate=None, burst=None, clock=time.time):
+        self.test_id = test_id
+        self.rate = settings.ADMISSION_RATE if rate is None else rate
+        self.burst = settings.ADMISSION_BURST if burst is None else burst
+        self.clock = clock
+        self._cache = caches[getattr(settings, 'ADMISSION_CACHE_ALIAS', 'default')]
+
+    @property
+    def enabled(self):
+        return bool(self.rate and self.burst)
+
+    @property
+    def _issued_key(self):
+        return f'core.admission:{self.test_id}:issued'
+
+    @property
+    def _epoch_key(self):
+        return f'core.admission:{self.test_id}:epoch'
+
+    def _admitted(self, issued, epoch, now):
+        return min(issued, self.burst + int((now - epoch) * self.rate))
+
+    def take_ticket(self):
+        ttl = settings.ADMISSION_STATE_TTL
+        now = self.clock()
+        if not self._cache.add(self._epoch_key, now, ttl):
+            issued, epoch = self._cache.get(self._issued_key) or 0, self._cache.get(self._epoch_key, now)
+            if self.burst + (now - epoch) * self.rate > issued + self.burst:
+                # The bucket refilled past full while idle: move the epoch up so it holds `burst` tokens again.
+                # Every ticket issued so far stays admitted; a concurrent move can only grant a little extra.
+                self._cache.set(self._epoch_key, now - (issued + 0.5) / self.rate, ttl)
+        self._cache.add(self._issued_key, 0, ttl)
+        try:
+            ticket = self._cache.incr(self._issued_key)
+        except ValueError:
+            # The counter expired between add() and incr()
+            self._cache.add(self._issued_key, 0, ttl)
+            ticket = self._cache.incr(self._issued_key)
+        self._cache.touch(self._epoch_key, ttl)
+        self._cache.touch(self._issued_key, ttl)
+        return ticket
+
+    def _read(self):
+        """(issued, admitted), or None when no student has queued since the state was last reset."""
+        state = self._cache.get_many([self._issued_key, self._epoch_key])
+        if len(state) < 2:
+            return None
+        issued = state[self._issued_key]
+        return issued, self._admitted(issued, state[self._epoch_key], self.clock())
+
+    def position(self, ticket):
+        """
+        How many tickets are admitted before `ticket`: 0 once it is admitted, None if the queue was reset.
+        """
+        state = self._read()
+        if state is None or ticket > state[0]:
+            return None
+        return max(0, ticket - state[1])
+
+    def peek(self):
+        """
+        {'admitted': n, 'queued': n} as of now, or None when no student has queued since the state was last
+        reset. One cache read: it neither refills the bucket nor admits anyone, so scrapes can call it freely.
+        """
+        state = self._read()
+        if state is None:
+            return None
+        issued, admitted = state
+        return {'admitted': admitted, 'queued': issued - admitted}
+
+    def has_state(self):
+        """Whether any student has queued for this test since its state was last reset."""
+        return self._read() is not None
+
+    def counters(self):
+        return self.peek() or {'admitted': 0, 'queued': 0}
+
+
+def has_ticket(request, test_id):
+    """Whether the requesting student already holds an admission ticket for `test_id`."""
+    return str(test_id) in request.session.get(ADMISSION_SESSION_KEY, {})
+
+
+def admit_student(request, test_id, controller=None):
+    """
+    Queue the requesting student for `test_id`, keeping their ticket in the session.
+    Returns (admitted, position); admitted students keep their place for the rest of the session.
+    """
+    controller = controller or AdmissionController(test_id)
+    if not controller.enabled:
+        return True, 0
+    tickets = request.session.get(ADMISSION_SESSION_KEY, {})
+    ticket = tickets.get(str(test_id))
+    position = None if ticket is None else controller.position(ticket)
+    if position is None:
+        # First visit, or the queue state expired from the cache since the ticket was taken
+        ticket = controller.take_ticket()
+        tickets[str(test_id)] = ticket
+        request.session[ADMISSION_SESSION_KEY] = tickets
+        position = controller.position(ticket)
+    return position == 0, position
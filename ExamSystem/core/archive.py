@@ -0,0 +1,86 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import StudentResult, ArchivedStudentResult
+
+ARCHIVE_BATCH_SIZE = 1000
+
+# Columns shared by StudentResult and ArchivedStudentResult, in export order
+EXPORT_COLUMNS = ('student__username', 'test__test_name', 'score_achieved', 'total_score', 'time_taken', 'completion_date')
+
+
+def archive_cutoff(days=None):
+    """
+    Completed results finished before this moment belong in the archive.
+    """
+    if days is None:
+        days = settings.RESULT_ARCHIVE_AFTER_DAYS
+    return timezone.now() - timedelta(days=days)
+
+
+def archivable_results(cutoff):
+    return StudentResult.objects.filter(status='Completed', completion_date__lt=cutoff)
+
+
+def archive_results(cutoff, batch_size=ARCHIVE_BATCH_SIZE):
+    """
+    Move Completed results older than `cutoff` into ArchivedStudentResult, one transaction per batch,
+    so the hot table is never locked for the whole run. Returns the number of results moved.
+    """
+    moved = 0
+    while True:
+        with transaction.atomic():
+            batch = list(archivable_results(cutoff).order_by('id')[:batch_size])
+            if not batch:
+                return moved
+            ArchivedStudentResult.objects.bulk_create([
+                ArchivedStudentResult(
+                    id=result.id,
+                    student_id=result.student_id,
+                    test_id=result.test_id,
+                    score_achieved=result.score_achieved,
+                    total_score=result.total_score,
+                    time_taken=result.time_taken,
+                    completion_date=result.completion_date,
+                    status=result.status,
+                    responses=result.responses,
+                    snapshot_version=result.snapshot_version,
+                )
+                for result in batch
+            ])
+            StudentResult.objects.filter(id__in=[result.id for result in batch]).delete()
+        moved += len(batch)
+
+
+def has_completed_attempt(student, test):
+    """
+    Whether `student` ever completed `test`, including attempts that have been archived.
+    """
+    return (
+        StudentResult.objects.filter(student=student, test=test, status='Completed').exists()
+        or ArchivedStudentResult.objects.filter(student=student, test=test).exists()
+    )
+
+
+def export_rows(include_archived=False):
+    """
+    Result rows for the Excel/CSV exports as tuples of EXPORT_COLUMNS.
+    With include_archived the archive is added with a single UNION ALL query.
+    """
+    rows = StudentResult.objects.values_list(*EXPORT_COLUMNS)
+    if include_archived:
+        rows = rows.union(ArchivedStudentResult.objects.values_list(*EXPORT_COLUMNS), all=True)
+    return rows
+
+
+def student_history(student, include_archived=False):
+    """
+    A student's results, optionally including archived ones.
+    """
+    results = list(StudentResult.objects.filter(student=student).select_related('test'))
+    if include_archived:
+        results += ArchivedStudentResult.objects.filter(student=student).select_related('test')
+    return results
@@ -0,0 +1,188 @@
+import random
+
+from django.http import JsonResponse
+from django.utils import timezone
+from django.views.decorators.http import require_GET, require_POST
+
+from .decorators import role_required
+from .eligibility import aeligible_test, arefresh_attempt_state
+from .metrics import GRADING_SECONDS, SUBMISSIONS, aattempt_finished, aattempt_started
+from .models import StudentResult
+from .snapshots import acurrent_test_snapshot, agraded_snapshot, aremember_served_snapshot, aserved_snapshot_version
+
+# Async JSON endpoints for the exam hot path. Under an ASGI server a request waiting on the
+# database does not hold a worker thread; the HTML pages in core/views.py stay synchronous.
+
+# Questions served per attempt, as in take_test_view
+QUESTIONS_PER_PAPER = 25
+
+
+def _not_available():
+    return JsonResponse({'error': 'Test does not exist or is not available.'}, status=404)
+
+
+async def _served_snapshot(request, test, pending):
+    """
+    The snapshot the student was served, as recorded server-side: in the session by test_paper_api,
+    else on the pending attempt, else the current one. The posted snapshot_version only has to agree.
+    """
+    version = await aserved_snapshot_version(request.session, test.id)
+    if version is None and pending is not None:
+        version = pending.snapshot_version
+    return await agraded_snapshot(test, version)
+
+
+def _stale_paper(request, published):
+    return request.POST.get('snapshot_version', str(published.version)) != str(published.version)
+
+
+def _stale_paper_response():
+    return JsonResponse({'error': 'This test paper is out of date. Please reload the test.'}, status=409)
+
+
+def _posted_responses(request, published):
+    """
+    Answers posted as question_<id> fields, limited to the questions of the snapshot.
+    """
+    return {
+        question_id: request.POST[f'question_{question_id}']
+        for question_id in published.answer_key
+        if request.POST.get(f'question_{question_id}')
+    }
+
+
+def _pending_results(user, test):
+    return StudentResult.objects.filter(student=user, test=test, status='Pending')
+
+
+@require_GET
+@role_required(['Student'])
+async def test_paper_api(request, test_id):
+    """
+    The questions of a published test, without the answer key, plus any autosaved answers.
+    """
+    user = await request.auser()
+    eligibility = await aeligible_test(user, test_id)
+    if eligibility is None:
+        return _not_available()
+    if not eligibility.can_start:
+        return JsonResponse({'error': 'You have already completed this test.'}, status=403)
+    test = eligibility.test
+    pending = await _pending_results(user, test).only('responses').afirst()
+
+    published = await acurrent_test_snapshot(test)
+    # Autosaves and the submission are graded against this version, whatever the client posts back
+    await aremember_served_snapshot(request.session, published)
+    paper = published.paper
+    questions = list(paper['questions'])
+    if len(questions) > QUESTIONS_PER_PAPER:
+        questions = random.sample(questions, QUESTIONS_PER_PAPER)
+    random.shuffle(questions)
+    await aattempt_started(request, test.id)
+    return JsonResponse(dict(paper, questions=questions, responses=pending.responses if pending else {}))
+
+
+@require_POST
+@role_required(['Student'])
+async def autosave_answers_api(request, test_id):
+    """
+    Store the posted answers on the student's pending attempt, creating the attempt on the first save.
+    """
+    user = await request.auser()
+    eligibility = await aeligible_test(user, test_id)
+    if eligibility is None:
+        return _not_available()
+    test = eligibility.test
+    pending = await _pending_results(user, test).only('id', 'responses', 'snapshot_version').afirst()
+    published = await _served_snapshot(request, test, pending)
+    if _stale_paper(request, published):
+        return _stale_paper_response()
+    responses = _posted_responses(request, published)
+
+    if pending is not None:
+        merged = dict(pending.responses, **responses)
+        await StudentResult.objects.filter(id=pending.id).aupdate(responses=merged, snapshot_version=published.version)
+    elif not eligibility.can_start:
+        return JsonResponse({'error': 'You have already completed this test.'}, status=409)
+    else:
+        merged = responses
+        await StudentResult.objects.acreate(
+            student=user, test=test, status='Pending', responses=merged, snapshot_version=published.version,
+        )
+    return JsonResponse({'saved': len(responses), 'answered': len(merged)})
+
+
+@require_GET
+@role_required(['Student'])
+async def attempt_status_api(request, test_id):
+    """
+    Whether the student's attempt is not started, in progress or completed, for polling from the test page.
+    """
+    user = await request.auser()
+    pending = await _pending_results(user, test_id).only('responses', 'snapshot_version').afirst()
+    if pending is not None:
+        return JsonResponse({
+            'status': 'in_progress',
+            'answered': len(pending.responses),
+            'snapshot_version': pending.snapshot_version,
+        })
+    completed = await (
+        StudentResult.objects.filter(student=user, test=test_id, status='Completed')
+        .only('score_achieved', 'total_score', 'completion_date')
+        .order_by('-completion_date')
+        .afirst()
+    )
+    if completed is not None:
+        return JsonResponse({
+            'status': 'completed',
+            'score_achieved': completed.score_achieved,
+            'total_score': completed.total_score,
+        })
+    return JsonResponse({'status': 'not_started'})
+
+
+@require_POST
+@role_required(['Student'])
+async def submit_test_api(request, test_id):
+    """
+    Grade and complete the student's attempt, like submit_test_view, answering with JSON.
+    """
+    user = await request.auser()
+    eligibility = await aeligible_test(user, test_id)
+    if eligibility is None:
+        return _not_available()
+    test = eligibility.test
+    pending = await _pending_results(user, test).only('id', 'responses', 'snapshot_version').afirst()
+    published = await _served_snapshot(request, test, pending)
+    if _stale_paper(request, published):
+        return _stale_paper_response()
+
+    # Answers posted with the submission win over autosaved ones
+    responses = dict(pending.responses if pending else {}, **_posted_responses(request, published))
+    with GRADING_SECONDS.time():
+        score, total_score = published.grade(responses)
+    total_score = 25  # As in submit_test_view
+    fields = {
+        'score_achieved': score,
+        'total_score': total_score,
+        'time_taken': int(request.POST.get('time_taken') or 0),
+        'completion_date': timezone.now(),
+        'status': 'Completed',
+        'responses': responses,
+        'snapshot_version': published.version,
+    }
+
+    # The async ORM has no transactions: complete the pending row with a single conditional UPDATE,
+    # so of two concurrent submissions only one wins
+    if pending is not None:
+        if not await StudentResult.objects.filter(id=pending.id, status='Pending').aupdate(**fields):
+            return JsonResponse({'error': 'This attempt has already been submitted.'}, status=409)
+        # A queryset update sends no post_save
+        await arefresh_attempt_state([test.id], [user.id])
+    elif not eligibility.can_start:
+        return JsonResponse({'error': 'You have already completed this test.'}, status=409)
+    else:
+        await StudentResult.objects.acreate(student=user, test=test, **fields)
+    SUBMISSIONS.inc()
+    await aattempt_finished(request, test.id)
+    return JsonResponse({'score_achieved': score, 'total_score': total_score})
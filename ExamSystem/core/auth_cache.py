@@ -0,0 +1,83 @@
+import uuid
+
+from django.conf import settings
+from django.contrib import auth
+from django.contrib.auth import HASH_SESSION_KEY, SESSION_KEY
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS
+
+from .models import CustomUser
+
+# Every other column is cached, cohort foreign keys included, so views reading the user's profile cost no query.
+# The password hashes stay out of the cache and load from the database on first access.
+UNCACHED_USER_FIELDS = ('password', 'student_password')
+
+
+def _cached_field_names():
+    # Model.from_db expects the loaded values in the model's field order
+    return [field.attname for field in CustomUser._meta.concrete_fields if field.attname not in UNCACHED_USER_FIELDS]
+
+
+def _cache():
+    return caches[getattr(settings, 'AUTH_USER_CACHE_ALIAS', 'default')]
+
+
+def _entry_key(session_key):
+    return f'core.auth_user:{session_key}'
+
+
+def _generation_key(user_id):
+    return f'core.auth_user.generation:{user_id}'
+
+
+def get_cached_user(request):
+    """
+    The user for `request`, served from a per-session cache entry while it is fresher than
+    AUTH_USER_CACHE_TTL and the user has not been saved since. Only UNCACHED_USER_FIELDS are deferred
+    and load from the database on first access.
+    Falls back to django.contrib.auth.get_user, which reads the user row and verifies the session hash.
+    """
+    ttl = getattr(settings, 'AUTH_USER_CACHE_TTL', 0)
+    session_key = request.session.session_key
+    user_id = request.session.get(SESSION_KEY)
+    if not ttl or session_key is None or user_id is None:
+        return auth.get_user(request)
+
+    cache = _cache()
+    entry_key, generation_key = _entry_key(session_key), _generation_key(user_id)
+    cached = cache.get_many([entry_key, generation_key])
+    # Read the generation before the user row, so a save that lands in between invalidates this entry
+    generation = cached.get(generation_key)
+    entry = cached.get(entry_key)
+    field_names = _cached_field_names()
+    if (
+        entry is not None
+        and entry['generation'] == generation
+        and entry['session_hash'] == request.session.get(HASH_SESSION_KEY)
+        and str(entry['values']['id']) == str(user_id)
+        and entry['values'].keys() == set(field_names)  # Entries written before a column was added are stale
+    ):
+        return CustomUser.from_db(DEFAULT_DB_ALIAS, field_names, [entry['values'][name] for name in field_names])
+
+    user = auth.get_user(request)
+    if user.is_authenticated and user.is_active:
+        cache.set(entry_key, {
+            'generation': generation,
+            'session_hash': request.session.get(HASH_SESSION_KEY),
+            'values': {field: getattr(user, field) for field in field_names},
+        }, ttl)
+    return user
+
+
+def invalidate_cached_user(user_id):
+    """
+    Expire every cached session entry of a user, e.g. after a role, password or active-flag change.
+    """
+    ttl = getattr(settings, 'AUTH_USER_CACHE_TTL', 0)
+    if ttl:
+        # Entries older than the TTL are gone anyway, so the generation only has to outlive them
+        _cache().set(_generation_key(user_id), uuid.uuid4().hex, ttl)
+
+
+def invalidate_cached_user_on_change(sender, instance, **kwargs):
+    invalidate_cached_user(instance.pk)
@@ -0,0 +1,226 @@
+from django.db import transaction
+
+from .models import Question, Answer
+from .question_bank import question_content_hash
+from .question_search import index_questions, index_test_questions
+
+BULK_BATCH_SIZE = 500
+
+
+def _parse_id(raw_id):
+    try:
+        return int(raw_id)
+    except (TypeError, ValueError):
+        return None
+
+
+def _submitted_answers(post, index):
+    """
+    Return the non-empty answers submitted for the question at `index`
+    as a list of (raw_answer_id, answer_text, is_correct) tuples.
+    """
+    answer_ids = post.getlist(f'question_{index}_answer_id')
+    answer_texts = post.getlist(f'question_{index}_answer_text')
+    correct_answers = post.getlist(f'question_{index}_is_correct')
+    return [
+        (answer_ids[j] if j < len(answer_ids) else '', answer_text, str(j) in correct_answers)
+        for j, answer_text in enumerate(answer_texts)
+        if answer_text.strip()
+    ]
+
+
+def _cleared_answer_ids(post, index):
+    """Raw ids of the existing answers submitted with empty text for the question at `index`."""
+    answer_ids = post.getlist(f'question_{index}_answer_id')
+    answer_texts = post.getlist(f'question_{index}_answer_text')
+    return [
+        answer_ids[j] for j, answer_text in enumerate(answer_texts)
+        if not answer_text.strip() and j < len(answer_ids) and answer_ids[j]
+    ]
+
+
+class TestEditDiff:
+    """
+    The changes an edit_test_view submission makes to a test's questions and answers.
+    """
+
+    def __init__(self, test_id=None):
+        self.test_id = test_id
+        self.created_questions = []  # (unsaved Question, [unsaved Answer, ...])
+        self.updated_questions = []
+        self.deleted_question_ids = set()
+        self.created_answers = []  # new answers on existing questions
+        self.updated_answers = []
+        self.deleted_answer_ids = set()
+        self.warnings = []
+
+
+def build_test_edit_diff(test, post, points_value):
+    """
+    Parse an edit_test_view POST once and diff it against the test's current questions and answers.
+    Reads the existing rows with two queries regardless of test size.
+    """
+    diff = TestEditDiff(test.id)
+    existing_questions = {question.id: question for question in test.questions.all()}
+    existing_answers = {}
+    for answer in Answer.objects.filter(question__test=test):
+        existing_answers.setdefault(answer.question_id, {})[answer.id] = answer
+
+    question_ids = post.getlist('question_id')
+    question_texts = post.getlist('question_text')
+    kept_question_ids = set()
+
+    for i, question_text in enumerate(question_texts):
+        raw_question_id = question_ids[i] if i < len(question_ids) else ''
+        question_obj = None
+        if raw_question_id:
+            question_id = _parse_id(raw_question_id)
+            if question_id in existing_questions and question_id not in kept_question_ids:
+                question_obj = existing_questions[question_id]
+            else:
+                diff.warnings.append(f"Submitted question ID '{raw_question_id}' was invalid or did not exist. Treating as new question.")
+
+        if not question_text.strip():
+            # Existing questions submitted without text are deleted below with the rest of the unsubmitted ones
+            continue
+
+        submitted_answers = _submitted_answers(post, i)
+
+        if question_obj is None:
+            question_obj = Question(
+                test=test,
+                question_text=question_text,
+                question_type='MCQ', # Enforce MCQ
+                points_value=points_value,
+                content_hash=question_content_hash(
+                    question_text, 'MCQ', [(answer_text, is_correct) for _, answer_text, is_correct in submitted_answers]
+                )
+            )
+            answers = [
+                Answer(answer_text=answer_text, is_correct=is_correct)
+                for _, answer_text, is_correct in submitted_answers
+            ]
+            diff.created_questions.append((question_obj, answers))
+            continue
+
+        kept_question_ids.add(question_obj.id)
+        question_answers = existing_answers.get(question_obj.id, {})
+        kept_answer_ids = set()
+        final_answers = []  # (answer_text, is_correct) of the question's answers after the edit, for its hash
+        for raw_answer_id, answer_text, is_correct in submitted_answers:
+            final_answers.append((answer_text, is_correct))
+            answer_id = _parse_id(raw_answer_id) if raw_answer_id else None
+            answer_obj = None
+            if raw_answer_id:
+                if answer_id in question_answers and answer_id not in kept_answer_ids:
+                    answer_obj = question_answers[answer_id]
+                else:
+                    diff.warnings.append(f"Submitted answer ID '{raw_answer_id}' was invalid or did not exist. Treating as new answer.")
+
+            if answer_obj is None:
+                diff.created_answers.append(Answer(question=question_obj, answer_text=answer_text, is_correct=is_correct))
+                continue
+
+            kept_answer_ids.add(answer_obj.id)
+            if answer_obj.answer_text != answer_text or answer_obj.is_correct != is_correct:
+                answer_obj.answer_text = answer_text
+                answer_obj.is_correct = is_correct
+                diff.updated_answers.append(answer_obj)
+
+        for raw_answer_id in _cleared_answer_ids(post, i):
+            answer_id = _parse_id(raw_answer_id)
+            if answer_id in question_answers and answer_id not in kept_answer_ids:
+                # An existing answer whose text was cleared is kept as it was; only unsubmitted answers are deleted
+                kept_answer_ids.add(answer_id)
+                answer_obj = question_answers[answer_id]
+                final_answers.append((answer_obj.answer_text, answer_obj.is_correct))
+        diff.deleted_answer_ids.update(set(question_answers) - kept_answer_ids)
+
+        new_values = {
+            'question_text': question_text,
+            'question_type': 'MCQ',
+            'points_value': points_value,
+            'content_hash': question_content_hash(question_text, 'MCQ', final_answers),
+        }
+        if any(getattr(question_obj, field) != value for field, value in new_values.items()):
+            for field, value in new_values.items():
+                setattr(question_obj, field, value)
+            diff.updated_questions.append(question_obj)
+
+    diff.deleted_question_ids = set(existing_questions) - kept_question_ids
+    return diff
+
+
+def apply_test_edit_diff(diff):
+    """
+    Persist a TestEditDiff with set-based deletes, bulk_create and bulk_update in one transaction.
+    """
+    with transaction.atomic():
+        if diff.deleted_question_ids:
+            Question.objects.filter(id__in=diff.deleted_question_ids).delete()
+        if diff.deleted_answer_ids:
+            Answer.objects.filter(id__in=diff.deleted_answer_ids).delete()
+
+        new_questions = [question for question, _ in diff.created_questions]
+        Question.objects.bulk_create(new_questions, batch_size=BULK_BATCH_SIZE)
+
+        new_answers = list(diff.created_answers)
+        for question, answers in diff.created_questions:
+            for answer in answers:
+                answer.question = question
+                new_answers.append(answer)
+        Answer.objects.bulk_create(new_answers, batch_size=BULK_BATCH_SIZE)
+
+        Question.objects.bulk_update(
+            diff.updated_questions,
+            ['question_text', 'question_type', 'points_value', 'content_hash'],
+            batch_size=BULK_BATCH_SIZE,
+        )
+        Answer.objects.bulk_update(diff.updated_answers, ['answer_text', 'is_correct'], batch_size=BULK_BATCH_SIZE)
+        # Bulk writes skip post_save, so refresh the search index for the whole test
+        index_test_questions(diff.test_id)
+
+
+def parse_new_questions(post):
+    """
+    Read the question and answer fields of a create_test_view POST
+    into a list of (question_text, [(answer_text, is_correct), ...]) pairs.
+    """
+    questions = []
+    for i, question_text in enumerate(post.getlist('question_text')):
+        if question_text.strip():  # Only create if question text is not empty
+            answers = [(answer_text, is_correct) for _, answer_text, is_correct in _submitted_answers(post, i)]
+            questions.append((question_text, answers))
+    return questions
+
+
+def create_questions(test, questions, points_value):
+    """
+    Build all questions and answers for `test` in memory and insert them with batched bulk_create.
+    `questions` is a list of (question_text, [(answer_text, is_correct), ...]) pairs.
+    Returns the content hashes of the created questions.
+    """
+    question_objs = []
+    answer_lists = []
+    for question_text, answers in questions:
+        question_objs.append(Question(
+            test=test,
+            question_text=question_text,
+            question_type='MCQ', # Always MCQ as per requirement
+            points_value=points_value,
+            content_hash=question_content_hash(question_text, 'MCQ', answers)
+        ))
+        answer_lists.append(answers)
+
+    with transaction.atomic():
+        Question.objects.bulk_create(question_objs, batch_size=BULK_BATCH_SIZE)
+        Answer.objects.bulk_create(
+            [
+                Answer(question=question, answer_text=answer_text, is_correct=is_correct)
+                for question, answers in zip(question_objs, answer_lists)
+                for answer_text, is_correct in answers
+            ],
+            batch_size=BULK_BATCH_SIZE,
+        )
+        index_questions(question.id for question in question_objs)
+    return [question.content_hash for question in question_objs]
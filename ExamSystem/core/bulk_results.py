@@ -0,0 +1,113 @@
+from django.core import signing
+from django.db import transaction
+from django.db.models import Q
+
+from .eligibility import refresh_attempt_state
+from .models import CustomUser, StudentResult, ArchivedStudentResult
+
+BULK_BATCH_SIZE = 1000
+# How long a preview can be confirmed for
+PREVIEW_MAX_AGE = 15 * 60
+PREVIEW_SALT = 'core.bulk_results.preview'
+
+
+def cohort_students(group=None, course=None, direction=None):
+    """
+    Students matching every given cohort filter by name; empty filters are ignored.
+    Filters go through the indexed cohort foreign keys, not the free-text fields.
+    """
+    students = CustomUser.objects.filter(role='Student')
+    if group:
+        students = students.filter(cohort_group__name=group.strip())
+    if course:
+        students = students.filter(cohort_course__name=course.strip())
+    if direction:
+        students = students.filter(cohort_direction__name=direction.strip())
+    return students
+
+
+def _has_cohort_filter(group=None, course=None, direction=None):
+    return bool(group or course or direction)
+
+
+def reopen_candidates(test, group=None, course=None, direction=None):
+    """
+    Students in the cohort who completed `test` (archived attempts included) and have no pending retake yet.
+    Evaluates as a single query with subqueries.
+    """
+    completed = StudentResult.objects.filter(test=test, status='Completed').values('student_id')
+    archived = ArchivedStudentResult.objects.filter(test=test).values('student_id')
+    pending = StudentResult.objects.filter(test=test, status='Pending').values('student_id')
+    return (
+        cohort_students(group, course, direction)
+        .filter(Q(id__in=completed) | Q(id__in=archived))
+        .exclude(id__in=pending)
+    )
+
+
+def preview_reopen(test, group=None, course=None, direction=None):
+    return reopen_candidates(test, group, course, direction).count()
+
+
+def reopen_test_for_cohort(test, group=None, course=None, direction=None):
+    """
+    Give every student in the cohort who completed `test` a new pending attempt.
+    Previous results are preserved, like retake_test_view. Returns the number of attempts created.
+    """
+    with transaction.atomic():
+        student_ids = list(reopen_candidates(test, group, course, direction).values_list('id', flat=True))
+        StudentResult.objects.bulk_create(
+            [StudentResult(student_id=student_id, test=test) for student_id in student_ids],
+            batch_size=BULK_BATCH_SIZE,
+        )
+        refresh_attempt_state([test.id], student_ids)
+    return len(student_ids)
+
+
+def matching_results(test=None, status=None, group=None, course=None, direction=None):
+    """
+    Results matching the given filters. At least one filter is required so nothing is cleared by accident.
+    """
+    if test is None and not status and not _has_cohort_filter(group, course, direction):
+        raise ValueError('At least one filter is required.')
+    results = StudentResult.objects.all()
+    if test is not None:
+        results = results.filter(test=test)
+    if status:
+        results = results.filter(status=status)
+    if _has_cohort_filter(group, course, direction):
+        results = results.filter(student__in=cohort_students(group, course, direction).values('id'))
+    return results
+
+
+def preview_clear(test=None, status=None, group=None, course=None, direction=None):
+    return matching_results(test, status, group, course, direction).count()
+
+
+def clear_results(test=None, status=None, group=None, course=None, direction=None):
+    """
+    Delete every result matching the filters in one transaction, then refresh the can_start flags it may
+    have changed with one UPDATE. Returns the number deleted.
+    """
+    with transaction.atomic():
+        results = matching_results(test, status, group, course, direction)
+        # The collector loads the rows for post_delete; only the columns the receiver reads
+        deleted = results.only('id', 'student_id', 'test_id').delete()[1].get(StudentResult._meta.label, 0)
+        refresh_attempt_state(
+            None if test is None else [test.id],
+            cohort_students(group, course, direction).values('id') if _has_cohort_filter(group, course, direction) else None,
+        )
+    return deleted
+
+
+def preview_token(operation):
+    """Signed copy of a previewed operation (action, test id, status and cohort filters) for its Confirm button."""
+    return signing.dumps(operation, salt=PREVIEW_SALT)
+
+
+def confirms_preview(token, operation):
+    """Whether `token` was issued by preview_token() for this exact operation in the last PREVIEW_MAX_AGE seconds."""
+    try:
+        return signing.loads(token, salt=PREVIEW_SALT, max_age=PREVIEW_MAX_AGE) == operation
+    except signing.BadSignature:
+        return False
@@ -0,0 +1,96 @@
+import math
+
+from django.db.models import Avg, Count, F, Max, Min
+
+from .models import StudentGroup, Course, Direction, StudentResult
+
+# CustomUser text field -> (cohort foreign key, cohort model). The text stays what imports and exports show;
+# the foreign key is what cohort filters and per-group reports use
+COHORT_FIELDS = {
+    'student_groups': ('cohort_group', StudentGroup),
+    'course': ('cohort_course', Course),
+    'student_direction': ('cohort_direction', Direction),
+}
+
+# Cohort kinds accepted by group_result_summary(), keyed by the name used in URLs and forms
+SUMMARY_KINDS = {'group': 'cohort_group', 'course': 'cohort_course', 'direction': 'cohort_direction'}
+
+
+def cohort_name(value):
+    """
+    The cohort name for a raw field or spreadsheet value, or None when it is empty.
+    Spreadsheet numbers read as floats (2.0) become '2'.
+    """
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return None
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).strip() or None
+
+
+def resolve_cohorts(model, names):
+    """
+    Return {name: id} for `names`, creating the missing cohort rows. Two or three queries however many names.
+    """
+    names = set(names) - {None}
+    if not names:
+        return {}
+    ids = dict(model.objects.filter(name__in=names).values_list('name', 'id'))
+    missing = names - set(ids)
+    if missing:
+        # ignore_conflicts: a concurrent import may create the same names
+        model.objects.bulk_create([model(name=name) for name in missing], ignore_conflicts=True)
+        ids.update(model.objects.filter(name__in=missing).values_list('name', 'id'))
+    return ids
+
+
+def assign_cohorts(students):
+    """
+    Set the cohort foreign keys of (usually unsaved) students from their text fields, resolving
+    every distinct name with one lookup per cohort kind. Use before bulk_create or bulk_update.
+    """
+    for text_field, (foreign_key, model) in COHORT_FIELDS.items():
+        names = [cohort_name(getattr(student, text_field)) for student in students]
+        ids = resolve_cohorts(model, names)
+        for student, name in zip(students, names):
+            setattr(student, text_field, name)
+            setattr(student, f'{foreign_key}_id', ids.get(name))
+    return students
+
+
+def sync_cohorts_on_save(sender, instance, raw=False, update_fields=None, **kwargs):
+    """
+    pre_save receiver for CustomUser: resolve the cohort foreign keys from the text fields on full saves.
+    Saves limited by update_fields (last_login, password upgrades) are left alone; a caller that updates
+    the text that way must list the cohort foreign keys too and call assign_cohorts() first.
+    """
+    if raw or update_fields is not None:
+        return
+    for text_field, (foreign_key, model) in COHORT_FIELDS.items():
+        name = cohort_name(getattr(instance, text_field))
+        setattr(instance, f'{foreign_key}_id', None if name is None else resolve_cohorts(model, [name])[name])
+
+
+def group_result_summary(kind='group', test=None):
+    """
+    Per-cohort aggregates of Completed results (live ones; archived attempts are not included), in one grouped
+    query: [{'name', 'students', 'attempts', 'average_score', 'best_score', 'lowest_score', 'average_total'}, ...]
+    ordered by cohort name. Students without a cohort of this kind are grouped under name None.
+    """
+    foreign_key = SUMMARY_KINDS[kind]
+    results = StudentResult.objects.filter(status='Completed')
+    if test is not None:
+        results = results.filter(test=test)
+    return list(
+        results
+        .values(name=F(f'student__{foreign_key}__name'))
+        .annotate(
+            students=Count('student', distinct=True),
+            attempts=Count('id'),
+            average_score=Avg('score_achieved'),
+            best_score=Max('score_achieved'),
+            lowest_score=Min('score_achieved'),
+            average_total=Avg('total_score'),
+        )
+        .order_by(F('name').asc(nulls_last=True))
+    )
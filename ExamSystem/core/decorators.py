@@ -1,7 +1,11 @@
+import time
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
 from django.http import HttpResponseForbidden
 from django.shortcuts import redirect
 from functools import wraps
 from django.contrib.auth.decorators import login_required
+from .routers import replica_reads
 
 
 def role_required(allowed_roles):
@@ -10,9 +14,21 @@ def role_required(allowed_roles):
     Usage: @role_required(['Admin', 'Teacher'])
     """
     def decorator(view_func):
+        if iscoroutinefunction(view_func):
+            # Async views (core/async_views.py) must not touch the lazy request.user
+            @login_required
+            @wraps(view_func)
+            async def _async_wrapped_view(request, *args, **kwargs):
+                user = await request.auser()
+                if user.role in allowed_roles:
+                    return await view_func(request, *args, **kwargs)
+                return HttpResponseForbidden("You don't have permission to access this page.")
+            return _async_wrapped_view
+
         @login_required
         @wraps(view_func)
         def _wrapped_view(request, *args, **kwargs):
+            # request.user.role comes from the per-session user cache (core/auth_cache.py), so no query
             if request.user.role in allowed_roles:
                 return view_func(request, *args, **kwargs)
             else:
@@ -41,4 +57,34 @@ def redirect_based_on_role(view_func):
             # Default redirect if role is not recognized
             return redirect('login')
     
-    return _wrapped_view
\ No newline at end of file
+    return _wrapped_view
+
+PRIMARY_PIN_SESSION_KEY = '_reads_pinned_to_primary_until'
+
+
+def use_replica(view_func):
+    """
+    Decorator that routes the view's reads to the read replica, if one is configured and fresh enough.
+    Sessions that just wrote through a @use_primary view keep reading from the primary.
+    Place it below @role_required so authentication still reads from the primary.
+    """
+    @wraps(view_func)
+    def _wrapped_view(request, *args, **kwargs):
+        pinned_until = request.session.get(PRIMARY_PIN_SESSION_KEY, 0)
+        with replica_reads(time.time() >= pinned_until):
+            return view_func(request, *args, **kwargs)
+    return _wrapped_view
+
+
+def use_primary(view_func):
+    """
+    Decorator for write and read-your-writes views: all reads go to the primary, and the session
+    keeps reading from the primary for REPLICA_MAX_LAG_SECONDS so it sees its own writes.
+    """
+    @wraps(view_func)
+    def _wrapped_view(request, *args, **kwargs):
+        with replica_reads(False):
+            response = view_func(request, *args, **kwargs)
+        request.session[PRIMARY_PIN_SESSION_KEY] = time.time() + getattr(settings, 'REPLICA_MAX_LAG_SECONDS', 300)
+        return response
+    return _wrapped_view
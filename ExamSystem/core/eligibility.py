@@ -0,0 +1,242 @@
+from django.db import connection, connections, transaction
+from django.db.models import Exists, ExpressionWrapper, BooleanField, OuterRef, Q
+from django.db.models.signals import post_save
+
+from .models import (
+    CustomUser, StudentGroup, Course, Direction, Test, TestAssignment, TestEligibility, StudentResult,
+    ArchivedStudentResult,
+)
+
+SYNC_BATCH_SIZE = 500
+
+# Assignment targets accepted by assign_test(), keyed by the name used in forms:
+# (TestAssignment field, target model, field the target is looked up by)
+ASSIGNMENT_TARGETS = {
+    'group': ('student_group', StudentGroup, 'name'),
+    'course': ('course', Course, 'name'),
+    'direction': ('direction', Direction, 'name'),
+    'student': ('student', CustomUser, 'username'),
+}
+
+# Eligible (student, test) pairs, one SELECT per way a student can be eligible so that each can use
+# an index: open tests (no assignments) for every student, then assignments by group, course, direction
+# and student. {tests} and {students} are replaced with optional restrictions on t.id and u.id.
+ELIGIBLE_PAIRS_SQL = '''
+    SELECT u.id AS student_id, t.id AS test_id FROM core_test t CROSS JOIN core_customuser u
+    WHERE t.status = 'Published' AND u.role = 'Student' {tests} {students}
+      AND NOT EXISTS (SELECT 1 FROM core_testassignment a WHERE a.test_id = t.id)
+    UNION
+    SELECT u.id, t.id FROM core_testassignment a
+    JOIN core_test t ON t.id = a.test_id JOIN core_customuser u ON u.cohort_group_id = a.student_group_id
+    WHERE t.status = 'Published' AND u.role = 'Student' {tests} {students}
+    UNION
+    SELECT u.id, t.id FROM core_testassignment a
+    JOIN core_test t ON t.id = a.test_id JOIN core_customuser u ON u.cohort_course_id = a.course_id
+    WHERE t.status = 'Published' AND u.role = 'Student' {tests} {students}
+    UNION
+    SELECT u.id, t.id FROM core_testassignment a
+    JOIN core_test t ON t.id = a.test_id JOIN core_customuser u ON u.cohort_direction_id = a.direction_id
+    WHERE t.status = 'Published' AND u.role = 'Student' {tests} {students}
+    UNION
+    SELECT u.id, t.id FROM core_testassignment a
+    JOIN core_test t ON t.id = a.test_id JOIN core_customuser u ON u.id = a.student_id
+    WHERE t.status = 'Published' AND u.role = 'Student' {tests} {students}
+'''
+ELIGIBLE_PAIRS_PARTS = 5
+
+
+def _in_clause(column, ids):
+    if ids is None:
+        return '', []
+    return f"AND {column} IN ({', '.join(['%s'] * len(ids))})", list(ids)
+
+
+def _batches(ids):
+    """Split an id list into batches; None (no restriction) is a single batch."""
+    if ids is None:
+        yield None
+        return
+    ids = sorted(set(ids))
+    for start in range(0, len(ids), SYNC_BATCH_SIZE):
+        yield ids[start:start + SYNC_BATCH_SIZE]
+
+
+def sync_eligibility(test_ids=None, student_ids=None):
+    """
+    Bring TestEligibility in line with test status, assignments and cohort membership for the given tests
+    and/or students (None: all of them), then refresh can_start for the rows kept or added.
+    Three set-based statements per batch of 500 ids.
+    """
+    for tests in _batches(test_ids):
+        for students in _batches(student_ids):
+            test_clause, test_params = _in_clause('t.id', tests)
+            student_clause, student_params = _in_clause('u.id', students)
+            pairs = ELIGIBLE_PAIRS_SQL.format(tests=test_clause, students=student_clause)
+            pair_params = (test_params + student_params) * ELIGIBLE_PAIRS_PARTS
+            row_tests, row_test_params = _in_clause('test_id', tests)
+            row_students, row_student_params = _in_clause('student_id', students)
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f'DELETE FROM core_testeligibility WHERE 1 = 1 {row_tests} {row_students} '
+                    f'AND (student_id, test_id) NOT IN ({pairs})',
+                    row_test_params + row_student_params + pair_params,
+                )
+                cursor.execute(
+                    'INSERT INTO core_testeligibility (student_id, test_id, can_start) '
+                    f'SELECT pairs.student_id, pairs.test_id, %s FROM ({pairs}) pairs '
+                    'WHERE NOT EXISTS (SELECT 1 FROM core_testeligibility e '
+                    'WHERE e.student_id = pairs.student_id AND e.test_id = pairs.test_id)',
+                    [True] + pair_params,
+                )
+            refresh_attempt_state(tests, students)
+
+
+def _can_start():
+    """Pending retake, or no completed attempt (live or archived), for the outer TestEligibility row."""
+    same_pair = {'student_id': OuterRef('student_id'), 'test_id': OuterRef('test_id')}
+    return ExpressionWrapper(
+        Q(Exists(StudentResult.objects.filter(status='Pending', **same_pair)))
+        | (
+            ~Q(Exists(StudentResult.objects.filter(status='Completed', **same_pair)))
+            & ~Q(Exists(ArchivedStudentResult.objects.filter(**same_pair)))
+        ),
+        output_field=BooleanField(),
+    )
+
+
+def _attempt_rows(test_ids=None, student_ids=None):
+    rows = TestEligibility.objects.all()
+    if test_ids is not None:
+        rows = rows.filter(test_id__in=test_ids)
+    if student_ids is not None:
+        rows = rows.filter(student_id__in=student_ids)
+    return rows
+
+
+def refresh_attempt_state(test_ids=None, student_ids=None):
+    """
+    Recompute can_start from the results, in one UPDATE. Call after writing results without signals
+    (bulk_create, queryset update, raw deletes). Either argument may be a list of ids or a values('id') queryset.
+    """
+    return _attempt_rows(test_ids, student_ids).update(can_start=_can_start())
+
+
+async def arefresh_attempt_state(test_ids=None, student_ids=None):
+    """See refresh_attempt_state()."""
+    return await _attempt_rows(test_ids, student_ids).aupdate(can_start=_can_start())
+
+
+def assign_test(test, kind, name):
+    """
+    Assign `test` to the group, course, direction or student (by username) called `name`; the post_save
+    receiver brings eligibility in line. Raises ValueError for an unknown target or a duplicate assignment.
+    """
+    field, model, lookup = ASSIGNMENT_TARGETS[kind]
+    targets = model.objects.filter(**{lookup: name.strip()})
+    if model is CustomUser:
+        targets = targets.filter(role='Student')
+    target = targets.first()
+    if target is None:
+        raise ValueError(f"No {kind} named '{name.strip()}'.")
+    assignment, created = TestAssignment.objects.get_or_create(test=test, **{field: target})
+    if not created:
+        raise ValueError(f"The test is already assigned to {kind} '{name.strip()}'.")
+    return assignment
+
+
+def eligible_test(student, test_id):
+    """
+    The student's TestEligibility for a Published test, with the test loaded, or None: the single indexed
+    lookup that gates taking and submitting a test.
+    """
+    return (
+        TestEligibility.objects.select_related('test').only('can_start', 'test__id', 'test__status', 'test__published_version')
+        .filter(student=student, test_id=test_id).first()
+    )
+
+
+async def aeligible_test(student, test_id):
+    """See eligible_test()."""
+    return await (
+        TestEligibility.objects.select_related('test').only('can_start', 'test__id', 'test__status', 'test__published_version')
+        .filter(student=student, test_id=test_id).afirst()
+    )
+
+
+def eligible_tests(student):
+    """The Published tests a student may see, with their subjects, in one query."""
+    return [
+        eligibility.test
+        for eligibility in TestEligibility.objects.filter(student=student).select_related('test__subject').order_by('test_id')
+    ]
+
+
+# Receivers (connected in core/signals.py)
+
+def sync_test_on_save(sender, instance, created=False, raw=False, **kwargs):
+    """
+    post_save receiver for Test: materialise eligibility on publish, drop it on unpublish. Saves that keep
+    the status as loaded (ordinary edits) cost nothing: assignment and cohort changes sync themselves.
+    """
+    if raw:
+        return
+    loaded_status, instance._loaded_status = getattr(instance, '_loaded_status', None), instance.status
+    if loaded_status == instance.status:
+        return
+    if instance.status == 'Published':
+        sync_eligibility(test_ids=[instance.id])
+    elif not created:
+        TestEligibility.objects.filter(test=instance).delete()
+
+
+def sync_assignment_on_change(sender, instance, raw=False, **kwargs):
+    """post_save and post_delete receiver for TestAssignment."""
+    if not raw and Test.objects.filter(id=instance.test_id).exists():
+        sync_eligibility(test_ids=[instance.test_id])
+
+
+def sync_student_on_save(sender, instance, raw=False, update_fields=None, **kwargs):
+    """
+    post_save receiver for CustomUser: a full save may have changed the role or cohorts.
+    Saves limited by update_fields (last_login, password upgrades) are left alone.
+    """
+    if not raw and update_fields is None:
+        sync_eligibility(student_ids=[instance.id])
+
+
+class _PendingAttemptRefresh:
+    """(test, student) pairs whose results were deleted in the current transaction, refreshed on commit."""
+
+    def __init__(self):
+        self.test_ids = set()
+        self.student_ids = set()
+        self.done = False
+
+    def __call__(self):
+        self.done = True
+        # One UPDATE per batch of students; pairs crossed between batches are refreshed too, which is harmless
+        for students in _batches(self.student_ids):
+            refresh_attempt_state(sorted(self.test_ids), students)
+
+
+def refresh_attempt_on_change(sender, instance, using, raw=False, signal=None, **kwargs):
+    """
+    post_save and post_delete receiver for StudentResult: keep can_start of the pair current.
+    Deletes inside a transaction (the collector deleting many results, a test deleted with its results)
+    are batched into one refresh on commit instead of one UPDATE per result.
+    """
+    if raw:
+        return
+    db = connections[using]
+    if signal is post_save or not db.in_atomic_block:
+        refresh_attempt_state([instance.test_id], [instance.student_id])
+        return
+    # Look the pending refresh up among the transaction's callbacks, so one dropped by a rollback is not reused
+    pending = next((
+        func for _, func, _ in db.run_on_commit if isinstance(func, _PendingAttemptRefresh) and not func.done
+    ), None)
+    if pending is None:
+        pending = _PendingAttemptRefresh()
+        transaction.on_commit(pending, using=using)
+    pending.test_ids.add(instance.test_id)
+    pending.student_ids.add(instance.student_id)
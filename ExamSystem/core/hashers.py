@@ -0,0 +1,26 @@
+from django.conf import settings
+from django.contrib.auth.hashers import PBKDF2PasswordHasher, make_password
+
+
+class StudentPBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    """
+    PBKDF2-SHA256 with the iteration count from settings.STUDENT_PASSWORD_ITERATIONS.
+    Student accounts are bulk-imported with their passport series as password and all log in
+    within minutes of an exam starting, so they get a cheaper work factor than staff accounts.
+    """
+    algorithm = 'pbkdf2_sha256_student'
+
+    @property
+    def iterations(self):
+        return settings.STUDENT_PASSWORD_ITERATIONS
+
+
+def student_password_hasher():
+    """
+    The hasher algorithm student passwords are stored with ('default' means the first PASSWORD_HASHERS entry).
+    """
+    return getattr(settings, 'STUDENT_PASSWORD_HASHER', 'default')
+
+
+def make_student_password(raw_password):
+    return make_password(raw_password, hasher=student_password_hasher())
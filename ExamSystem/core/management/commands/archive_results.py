@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from core.archive import ARCHIVE_BATCH_SIZE, archivable_results, archive_cutoff, archive_results
+
+
+class Command(BaseCommand):
+    help = 'Move Completed results older than the archive term from StudentResult into ArchivedStudentResult.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, help='Archive results completed more than N days ago (default: RESULT_ARCHIVE_AFTER_DAYS).')
+        parser.add_argument('--batch-size', type=int, default=ARCHIVE_BATCH_SIZE, help='Results moved per transaction.')
+        parser.add_argument('--dry-run', action='store_true', help='Only print how many results would be archived.')
+
+    def handle(self, *args, **options):
+        cutoff = archive_cutoff(options['days'])
+        if options['dry_run']:
+            self.stdout.write(f'{archivable_results(cutoff).count()} result(s) completed before {cutoff:%Y-%m-%d} would be archived.')
+            return
+        moved = archive_results(cutoff, options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Archived {moved} result(s) completed before {cutoff:%Y-%m-%d}.'))
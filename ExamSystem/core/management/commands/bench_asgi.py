@@ -0,0 +1,120 @@
+import asyncio
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.sessions.models import Session
+from django.core.management.base import BaseCommand
+from django.test import AsyncClient, Client, override_settings
+from django.urls import reverse
+
+from core.authoring import create_questions
+from core.models import CustomUser, Subject, Test
+from core.snapshots import publish_test_snapshot
+
+
+class Command(BaseCommand):
+    help = (
+        'Replay concurrent examinees (paper, autosaves, status poll, submit) against the async exam API, '
+        'once through the WSGI handler with a thread pool and once through the ASGI handler on one event loop. '
+        'Reports throughput and p50/p99 latency. The seeded users and test are deleted afterwards.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--examinees', type=int, default=1000)
+        parser.add_argument('--autosaves', type=int, default=3, help='Autosave requests per examinee.')
+        parser.add_argument('--threads', type=int, default=32, help='WSGI worker threads (gunicorn --threads).')
+        parser.add_argument('--questions', type=int, default=25)
+
+    @override_settings(ALLOWED_HOSTS=['testserver'])
+    def handle(self, *args, **options):
+        test, students = self.seed(options)
+        try:
+            self.stdout.write(f"{options['examinees']} concurrent examinees, {options['autosaves']} autosaves each")
+            self.stdout.write(f"{'server':<22} {'requests':>9} {'errors':>7} {'req/sec':>9} {'p50 ms':>8} {'p99 ms':>8}")
+            for label, run in ((f"WSGI, {options['threads']} threads", self.run_wsgi), ('ASGI, 1 event loop', self.run_asgi)):
+                # Each scenario starts from a clean slate
+                test.results.all().delete()
+                started = time.perf_counter()
+                latencies, errors = run(test, students, options)
+                seconds = time.perf_counter() - started
+                latencies.sort()
+                p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+                self.stdout.write(
+                    f'{label:<22} {len(latencies):>9} {errors:>7} {len(latencies) / seconds:>9.0f} '
+                    f'{statistics.median(latencies):>8.1f} {p99:>8.1f}'
+                )
+        finally:
+            Session.objects.filter(session_key__in=[client.session.session_key for _, client in students]).delete()
+            test.delete()
+            CustomUser.objects.filter(username__startswith='__bench_asgi_').delete()
+
+    def seed(self, options):
+        teacher = CustomUser.objects.create(username='__bench_asgi_teacher__', role='Teacher')
+        subject = Subject.objects.create(name='Benchmark', created_by=teacher)
+        test = Test.objects.create(test_name='Bench', subject=subject, created_by=teacher, status='Published')
+        create_questions(test, [
+            (f'Question {i}', [('Right', True), ('Wrong', False)])
+            for i in range(options['questions'])
+        ], 1)
+        publish_test_snapshot(test)
+
+        students = []
+        for i in range(options['examinees']):
+            student = CustomUser.objects.create(username=f'__bench_asgi_{i}__', role='Student', password='!')
+            client = Client(raise_request_exception=False)
+            client.force_login(student)
+            students.append((student, client))
+        return test, students
+
+    def flow(self, test):
+        """
+        The requests one examinee makes, as (method, url, data) tuples.
+        """
+        paper = reverse('api_test_paper', args=[test.id])
+        autosave = reverse('api_autosave_answers', args=[test.id])
+        status = reverse('api_attempt_status', args=[test.id])
+        submit = reverse('api_submit_test', args=[test.id])
+        question_ids = [str(question_id) for question_id in test.questions.values_list('id', flat=True)]
+        answers = {f'question_{question_id}': '0' for question_id in question_ids}
+        return paper, autosave, status, submit, answers
+
+    def run_wsgi(self, test, students, options):
+        paper, autosave, status, submit, answers = self.flow(test)
+
+        def examinee(client):
+            latencies, errors = [], 0
+            requests = [('get', paper, None)] + [('post', autosave, answers)] * options['autosaves']
+            requests += [('get', status, None), ('post', submit, answers)]
+            for method, url, data in requests:
+                started = time.perf_counter()
+                response = getattr(client, method)(url, data)
+                latencies.append((time.perf_counter() - started) * 1000)
+                errors += response.status_code >= 400
+            return latencies, errors
+
+        with ThreadPoolExecutor(max_workers=options['threads']) as pool:
+            outcomes = list(pool.map(examinee, [client for _, client in students]))
+        return [ms for latencies, _ in outcomes for ms in latencies], sum(errors for _, errors in outcomes)
+
+    def run_asgi(self, test, students, options):
+        paper, autosave, status, submit, answers = self.flow(test)
+
+        async def examinee(cookies):
+            client = AsyncClient(raise_request_exception=False)
+            client.cookies = cookies
+            latencies, errors = [], 0
+            requests = [('get', paper, None)] + [('post', autosave, answers)] * options['autosaves']
+            requests += [('get', status, None), ('post', submit, answers)]
+            for method, url, data in requests:
+                started = time.perf_counter()
+                response = await getattr(client, method)(url, data)
+                latencies.append((time.perf_counter() - started) * 1000)
+                errors += response.status_code >= 400
+            return latencies, errors
+
+        async def storm():
+            return await asyncio.gather(*(examinee(client.cookies) for _, client in students))
+
+        outcomes = asyncio.run(storm())
+        return [ms for latencies, _ in outcomes for ms in latencies], sum(errors for _, errors in outcomes)
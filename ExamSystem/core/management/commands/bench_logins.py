@@ -0,0 +1,73 @@
+import multiprocessing
+import os
+import time
+
+from django.contrib.auth import authenticate
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.test import override_settings
+
+from core.models import CustomUser
+from core.warmup import warm_up
+
+PASSWORD = 'AB1234567'  # Students log in with their passport series
+
+
+def run_worker(usernames, warm, results):
+    if warm:
+        warm_up()
+    started = time.perf_counter()
+    ok = sum(1 for username in usernames if authenticate(None, username=username, password=PASSWORD) is not None)
+    connections.close_all()
+    results.put((ok, time.perf_counter() - started))
+
+
+class Command(BaseCommand):
+    help = (
+        'Replay an exam-start login storm: N students authenticate concurrently from several processes, '
+        'once with full-strength hashes and once with the student hasher policy. Reports logins/sec per core.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--logins', type=int, default=200, help='Students logging in per scenario.')
+        parser.add_argument('--processes', type=int, default=os.cpu_count(), help='Concurrent worker processes.')
+        parser.add_argument('--no-warmup', action='store_true', help='Do not run core.warmup.warm_up in each worker first.')
+
+    def handle(self, *args, **options):
+        cores = min(options['processes'], os.cpu_count())
+        self.stdout.write(f"{options['logins']} logins, {options['processes']} processes on {cores} core(s)")
+        self.stdout.write(f"{'policy':<24} {'ok':>6} {'logins/sec':>11} {'per core':>9} {'per minute, 4 cores':>20}")
+        for label, hasher in (('default (full PBKDF2)', 'default'), ('student policy', 'pbkdf2_sha256_student')):
+            with override_settings(STUDENT_PASSWORD_HASHER=hasher):
+                ok, seconds = self.run_scenario(hasher, options)
+            per_core = ok / seconds / cores
+            self.stdout.write(f'{label:<24} {ok:>6} {ok / seconds:>11.1f} {per_core:>9.1f} {per_core * 4 * 60:>20.0f}')
+
+    def run_scenario(self, hasher, options):
+        # Workers run in separate processes, so the accounts have to be committed; they are removed afterwards
+        encoded = make_password(PASSWORD, hasher=hasher)
+        usernames = [f'__bench_login_{i}__' for i in range(options['logins'])]
+        CustomUser.objects.bulk_create(
+            [CustomUser(username=username, role='Student', password=encoded) for username in usernames],
+            batch_size=1000,
+        )
+        try:
+            connections.close_all()
+            results = multiprocessing.Queue()
+            workers = [
+                multiprocessing.Process(
+                    target=run_worker,
+                    args=(usernames[i::options['processes']], not options['no_warmup'], results),
+                )
+                for i in range(options['processes'])
+            ]
+            for worker in workers:
+                worker.start()
+            totals = [results.get() for _ in workers]
+            for worker in workers:
+                worker.join()
+        finally:
+            CustomUser.objects.filter(username__in=usernames).delete()
+        # Workers start together, so the slowest one bounds the storm
+        return sum(ok for ok, _ in totals), max(seconds for _, seconds in totals)
@@ -0,0 +1,132 @@
+import random
+import statistics
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import DatabaseError, connection, transaction
+from django.utils import timezone
+
+from core.archive import archive_cutoff, archive_results, has_completed_attempt
+from core.models import CustomUser, Subject, Test, StudentResult, ArchivedStudentResult
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed a multi-year StudentResult table inside a transaction, measure the hot table size and '
+        'dashboard query latency before and after archive_results, then roll everything back.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=500_000, help='Results to seed (default: 500,000).')
+        parser.add_argument('--years', type=int, default=5, help='Spread completion dates over this many years.')
+        parser.add_argument('--students', type=int, default=10_000)
+        parser.add_argument('--tests', type=int, default=300)
+        parser.add_argument('--days', type=int, help='Archive term in days (default: RESULT_ARCHIVE_AFTER_DAYS).')
+        parser.add_argument('--repeat', type=int, default=5, help='Timed runs per query; the median is reported.')
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                student, test = self.seed(options)
+                before = self.measure(student, test, options['repeat'])
+                started = time.perf_counter()
+                moved = archive_results(archive_cutoff(options['days']), batch_size=5000)
+                archive_seconds = time.perf_counter() - started
+                with connection.cursor() as cursor:
+                    cursor.execute('ANALYZE')
+                after = self.measure(student, test, options['repeat'])
+                raise Rollback
+        except Rollback:
+            pass
+
+        self.stdout.write(f'Archived {moved} result(s) in {archive_seconds:.1f}s')
+        self.stdout.write(f"{'measurement':<40} {'before':>12} {'after':>12}")
+        for name, value in before.items():
+            if isinstance(value, int):
+                self.stdout.write(f'{name:<40} {value:>12} {after[name]:>12}')
+            else:
+                self.stdout.write(f'{name:<40} {value:>12.2f} {after[name]:>12.2f}')
+
+    def seed(self, options):
+        started = time.perf_counter()
+        teacher = CustomUser.objects.create(username='__bench_teacher__', role='Teacher')
+        subject = Subject.objects.create(name='Benchmark', created_by=teacher)
+        tests = Test.objects.bulk_create(
+            [Test(test_name=f'Bench {i}', subject=subject, created_by=teacher, status='Published')
+             for i in range(options['tests'])],
+            batch_size=1000,
+        )
+        students = CustomUser.objects.bulk_create(
+            [CustomUser(username=f'__bench_student_{i}__', role='Student', password='!')
+             for i in range(options['students'])],
+            batch_size=1000,
+        )
+
+        now = timezone.now()
+        table = StudentResult._meta.db_table
+        columns = 'student_id, test_id, score_achieved, total_score, time_taken, completion_date, status'
+        sql = f'INSERT INTO {table} ({columns}) VALUES (%s, %s, %s, %s, %s, %s, %s)'
+        student_ids = [student.id for student in students]
+        test_ids = [test.id for test in tests]
+        with connection.cursor() as cursor:
+            remaining = options['rows']
+            while remaining:
+                batch = min(remaining, 50_000)
+                cursor.executemany(sql, [
+                    (
+                        random.choice(student_ids),
+                        random.choice(test_ids),
+                        random.randint(0, 25),
+                        25,
+                        random.randint(60, 3600),
+                        now - timedelta(days=random.randint(0, options['years'] * 365)),
+                        'Completed' if random.random() < 0.97 else 'Pending',
+                    )
+                    for _ in range(batch)
+                ])
+                remaining -= batch
+            cursor.execute('ANALYZE')
+        self.stdout.write(f"Seeded {options['rows']} results in {time.perf_counter() - started:.1f}s")
+        return CustomUser.objects.get(id=random.choice(student_ids)), Test.objects.get(id=random.choice(test_ids))
+
+    def measure(self, student, test, repeat):
+        measurements = {
+            'hot table rows': StudentResult.objects.count(),
+            'archive table rows': ArchivedStudentResult.objects.count(),
+        }
+        size = self.table_kib(StudentResult._meta.db_table)
+        if size is not None:
+            measurements['hot table KiB'] = size
+        queries = {
+            'admin dashboard ms (count + list)': lambda: (StudentResult.objects.count(), list(StudentResult.objects.all())),
+            'student dashboard ms (history)': lambda: list(StudentResult.objects.filter(student=student)),
+            'take_test attempt check ms': lambda: (
+                StudentResult.objects.filter(student=student, test=test, status='Pending').exists(),
+                has_completed_attempt(student, test),
+            ),
+        }
+        for name, run in queries.items():
+            samples = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                run()
+                samples.append((time.perf_counter() - started) * 1000)
+            measurements[name] = statistics.median(samples)
+        return measurements
+
+    def table_kib(self, table):
+        # The dbstat virtual table is only compiled into some SQLite builds
+        if connection.vendor != 'sqlite':
+            return None
+        with connection.cursor() as cursor:
+            try:
+                with transaction.atomic():
+                    cursor.execute('SELECT SUM(pgsize) FROM dbstat WHERE name = %s', [table])
+            except DatabaseError:
+                return None
+            return cursor.fetchone()[0] // 1024
@@ -0,0 +1,114 @@
+import random
+import statistics
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+
+from core.cohorts import assign_cohorts
+from core.models import CustomUser, Subject, Test, StudentResult
+from core.query_plans import critical_querysets, full_table_scans
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed a large StudentResult table inside a transaction, time the critical view queries '
+        'with and without the composite indexes, then roll everything back.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1_000_000, help='Results to seed (default: 1,000,000).')
+        parser.add_argument('--students', type=int, default=20_000)
+        parser.add_argument('--tests', type=int, default=500)
+        parser.add_argument('--repeat', type=int, default=5, help='Timed runs per query; the median is reported.')
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                querysets = self.seed(options)
+                with_indexes = self.time_queries(querysets, options['repeat'])
+                self.drop_indexes()
+                without_indexes = self.time_queries(querysets, options['repeat'])
+                raise Rollback
+        except Rollback:
+            pass
+
+        self.stdout.write(f"{'query':<45} {'indexed ms':>11} {'no index ms':>12} {'speedup':>8}")
+        for name, (indexed_ms, indexed_scans) in with_indexes.items():
+            plain_ms, _ = without_indexes[name]
+            speedup = plain_ms / indexed_ms if indexed_ms else float('inf')
+            flag = '  FULL SCAN: ' + ', '.join(indexed_scans) if indexed_scans else ''
+            self.stdout.write(f'{name:<45} {indexed_ms:>11.2f} {plain_ms:>12.2f} {speedup:>7.1f}x{flag}')
+
+    def seed(self, options):
+        started = time.perf_counter()
+        teacher = CustomUser.objects.create(username='__bench_teacher__', role='Teacher')
+        subject = Subject.objects.create(name='Benchmark', created_by=teacher)
+        tests = Test.objects.bulk_create(
+            [Test(test_name=f'Bench {i}', subject=subject, created_by=teacher, status='Published' if i % 10 == 0 else 'Archived')
+             for i in range(options['tests'])],
+            batch_size=1000,
+        )
+        groups = ['A', 'B', 'C', 'D', 'E']
+        students = CustomUser.objects.bulk_create(
+            assign_cohorts([CustomUser(username=f'__bench_student_{i}__', role='Student', password='!', student_groups=random.choice(groups))
+                            for i in range(options['students'])]),
+            batch_size=1000,
+        )
+
+        now = timezone.now()
+        table = StudentResult._meta.db_table
+        columns = 'student_id, test_id, score_achieved, total_score, time_taken, completion_date, status'
+        sql = f'INSERT INTO {table} ({columns}) VALUES (%s, %s, %s, %s, %s, %s, %s)'
+        student_ids = [student.id for student in students]
+        test_ids = [test.id for test in tests]
+        with connection.cursor() as cursor:
+            remaining = options['rows']
+            while remaining:
+                batch = min(remaining, 50_000)
+                cursor.executemany(sql, [
+                    (
+                        random.choice(student_ids),
+                        random.choice(test_ids),
+                        random.randint(0, 25),
+                        25,
+                        random.randint(60, 3600),
+                        now - timedelta(days=random.randint(0, 4 * 365)),
+                        'Completed' if random.random() < 0.97 else 'Pending',
+                    )
+                    for _ in range(batch)
+                ])
+                remaining -= batch
+            cursor.execute('ANALYZE')
+        self.stdout.write(f"Seeded {options['rows']} results in {time.perf_counter() - started:.1f}s")
+
+        return critical_querysets(
+            CustomUser.objects.get(id=random.choice(student_ids)),
+            Test.objects.get(id=random.choice(test_ids)),
+            teacher,
+            now - timedelta(days=3 * 365),
+        )
+
+    def time_queries(self, querysets, repeat):
+        timings = {}
+        for name, queryset in querysets.items():
+            samples = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                queryset.count()
+                samples.append((time.perf_counter() - started) * 1000)
+            timings[name] = (statistics.median(samples), full_table_scans(queryset) if connection.vendor == 'sqlite' else [])
+        return timings
+
+    def drop_indexes(self):
+        with connection.cursor() as cursor:
+            for model in (CustomUser, Test, StudentResult):
+                for index in model._meta.indexes:
+                    cursor.execute(f'DROP INDEX {connection.ops.quote_name(index.name)}')
+            cursor.execute('ANALYZE')
@@ -0,0 +1,68 @@
+import time
+
+from django.contrib.sessions.models import Session
+from django.core.cache import caches
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core.models import CustomUser
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Replay student page views with the default database sessions and with core.sessions, '
+        'and report session writes per request. All data is rolled back.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--students', type=int, default=20)
+        parser.add_argument('--requests', type=int, default=50, help='Page views per student.')
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"{'engine':<42} {'requests':>9} {'session writes':>15} {'writes/request':>15} {'ms/request':>11}")
+        engines = (
+            ('django.contrib.sessions.backends.db', 'default'),
+            ('django.contrib.sessions.backends.cached_db', 'sessions'),
+            ('core.sessions', 'sessions'),
+        )
+        for engine, cache_alias in engines:
+            with override_settings(SESSION_ENGINE=engine, SESSION_CACHE_ALIAS=cache_alias):
+                caches[cache_alias].clear()
+                requests, writes, seconds = self.run_engine(options)
+            self.stdout.write(
+                f'{engine:<42} {requests:>9} {writes:>15} {writes / requests:>15.2f} {seconds * 1000 / requests:>11.2f}'
+            )
+
+    def run_engine(self, options):
+        session_table = Session._meta.db_table
+        url = reverse('student_dashboard')
+        try:
+            with transaction.atomic():
+                clients = []
+                for i in range(options['students']):
+                    student = CustomUser.objects.create(username=f'__bench_session_{i}__', role='Student', password='!')
+                    client = Client(HTTP_HOST='localhost')
+                    client.force_login(student)
+                    clients.append(client)
+
+                started = time.perf_counter()
+                with CaptureQueriesContext(connection) as queries:
+                    for _ in range(options['requests']):
+                        for client in clients:
+                            client.get(url)
+                seconds = time.perf_counter() - started
+                writes = sum(
+                    1 for query in queries.captured_queries
+                    if session_table in query['sql'] and query['sql'].lstrip().startswith(('UPDATE', 'INSERT'))
+                )
+                raise Rollback
+        except Rollback:
+            pass
+        return options['requests'] * options['students'], writes, seconds
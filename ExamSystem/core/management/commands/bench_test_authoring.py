@@ -0,0 +1,57 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from core.authoring import create_questions
+from core.models import CustomUser, Subject, Test, Question, Answer
+
+
+class Rollback(Exception):
+    pass
+
+
+def create_questions_row_by_row(test, questions, points_value):
+    """
+    The previous create_test_view behaviour: one INSERT per question and per answer.
+    """
+    for question_text, answers in questions:
+        question = Question.objects.create(test=test, question_text=question_text, question_type='MCQ', points_value=points_value)
+        for answer_text, is_correct in answers:
+            Answer.objects.create(question=question, answer_text=answer_text, is_correct=is_correct)
+
+
+class Command(BaseCommand):
+    help = 'Compare wall time and query counts of row-by-row and bulk test creation. Nothing is kept in the database.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[50, 500, 5000], help='Question counts to benchmark.')
+        parser.add_argument('--answers', type=int, default=4, help='Answers per question (default: 4).')
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"{'questions':>10} {'strategy':>12} {'seconds':>10} {'queries':>10}")
+        for size in options['sizes']:
+            questions = [
+                (f'Benchmark question {i}', [(f'Answer {j}', j == 0) for j in range(options['answers'])])
+                for i in range(size)
+            ]
+            for label, strategy in (('row-by-row', create_questions_row_by_row), ('bulk', create_questions)):
+                seconds, queries = self.measure(strategy, questions)
+                self.stdout.write(f'{size:>10} {label:>12} {seconds:>10.3f} {queries:>10}')
+
+    def measure(self, strategy, questions):
+        try:
+            with transaction.atomic():
+                teacher = CustomUser.objects.create(username='__bench_teacher__', role='Teacher')
+                subject = Subject.objects.create(name='Benchmark', created_by=teacher)
+                with CaptureQueriesContext(connection) as ctx:
+                    started = time.perf_counter()
+                    with transaction.atomic():
+                        test = Test.objects.create(test_name='Benchmark', subject=subject, created_by=teacher)
+                        strategy(test, questions, 1)
+                    seconds = time.perf_counter() - started
+                raise Rollback
+        except Rollback:
+            pass
+        return seconds, len(ctx.captured_queries)
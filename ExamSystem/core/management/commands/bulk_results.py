@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.bulk_results import clear_results, preview_clear, preview_reopen, reopen_test_for_cohort
+from core.models import Test
+
+
+class Command(BaseCommand):
+    help = 'Reopen a test or clear results for a whole group, course or direction in one transaction.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('action', choices=['reopen', 'clear'])
+        parser.add_argument('--test', type=int, help='Test ID (required for reopen).')
+        parser.add_argument('--group', help='Student group, e.g. "A".')
+        parser.add_argument('--course', help='Student course.')
+        parser.add_argument('--direction', help='Student direction.')
+        parser.add_argument('--status', choices=['Pending', 'Completed'], help='Only clear results with this status.')
+        parser.add_argument('--dry-run', action='store_true', help='Only print how many rows would be affected.')
+
+    def handle(self, *args, **options):
+        test = None
+        if options['test'] is not None:
+            try:
+                test = Test.objects.get(id=options['test'])
+            except Test.DoesNotExist:
+                raise CommandError(f"Test {options['test']} does not exist.")
+        filters = {key: options[key] for key in ('group', 'course', 'direction')}
+
+        if options['action'] == 'reopen':
+            if test is None:
+                raise CommandError('--test is required to reopen a test.')
+            if options['dry_run']:
+                self.stdout.write(f'{preview_reopen(test, **filters)} student(s) would get a new retake attempt.')
+                return
+            created = reopen_test_for_cohort(test, **filters)
+            self.stdout.write(self.style.SUCCESS(f"Reopened '{test.test_name}' for {created} student(s)."))
+            return
+
+        try:
+            if options['dry_run']:
+                self.stdout.write(f"{preview_clear(test, options['status'], **filters)} result(s) would be deleted.")
+                return
+            deleted = clear_results(test, options['status'], **filters)
+        except ValueError:
+            raise CommandError('Pass --test, --status or a cohort filter before clearing results.')
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} result(s).'))
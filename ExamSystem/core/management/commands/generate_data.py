@@ -0,0 +1,265 @@
+import math
+import os
+import random
+import time
+from datetime import timedelta
+
+import openpyxl
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from core.cohorts import assign_cohorts
+from core.eligibility import sync_eligibility
+from core.hashers import student_password_hasher
+from core.models import CustomUser, Subject, Test, TestAssignment, TestEligibility, Question, Answer, StudentResult
+from core.question_bank import question_content_hash
+from core.question_search import index_questions
+
+PASSWORD = 'AB1234567'  # Every generated account logs in with this password
+DIRECTIONS = ['Computer Science', 'Mathematics', 'Physics', 'Economics', 'Law', 'Medicine', 'History', 'Linguistics']
+SUBJECT_NAMES = ['Algebra', 'Geometry', 'Calculus', 'Mechanics', 'Optics', 'Microeconomics', 'Statistics',
+                 'Programming', 'Databases', 'Civil law', 'Anatomy', 'World history', 'Grammar', 'Chemistry']
+
+
+class Command(BaseCommand):
+    help = (
+        'Generate synthetic subjects, teachers, students, tests, questions, answers and results for capacity '
+        'planning, with batched bulk_create (results with executemany). All accounts share one pre-computed password hash. '
+        'Optionally writes matching import workbooks for benchmarking the Excel import views.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--subjects', type=int, default=20)
+        parser.add_argument('--teachers', type=int, default=50)
+        parser.add_argument('--students', type=int, default=10_000)
+        parser.add_argument('--tests', type=int, default=200)
+        parser.add_argument('--questions', type=int, default=25, help='Questions per test.')
+        parser.add_argument('--answers', type=int, default=4, help='Answers per question, one of them correct.')
+        parser.add_argument('--results', type=int, default=100_000)
+        parser.add_argument('--assigned', type=float, default=0.5,
+                            help='Share of tests assigned to one group, course or direction; the rest are open to every student.')
+        parser.add_argument('--days', type=int, default=365, help='Results are spread over this many past days.')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--prefix', default='gen', help='Prefix for generated usernames (must be unused).')
+        parser.add_argument('--seed', type=int, help='Random seed, for reproducible data sets.')
+        parser.add_argument('--workbooks', metavar='DIR', help='Also write students.xlsx and test.xlsx import workbooks to DIR.')
+        parser.add_argument('--workbook-rows', type=int, default=1000, help='Students in the students.xlsx workbook.')
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        prefix = options['prefix']
+        if options['answers'] < 2:
+            raise CommandError('--answers must be at least 2.')
+        if CustomUser.objects.filter(username__startswith=f'{prefix}_').exists():
+            raise CommandError(f"Usernames starting with '{prefix}_' already exist; choose another --prefix.")
+
+        started = time.perf_counter()
+        teachers, students = self.generate_users(options)
+        subjects = self.timed('subjects', lambda: self.generate_subjects(teachers, options))
+        tests = self.timed('tests', lambda: self.generate_tests(subjects, options))
+        self.timed('assignments', lambda: self.generate_assignments(students, tests, options))
+        self.timed('questions and answers', lambda: self.generate_questions(tests, options))
+        self.timed('results', lambda: self.generate_results(students, tests, options))
+        self.timed('eligibility', lambda: self.generate_eligibility())
+        if options['workbooks']:
+            self.timed('workbooks', lambda: self.write_workbooks(options))
+        self.stdout.write(f'Done in {time.perf_counter() - started:.1f}s')
+
+    def timed(self, label, generate):
+        started = time.perf_counter()
+        generated = generate()
+        count = generated if isinstance(generated, int) else len(generated)
+        seconds = time.perf_counter() - started
+        self.stdout.write(f'{label:<22} {count:>10,} in {seconds:6.1f}s ({count / max(seconds, 1e-9):,.0f}/s)')
+        return generated
+
+    def bulk_create(self, model, objects):
+        """Insert `objects` (any iterable) in batches; returns the created objects with their primary keys."""
+        return model.objects.bulk_create(objects, batch_size=self.batch_size)
+
+    def generate_users(self, options):
+        # Hashing is the slow part of creating accounts, so hash once and share the result
+        teacher_password = make_password(PASSWORD)
+        student_password = make_password(PASSWORD, hasher=student_password_hasher())
+        prefix = options['prefix']
+
+        started = time.perf_counter()
+        teachers = self.bulk_create(CustomUser, [
+            CustomUser(username=f'{prefix}_teacher_{i}', role='Teacher', password=teacher_password,
+                       first_name=f'Teacher {i}')
+            for i in range(options['teachers'])
+        ])
+        students = self.bulk_create(CustomUser, assign_cohorts(
+            [self.student(prefix, i, student_password) for i in range(options['students'])]
+        ))
+        seconds = time.perf_counter() - started
+        self.stdout.write(f"{'users':<22} {len(teachers) + len(students):>10,} in {seconds:6.1f}s")
+        return teachers, students
+
+    def student(self, prefix, i, password):
+        course = self.random.randint(1, 4)
+        direction = self.random.choice(DIRECTIONS)
+        return CustomUser(
+            username=f'{prefix}_{i}',
+            role='Student',
+            password=password,
+            student_id=f'{prefix}_{i}',
+            student_full_name=f'Student {i}',
+            course=str(course),
+            student_groups=f'{direction[:3].upper()}-{course}{self.random.randint(1, 6):02d}',
+            student_direction=direction,
+        )
+
+    def generate_subjects(self, teachers, options):
+        return self.bulk_create(Subject, [
+            Subject(name=f'{SUBJECT_NAMES[i % len(SUBJECT_NAMES)]} {i // len(SUBJECT_NAMES) + 1}',
+                    created_by=self.random.choice(teachers))
+            for i in range(options['subjects'])
+        ])
+
+    def generate_tests(self, subjects, options):
+        return self.bulk_create(Test, [
+            Test(test_name=f'Test {i}', subject=subject, created_by=subject.created_by,
+                 total_time_minutes=self.random.choice([30, 45, 60, 90]),
+                 # Most tests are old exams; a few are live or still being written
+                 status=self.random.choices(['Published', 'Archived', 'Draft'], weights=[2, 7, 1])[0])
+            for i, subject in ((i, self.random.choice(subjects)) for i in range(options['tests']))
+        ])
+
+    def generate_assignments(self, students, tests, options):
+        if not students:
+            return []
+        assignments = []
+        for test in tests:
+            if self.random.random() < options['assigned']:
+                student = self.random.choice(students)
+                target, cohort_id = self.random.choice([
+                    ('student_group_id', student.cohort_group_id),
+                    ('course_id', student.cohort_course_id),
+                    ('direction_id', student.cohort_direction_id),
+                ])
+                assignments.append(TestAssignment(test=test, **{target: cohort_id}))
+        return self.bulk_create(TestAssignment, assignments)
+
+    def generate_eligibility(self):
+        # Bulk inserts send no post_save: materialise eligibility and can_start in one set-based pass at the end
+        sync_eligibility()
+        return TestEligibility.objects.count()
+
+    def generate_questions(self, tests, options):
+        created = 0
+        # Questions for a slice of tests at a time, then their answers, to keep memory flat
+        tests_per_batch = max(1, self.batch_size // max(1, options['questions']))
+        for start in range(0, len(tests), tests_per_batch):
+            questions = []
+            answer_lists = []
+            for test in tests[start:start + tests_per_batch]:
+                for j in range(options['questions']):
+                    text = f'{test.test_name}, question {j + 1}: which option is correct?'
+                    correct = self.random.randrange(options['answers'])
+                    answers = [(f'Option {k + 1}', k == correct) for k in range(options['answers'])]
+                    questions.append(Question(test=test, question_text=text, question_type='MCQ', points_value=1,
+                                              content_hash=question_content_hash(text, 'MCQ', answers)))
+                    answer_lists.append(answers)
+            with transaction.atomic():
+                questions = self.bulk_create(Question, questions)
+                self.bulk_create(Answer, [
+                    Answer(question=question, answer_text=text, is_correct=is_correct)
+                    for question, answers in zip(questions, answer_lists)
+                    for text, is_correct in answers
+                ])
+                index_questions(question.id for question in questions)
+            created += len(questions) * (1 + options['answers'])
+        return created
+
+    def generate_results(self, students, tests, options):
+        """
+        Scores follow a simple item-response model: each student has an ability and each test a difficulty,
+        and a student answers each question correctly with probability sigmoid(ability - difficulty).
+        Each (student, test) pair is used at most once until every pair is taken; further results are retakes.
+        """
+        taken = [test for test in tests if test.status != 'Draft'] or tests
+        if not students or not taken:
+            return 0
+        ability = [self.random.gauss(0.5, 1) for _ in students]
+        difficulty = [self.random.gauss(0, 0.7) for _ in taken]
+        questions = options['questions']
+        now = timezone.now()
+        pairs = len(students) * len(taken)
+
+        # Rows are inserted with executemany rather than bulk_create: at a million rows the ORM's per-row SQL
+        # compilation, not SQLite, is the bottleneck (about 5k rows/s against 13k here)
+        fields = [StudentResult._meta.get_field(name) for name in (
+            'student', 'test', 'score_achieved', 'total_score', 'time_taken', 'completion_date', 'status', 'responses'
+        )]
+        sql = 'INSERT INTO {} ({}) VALUES ({})'.format(
+            connection.ops.quote_name(StudentResult._meta.db_table),
+            ', '.join(connection.ops.quote_name(field.column) for field in fields),
+            ', '.join(['%s'] * len(fields)),
+        )
+
+        created = 0
+        with transaction.atomic(), connection.cursor() as cursor:
+            while created < options['results']:
+                count = min(options['results'] - created, pairs)
+                rows = []
+                for pair in self.random.sample(range(pairs), count):
+                    student_index, test_index = divmod(pair, len(taken))
+                    test = taken[test_index]
+                    if self.random.random() < 0.02:
+                        # A retake granted but not yet sat
+                        rows.append((students[student_index].id, test.id, None, None, None, None, 'Pending', '{}'))
+                    else:
+                        p = 1 / (1 + math.exp(difficulty[test_index] - ability[student_index]))
+                        # Normal approximation of Binomial(questions, p)
+                        score = round(self.random.gauss(questions * p, math.sqrt(questions * p * (1 - p))))
+                        completed_at = now - timedelta(seconds=self.random.randint(0, options['days'] * 86400))
+                        rows.append((
+                            students[student_index].id,
+                            test.id,
+                            min(questions, max(0, score)),
+                            questions,
+                            self.random.randint(test.total_time_minutes * 15, test.total_time_minutes * 60),
+                            connection.ops.adapt_datetimefield_value(completed_at),
+                            'Completed',
+                            '{}',
+                        ))
+                    if len(rows) == self.batch_size * 10:
+                        cursor.executemany(sql, rows)
+                        rows = []
+                cursor.executemany(sql, rows)
+                created += count
+        return created
+
+    def write_workbooks(self, options):
+        """
+        students.xlsx and test.xlsx in the formats of the student and test import views.
+        The students in students.xlsx are new (they do not collide with the generated accounts).
+        """
+        os.makedirs(options['workbooks'], exist_ok=True)
+        workbook = openpyxl.Workbook(write_only=True)
+        sheet = workbook.create_sheet('Students')
+        sheet.append(['student_id', 'full_name', 'passport_series', 'course', 'group', 'direction'])
+        for i in range(options['workbook_rows']):
+            student = self.student(f"{options['prefix']}_import", i, None)
+            sheet.append([student.student_id, student.student_full_name, PASSWORD, student.course,
+                          student.student_groups, student.student_direction])
+        workbook.save(os.path.join(options['workbooks'], 'students.xlsx'))
+
+        workbook = openpyxl.Workbook(write_only=True)
+        sheet = workbook.create_sheet('Questions and Answers')
+        header = ["Question Text (Only 'MCQ' supported)"]
+        for k in range(1, options['answers'] + 1):
+            header += [f'Answer {k} Text', f'Answer {k} Correct']
+        sheet.append(header)
+        for j in range(options['questions']):
+            correct = self.random.randrange(options['answers'])
+            row = [f'Imported question {j + 1}: which option is correct?']
+            for k in range(options['answers']):
+                row += [f'Option {k + 1}', k == correct]
+            sheet.append(row)
+        workbook.save(os.path.join(options['workbooks'], 'test.xlsx'))
+        return options['workbook_rows'] + options['questions']
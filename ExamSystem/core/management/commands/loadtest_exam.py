@@ -0,0 +1,242 @@
+import http.cookiejar
+import json
+import multiprocessing
+import os
+import random
+import re
+import statistics
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import defaultdict
+from datetime import datetime
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from core.authoring import create_questions
+from core.eligibility import sync_eligibility
+from core.hashers import student_password_hasher
+from core.models import CustomUser, Subject, Test
+from core.snapshots import publish_test_snapshot
+
+PASSWORD = 'AB1234567'
+ANSWER_RE = re.compile(r'name="question_(\d+)" id="answer_\d+" value="(\d+)"')
+SNAPSHOT_RE = re.compile(r'name="snapshot_version" value="(\d+)"')
+QUEUE_MARKER = 'id="queue-position"'
+
+
+class TestClientSession:
+    """
+    One student's browser, served in-process through the Django test client.
+    """
+
+    def __init__(self):
+        self.client = Client(raise_request_exception=False)
+
+    def get(self, path):
+        response = self.client.get(path)
+        return response.status_code, response.content.decode()
+
+    def post(self, path, data):
+        response = self.client.post(path, data)
+        return response.status_code, response.content.decode()
+
+
+class HttpSession:
+    """
+    One student's browser talking to a running server over HTTP, with cookies and CSRF tokens.
+    """
+
+    class NoRedirect(urllib.request.HTTPRedirectHandler):
+        def redirect_request(self, *args, **kwargs):
+            return None
+
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip('/')
+        self.cookies = http.cookiejar.CookieJar()
+        self.opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(self.cookies), self.NoRedirect)
+
+    def _open(self, request):
+        try:
+            with self.opener.open(request, timeout=60) as response:
+                return response.status, response.read().decode()
+        except urllib.error.HTTPError as exc:
+            return exc.code, exc.read().decode()
+
+    def get(self, path):
+        return self._open(urllib.request.Request(self.base_url + path))
+
+    def post(self, path, data):
+        token = next((cookie.value for cookie in self.cookies if cookie.name == 'csrftoken'), '')
+        body = urllib.parse.urlencode(dict(data, csrfmiddlewaretoken=token), doseq=True).encode()
+        return self._open(urllib.request.Request(
+            self.base_url + path, data=body, headers={'Referer': self.base_url + path},
+        ))
+
+
+def run_student(session, username, test_id, samples):
+    """
+    Walk one student through login, dashboard, the test (waiting in the admission queue if needed) and submission.
+    `samples` maps endpoint -> list of (milliseconds, ok). Returns True if the whole flow succeeded.
+    """
+    def request(endpoint, expected, method, path, data=None):
+        started = time.perf_counter()
+        try:
+            status, body = session.post(path, data) if method == 'post' else session.get(path)
+        except OSError:
+            status, body = None, ''
+        samples[endpoint].append(((time.perf_counter() - started) * 1000, status == expected))
+        return status == expected, body
+
+    login_path = reverse('login')
+    session.get(login_path)  # Sets the CSRF cookie, as a browser would
+    ok, _ = request('login', 302, 'post', login_path, {'username': username, 'password': PASSWORD})
+    ok = ok and request('student_dashboard', 200, 'get', reverse('student_dashboard'))[0]
+    if not ok:
+        return False
+
+    ok, page = request('take_test', 200, 'get', reverse('take_test', args=[test_id]))
+    while ok and QUEUE_MARKER in page:
+        time.sleep(random.uniform(2, 4))  # The waiting room polls, then reloads once admitted
+        request('admission_status', 200, 'get', reverse('admission_status', args=[test_id]))
+        ok, page = request('take_test', 200, 'get', reverse('take_test', args=[test_id]))
+    if not ok:
+        return False
+
+    answers = defaultdict(list)
+    for question_id, answer_id in ANSWER_RE.findall(page):
+        answers[question_id].append(answer_id)
+    data = {f'question_{question_id}': random.choice(choices) for question_id, choices in answers.items()}
+    snapshot = SNAPSHOT_RE.search(page)
+    data.update(snapshot_version=snapshot.group(1) if snapshot else '', time_taken=random.randint(300, 1800))
+    return request('submit_test', 302, 'post', reverse('submit_test', args=[test_id]), data)[0]
+
+
+def run_worker(usernames, test_id, base_url, results):
+    samples = defaultdict(list)
+    completed = 0
+    for username in usernames:
+        session = HttpSession(base_url) if base_url else TestClientSession()
+        completed += run_student(session, username, test_id, samples)
+    connections.close_all()
+    results.put((completed, dict(samples)))
+
+
+def percentile(sorted_values, fraction):
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+
+class Command(BaseCommand):
+    help = (
+        'End-to-end exam load test: N students log in, open the dashboard, take a test and submit it, '
+        'spread over several processes. Reports throughput, p50/p95/p99 and error rate per endpoint, '
+        'and saves the run as JSON. Seeded students and the test are deleted afterwards.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--students', type=int, default=200)
+        parser.add_argument('--processes', type=int, default=os.cpu_count())
+        parser.add_argument('--questions', type=int, default=25)
+        parser.add_argument('--base-url', help='Drive a running server (e.g. http://127.0.0.1:8000) instead of the test client.')
+        parser.add_argument('--output', help='JSON results file (default: loadtest-results/exam-<timestamp>.json).')
+
+    @override_settings(ALLOWED_HOSTS=['testserver', 'localhost', '127.0.0.1'])
+    def handle(self, *args, **options):
+        usernames = [f'__loadtest_{i}__' for i in range(options['students'])]
+        try:
+            test = self.seed(options)
+            connections.close_all()  # Forked workers open their own connections
+            results = multiprocessing.Queue()
+            workers = [
+                multiprocessing.Process(
+                    target=run_worker,
+                    args=(usernames[i::options['processes']], test.id, options['base_url'], results),
+                )
+                for i in range(options['processes'])
+            ]
+            started = time.perf_counter()
+            for worker in workers:
+                worker.start()
+            outcomes = [results.get() for _ in workers]
+            for worker in workers:
+                worker.join()
+            seconds = time.perf_counter() - started
+        finally:
+            # Also whatever a failed seed left behind: the teacher's subject and test go with it
+            CustomUser.objects.filter(username__startswith='__loadtest_').delete()
+
+        report = self.report(options, outcomes, seconds)
+        self.write_report(report, options)
+
+    def seed(self, options):
+        teacher = CustomUser.objects.create(username='__loadtest_teacher__', role='Teacher')
+        subject = Subject.objects.create(name='Load test', created_by=teacher)
+        test = Test.objects.create(test_name='Load test', subject=subject, created_by=teacher, status='Published')
+        create_questions(test, [
+            (f'Question {i}', [(f'Answer {j}', j == 0) for j in range(4)])
+            for i in range(options['questions'])
+        ], 1)
+        publish_test_snapshot(test)
+        # One hash for everyone: hashing per student would dominate the set-up time
+        password = make_password(PASSWORD, hasher=student_password_hasher())
+        CustomUser.objects.bulk_create(
+            [CustomUser(username=f'__loadtest_{i}__', role='Student', password=password) for i in range(options['students'])],
+            batch_size=1000,
+        )
+        # bulk_create sends no post_save: make the test startable for the new students in one set-based pass
+        sync_eligibility(test_ids=[test.id])
+        return test
+
+    def report(self, options, outcomes, seconds):
+        samples = defaultdict(list)
+        for _, worker_samples in outcomes:
+            for endpoint, values in worker_samples.items():
+                samples[endpoint].extend(values)
+        endpoints = {}
+        for endpoint, values in samples.items():
+            latencies = sorted(ms for ms, _ in values)
+            errors = sum(1 for _, ok in values if not ok)
+            endpoints[endpoint] = {
+                'requests': len(values),
+                'errors': errors,
+                'error_rate': errors / len(values),
+                'p50_ms': round(statistics.median(latencies), 1),
+                'p95_ms': round(percentile(latencies, 0.95), 1),
+                'p99_ms': round(percentile(latencies, 0.99), 1),
+            }
+        total_requests = sum(endpoint['requests'] for endpoint in endpoints.values())
+        return {
+            'run_at': datetime.now().isoformat(timespec='seconds'),
+            'target': options['base_url'] or 'test client',
+            'students': options['students'],
+            'processes': options['processes'],
+            'questions': options['questions'],
+            'seconds': round(seconds, 2),
+            'completed_flows': sum(completed for completed, _ in outcomes),
+            'requests_per_second': round(total_requests / seconds, 1),
+            'flows_per_minute': round(sum(completed for completed, _ in outcomes) / seconds * 60, 1),
+            'endpoints': endpoints,
+        }
+
+    def write_report(self, report, options):
+        self.stdout.write(
+            f"{report['completed_flows']}/{report['students']} students completed in {report['seconds']}s "
+            f"({report['requests_per_second']} req/s, {report['flows_per_minute']} exams/min)"
+        )
+        self.stdout.write(f"{'endpoint':<18} {'requests':>9} {'error rate':>11} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+        for endpoint, stats in report['endpoints'].items():
+            self.stdout.write(
+                f"{endpoint:<18} {stats['requests']:>9} {stats['error_rate']:>10.1%} "
+                f"{stats['p50_ms']:>8} {stats['p95_ms']:>8} {stats['p99_ms']:>8}"
+            )
+
+        path = options['output'] or os.path.join('loadtest-results', f"exam-{datetime.now():%Y%m%d-%H%M%S}.json")
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(path, 'w') as output:
+            json.dump(report, output, indent=2)
+        self.stdout.write(f'Results saved to {path}')
@@ -0,0 +1,113 @@
+import multiprocessing
+import os
+import random
+import sqlite3
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.sqlite import apply_sqlite_pragmas
+
+SCHEMA = """
+CREATE TABLE result (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    student_id INTEGER NOT NULL,
+    test_id INTEGER NOT NULL,
+    score REAL,
+    status VARCHAR(10) NOT NULL
+);
+CREATE INDEX result_student_test_status ON result (student_id, test_id, status);
+"""
+
+
+def run_worker(path, worker_id, submissions, tuned, pragmas, results):
+    """
+    Replay the submit_test_view write pattern: look up the pending attempt, then update or insert,
+    with a dashboard-style read between submissions.
+    """
+    # The defaults match an untuned Django SQLite connection: 5 s timeout, rollback journal, deferred transactions
+    connection = sqlite3.connect(path, timeout=20 if tuned else 5, isolation_level=None)
+    cursor = connection.cursor()
+    if tuned:
+        apply_sqlite_pragmas(cursor, pragmas)
+    begin = 'BEGIN IMMEDIATE' if tuned else 'BEGIN'
+
+    ok = locked = 0
+    for i in range(submissions):
+        student_id = worker_id * submissions + i
+        try:
+            cursor.execute('SELECT COUNT(*) FROM result WHERE test_id = 1')
+            cursor.fetchone()
+            cursor.execute(begin)
+            cursor.execute(
+                "SELECT id FROM result WHERE student_id = ? AND test_id = 1 AND status = 'Pending'", [student_id]
+            )
+            row = cursor.fetchone()
+            if row:
+                cursor.execute("UPDATE result SET score = ?, status = 'Completed' WHERE id = ?", [random.random() * 25, row[0]])
+            else:
+                cursor.execute(
+                    "INSERT INTO result (student_id, test_id, score, status) VALUES (?, 1, ?, 'Completed')",
+                    [student_id, random.random() * 25],
+                )
+            cursor.execute('COMMIT')
+            ok += 1
+        except sqlite3.OperationalError as exc:
+            if 'locked' not in str(exc) and 'busy' not in str(exc):
+                raise
+            locked += 1
+            if connection.in_transaction:
+                cursor.execute('ROLLBACK')
+    connection.close()
+    results.put((ok, locked))
+
+
+class Command(BaseCommand):
+    help = (
+        'Multi-process SQLite submission load test. Runs the same workload against an untuned '
+        'database and with the high-concurrency settings, and reports the "database is locked" rate.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=8)
+        parser.add_argument('--submissions', type=int, default=200, help='Submissions per process.')
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"{'mode':<18} {'submitted':>10} {'locked':>8} {'error rate':>11} {'per second':>11}")
+        for label, tuned in (('default', False), ('high-concurrency', True)):
+            with tempfile.TemporaryDirectory() as directory:
+                path = os.path.join(directory, 'loadtest.sqlite3')
+                setup = sqlite3.connect(path)
+                setup.executescript(SCHEMA)
+                # Half of the students have a pending retake, so both the UPDATE and INSERT paths run
+                setup.executemany(
+                    "INSERT INTO result (student_id, test_id, status) VALUES (?, 1, 'Pending')",
+                    [(i,) for i in range(0, options['processes'] * options['submissions'], 2)],
+                )
+                setup.commit()
+                setup.close()
+
+                ok, locked, seconds = self.run_scenario(path, tuned, options)
+            total = ok + locked
+            rate = locked / total if total else 0
+            self.stdout.write(f'{label:<18} {ok:>10} {locked:>8} {rate:>10.1%} {ok / seconds:>11.0f}')
+
+    def run_scenario(self, path, tuned, options):
+        results = multiprocessing.Queue()
+        workers = [
+            multiprocessing.Process(
+                target=run_worker,
+                args=(path, worker_id, options['submissions'], tuned, settings.SQLITE_PRAGMAS, results),
+            )
+            for worker_id in range(options['processes'])
+        ]
+        started = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        totals = [results.get() for _ in workers]
+        for worker in workers:
+            worker.join()
+        seconds = time.perf_counter() - started
+        return sum(ok for ok, _ in totals), sum(locked for _, locked in totals), seconds
@@ -0,0 +1,21 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from core.question_search import rebuild_question_index, search_index_available
+
+
+class Command(BaseCommand):
+    help = (
+        'Rebuild the full-text question search index from the question and answer tables, '
+        'e.g. after loaddata, raw SQL imports or deleting answers outside the test editor.'
+    )
+
+    def handle(self, *args, **options):
+        if not search_index_available():
+            raise CommandError(f'No question search index on the {connection.vendor} database (it needs SQLite FTS5).')
+        started = time.perf_counter()
+        with transaction.atomic():
+            count = rebuild_question_index()
+        self.stdout.write(self.style.SUCCESS(f'Indexed {count:,} question(s) in {time.perf_counter() - started:.1f}s.'))
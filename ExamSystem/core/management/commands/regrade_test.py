@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.models import Test
+from core.regrade import REGRADE_BATCH_SIZE, RegradePlan, apply_regrade
+
+
+class Command(BaseCommand):
+    help = "Re-grade every submitted attempt of a test (archived ones included) against the test's current answer key."
+
+    def add_arguments(self, parser):
+        parser.add_argument('test_id', type=int)
+        parser.add_argument('--batch-size', type=int, default=REGRADE_BATCH_SIZE, help='Results updated per transaction.')
+        parser.add_argument('--dry-run', action='store_true', help='Only print how many scores would change.')
+
+    def handle(self, *args, **options):
+        try:
+            test = Test.objects.get(id=options['test_id'])
+        except Test.DoesNotExist:
+            raise CommandError(f"Test {options['test_id']} does not exist.")
+
+        plan = RegradePlan(test)
+        summary = f'{plan.changed} of {plan.checked} attempt(s), {plan.skipped} skipped (no stored responses)'
+        if options['dry_run']:
+            self.stdout.write(f"'{test.test_name}': {summary} would change ({plan.seconds:.2f}s).")
+            return
+        audit = apply_regrade(plan, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Re-graded '{test.test_name}': {summary} changed in {audit.seconds:.2f}s (audit {audit.id})."))
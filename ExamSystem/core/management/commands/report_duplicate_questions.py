@@ -0,0 +1,53 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+
+from core.models import Question
+from core.question_bank import refresh_content_hashes
+
+
+class Command(BaseCommand):
+    help = 'List clusters of questions in the bank that share the same normalised content.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--teacher', help='Only report questions from tests created by this username.')
+        parser.add_argument('--min-size', type=int, default=2, help='Smallest cluster size to report (default: 2).')
+        parser.add_argument('--refresh', action='store_true', help='Recompute all content hashes before reporting.')
+
+    def handle(self, *args, **options):
+        questions = Question.objects.all()
+        if options['teacher']:
+            questions = questions.filter(test__created_by__username=options['teacher'])
+
+        if options['refresh']:
+            updated = refresh_content_hashes(questions)
+            self.stdout.write(f'Refreshed {updated} content hash(es).')
+
+        clusters = (
+            questions.exclude(content_hash='')
+            .values('content_hash')
+            .annotate(size=Count('id'))
+            .filter(size__gte=options['min_size'])
+            .order_by('-size', 'content_hash')
+        )
+        cluster_sizes = {row['content_hash']: row['size'] for row in clusters}
+        if not cluster_sizes:
+            self.stdout.write('No duplicate questions found.')
+            return
+
+        members = {}
+        rows = (
+            questions.filter(content_hash__in=cluster_sizes)
+            .order_by('id')
+            .values_list('content_hash', 'id', 'question_text', 'test__test_name')
+        )
+        for content_hash, question_id, question_text, test_name in rows:
+            members.setdefault(content_hash, []).append((question_id, question_text, test_name))
+
+        for content_hash, size in cluster_sizes.items():
+            first_text = members[content_hash][0][1]
+            self.stdout.write(self.style.WARNING(f'{size} copies [{content_hash[:12]}] {first_text[:60]}'))
+            for question_id, _, test_name in members[content_hash]:
+                self.stdout.write(f'    question #{question_id} in "{test_name}"')
+
+        duplicate_rows = sum(cluster_sizes.values()) - len(cluster_sizes)
+        self.stdout.write(f'{len(cluster_sizes)} duplicate cluster(s), {duplicate_rows} redundant question(s).')
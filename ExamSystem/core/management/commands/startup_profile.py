@@ -0,0 +1,69 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.spreadsheets import MODULES_IMPORTED_LAZILY
+
+# Run in a fresh interpreter: load the WSGI application and the URLconf (and with it every view module),
+# i.e. what a new worker pays before it can answer its first request
+PROBE = '''
+import json, resource, sys, time
+started = time.perf_counter()
+from ExamSystem.wsgi import application
+from django.urls import get_resolver
+get_resolver().url_patterns
+seconds = time.perf_counter() - started
+rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+print(json.dumps({'seconds': seconds, 'rss_mb': rss_mb, 'modules': sorted({name.split('.')[0] for name in sys.modules})}))
+'''
+
+
+def probe_worker_start():
+    """Start a fresh interpreter as a worker would; returns {'seconds', 'rss_mb', 'modules'}."""
+    env = dict(os.environ)
+    env.setdefault('DJANGO_SETTINGS_MODULE', 'ExamSystem.settings')
+    env.pop('EXAM_WARMUP', None)  # Measure the import cost alone
+    output = subprocess.run(
+        [sys.executable, '-c', PROBE], cwd=settings.BASE_DIR, env=env, capture_output=True, text=True, check=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure worker cold start: time to load the WSGI application and URLconf in a fresh interpreter, '
+        'and its peak RSS. Fails if the median exceeds STARTUP_BUDGET or a lazily imported module '
+        '(pandas, numpy, openpyxl) is loaded at startup.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=5, help='Cold starts to measure; the median is reported.')
+        parser.add_argument('--no-check', action='store_true', help='Report only, do not fail on budget overruns.')
+
+    def handle(self, *args, **options):
+        runs = [probe_worker_start() for _ in range(options['runs'])]
+        seconds = statistics.median(run['seconds'] for run in runs)
+        rss_mb = statistics.median(run['rss_mb'] for run in runs)
+        eager = sorted(set(MODULES_IMPORTED_LAZILY) & set(runs[0]['modules']))
+
+        budget = settings.STARTUP_BUDGET
+        self.stdout.write(f"{'':<16} {'median':>8} {'min':>8} {'max':>8} {'budget':>8}")
+        for label, key, value, unit in (('cold start', 'seconds', seconds, 's'), ('peak RSS', 'rss_mb', rss_mb, 'MB')):
+            values = [run[key] for run in runs]
+            self.stdout.write(
+                f'{label:<16} {value:>7.2f}{unit[0]} {min(values):>7.2f}{unit[0]} {max(values):>7.2f}{unit[0]} '
+                f'{budget[key] if budget.get(key) is not None else "-":>8}'
+            )
+        self.stdout.write(f"{len(runs[0]['modules'])} top-level modules loaded; eagerly loaded heavy modules: {', '.join(eager) or 'none'}")
+
+        problems = [f'{key} {value:.2f} > {budget[key]}' for key, value in (('seconds', seconds), ('rss_mb', rss_mb))
+                    if budget.get(key) is not None and value > budget[key]]
+        if eager:
+            problems.append(f"{', '.join(eager)} imported at startup (use core.spreadsheets)")
+        if problems and not options['no_check']:
+            raise CommandError('Worker startup over budget: ' + '; '.join(problems))
@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core.eligibility import sync_eligibility
+from core.models import TestEligibility
+
+
+class Command(BaseCommand):
+    help = (
+        'Rebuild the per-student eligible-test table from test status, assignments, cohorts and results, '
+        'e.g. after loaddata, raw SQL imports or bulk updates that sent no signals.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--test', type=int, action='append', dest='tests', help='Only this test id (repeatable).')
+        parser.add_argument('--student', type=int, action='append', dest='students', help='Only this student id (repeatable).')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        with transaction.atomic():
+            sync_eligibility(test_ids=options['tests'], student_ids=options['students'])
+        self.stdout.write(self.style.SUCCESS(
+            f'{TestEligibility.objects.count():,} eligible (student, test) pair(s) after {time.perf_counter() - started:.1f}s.'
+        ))
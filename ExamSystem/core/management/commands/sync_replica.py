@@ -0,0 +1,42 @@
+import sqlite3
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.routers import replica_alias
+
+
+class Command(BaseCommand):
+    help = 'Copy the primary SQLite database onto the read replica file with the SQLite backup API.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=int, default=0, help='Keep syncing every N seconds (default: sync once).')
+
+    def handle(self, *args, **options):
+        primary = settings.DATABASES['default']
+        replica = settings.DATABASES.get(replica_alias())
+        if replica is None:
+            raise CommandError('No replica database is configured. Set EXAM_REPLICA_DB to the replica file path.')
+        engines = {primary['ENGINE'], replica['ENGINE']}
+        if engines != {'django.db.backends.sqlite3'}:
+            raise CommandError('sync_replica only copies SQLite databases; use your database replication otherwise.')
+
+        while True:
+            started = time.perf_counter()
+            self.sync(str(primary['NAME']), str(replica['NAME']))
+            self.stdout.write(f"Synced replica in {time.perf_counter() - started:.2f}s")
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
+
+    def sync(self, primary_path, replica_path):
+        # Copy in place rather than swapping files, so replica connections kept open
+        # by persistent-connection workers see the new data instead of the old inode
+        source = sqlite3.connect(primary_path)
+        target = sqlite3.connect(replica_path)
+        try:
+            source.backup(target)
+        finally:
+            target.close()
+            source.close()
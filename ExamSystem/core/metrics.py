@@ -0,0 +1,308 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+
+# Upper bounds in seconds; a final +Inf bucket is always added
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+
+class Registry:
+    """
+    In-process metrics. Updates only touch a dict under a lock; a background timer writes this process's
+    values to METRICS_DIR/<pid>.json at most once per METRICS_FLUSH_INTERVAL seconds.
+    collect() adds up the files of every worker, so any process can serve the totals.
+    Without METRICS_DIR the registry only reports this process.
+    """
+
+    def __init__(self, directory=None, flush_interval=None):
+        self._directory = directory
+        self._flush_interval = flush_interval
+        self._metrics = {}
+        self._values = {}
+        self._collectors = []
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+        self._timer = None
+
+    @property
+    def directory(self):
+        return self._directory if self._directory is not None else getattr(settings, 'METRICS_DIR', None)
+
+    @property
+    def flush_interval(self):
+        return self._flush_interval if self._flush_interval is not None else getattr(settings, 'METRICS_FLUSH_INTERVAL', 1.0)
+
+    def register(self, metric):
+        if metric.name in self._metrics:
+            raise ValueError(f'Metric {metric.name} is already registered.')
+        self._metrics[metric.name] = metric
+        return metric
+
+    def register_collector(self, collector):
+        """
+        `collector()` is called at collection time and returns {metric name: [(labels, value), ...]} for gauges
+        that are cheaper to read on demand than to keep up to date (e.g. queue depths).
+        """
+        self._collectors.append(collector)
+        return collector
+
+    def update(self, name, labels, change):
+        key = json.dumps(sorted(labels.items()))
+        with self._lock:
+            if os.getpid() != self._pid:
+                # Forked worker: the values inherited from the parent are the parent's to report
+                self._pid = os.getpid()
+                self._values = {}
+                self._timer = None
+            values = self._values.setdefault(name, {})
+            values[key] = change(values.get(key))
+            if self._timer is None and self.directory:
+                self._timer = threading.Timer(self.flush_interval, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def flush(self):
+        """Write this process's values to its file in the metrics directory."""
+        directory = self.directory
+        with self._lock:
+            self._timer = None
+            if not directory:
+                return
+            data = json.dumps(self._values)
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f'{os.getpid()}.json')
+        with open(f'{path}.tmp', 'w') as output:
+            output.write(data)
+        os.replace(f'{path}.tmp', path)
+
+    def _process_values(self):
+        """(values, alive) per worker process."""
+        directory = self.directory
+        if not directory:
+            with self._lock:
+                return [(json.loads(json.dumps(self._values)), True)]
+        self.flush()
+        values = []
+        for filename in os.listdir(directory):
+            if filename.endswith('.json'):
+                try:
+                    with open(os.path.join(directory, filename)) as source:
+                        values.append((json.load(source), _process_alive(filename[:-len('.json')])))
+                except (OSError, ValueError):
+                    continue  # A file being replaced or removed right now
+        return values
+
+    def collect(self):
+        """
+        The totals over all worker processes, as {metric name: {labels key: value}}.
+        Workers that have exited still count towards counters and histograms, but not gauges: their
+        in-flight values (attempts in progress) ended with them.
+        """
+        totals = {}
+        for process_values, alive in self._process_values():
+            for name, values in process_values.items():
+                metric = self._metrics.get(name)
+                if metric is None or (metric.kind == 'gauge' and not alive):
+                    continue
+                merged = totals.setdefault(name, {})
+                for key, value in values.items():
+                    merged[key] = metric.merge(merged.get(key), value)
+        for collector in self._collectors:
+            for name, values in collector().items():
+                totals[name] = {json.dumps(sorted(labels.items())): value for labels, value in values}
+        return totals
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format (version 0.0.4)."""
+        totals = self.collect()
+        lines = []
+        for name, metric in sorted(self._metrics.items()):
+            lines.append(f'# HELP {name} {metric.documentation}')
+            lines.append(f'# TYPE {name} {metric.kind}')
+            for key, value in sorted(totals.get(name, {}).items()):
+                lines.extend(metric.sample_lines(dict(json.loads(key)), value))
+        return '\n'.join(lines) + '\n'
+
+
+def _process_alive(pid):
+    """Whether the process that wrote `<pid>.json` is still running; unknown names count as running."""
+    if os.name != 'posix' or not pid.isdigit():
+        return True  # os.kill() terminates processes on Windows
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True  # Running as another user
+    return True
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    escaped = (
+        (key, str(value).replace('\\', r'\\').replace('\n', r'\n').replace('"', r'\"'))
+        for key, value in sorted(labels.items())
+    )
+    return '{' + ','.join(f'{key}="{value}"' for key, value in escaped) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value))
+
+
+class Metric:
+    kind = None
+
+    def __init__(self, name, documentation, registry=None):
+        self.name = name
+        self.documentation = documentation
+        self.registry = registry or REGISTRY
+        self.registry.register(self)
+
+    def merge(self, total, value):
+        return value if total is None else total + value
+
+    def sample_lines(self, labels, value):
+        return [f'{self.name}{_format_labels(labels)} {_format_value(value)}']
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        self.registry.update(self.name, labels, lambda value: (value or 0) + amount)
+
+
+class Gauge(Metric):
+    """
+    A value that goes up and down. Totals are summed over processes, so use inc()/dec() for
+    things like attempts in progress that may start in one worker and finish in another.
+    """
+    kind = 'gauge'
+
+    def inc(self, amount=1, **labels):
+        self.registry.update(self.name, labels, lambda value: (value or 0) + amount)
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value, **labels):
+        self.registry.update(self.name, labels, lambda _: value)
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, buckets=DEFAULT_BUCKETS, registry=None):
+        self.buckets = tuple(buckets)
+        super().__init__(name, documentation, registry)
+
+    def observe(self, value, **labels):
+        def add(state):
+            # [count per bucket..., count above the last bucket, sum]
+            state = state or [0] * (len(self.buckets) + 1) + [0.0]
+            index = next((i for i, bound in enumerate(self.buckets) if value <= bound), len(self.buckets))
+            state[index] += 1
+            state[-1] += value
+            return state
+        self.registry.update(self.name, labels, add)
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def merge(self, total, value):
+        return value if total is None else [a + b for a, b in zip(total, value)]
+
+    def sample_lines(self, labels, state):
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float('inf'),), state[:-1]):
+            cumulative += count
+            lines.append(f'{self.name}_bucket{_format_labels(dict(labels, le=_format_value(bound)))} {cumulative}')
+        lines.append(f'{self.name}_sum{_format_labels(labels)} {_format_value(state[-1])}')
+        lines.append(f'{self.name}_count{_format_labels(labels)} {cumulative}')
+        return lines
+
+
+REGISTRY = Registry()
+
+LOGINS = Counter('exam_logins_total', 'Login attempts by outcome (success, failure).')
+LOGIN_SECONDS = Histogram('exam_login_seconds', 'Time to handle a login POST, including password hashing.')
+TAKE_TEST_REQUESTS = Counter('exam_take_test_total', 'take_test requests by outcome (served, queued, refused).')
+TAKE_TEST_SECONDS = Histogram('exam_take_test_seconds', 'Time to serve a test paper.')
+ACTIVE_ATTEMPTS = Gauge('exam_active_attempts', 'Attempts started (paper served) and not yet submitted.')
+SUBMISSIONS = Counter('exam_submissions_total', 'Submitted attempts.')
+SUBMIT_SECONDS = Histogram('exam_submit_seconds', 'Time to handle a submission, grading and saving included.')
+GRADING_SECONDS = Histogram(
+    'exam_grading_seconds', 'Time to grade one submission against its snapshot.',
+    buckets=(0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1),
+)
+IMPORTS = Counter('exam_imports_total', 'Excel imports by kind (test, students) and outcome (success, failure).')
+IMPORT_ROWS = Counter('exam_import_rows_total', 'Rows created by Excel imports, by kind.')
+IMPORT_SECONDS = Histogram('exam_import_seconds', 'Time to handle an Excel import, by kind.')
+EXPORTS = Counter('exam_exports_total', 'Result exports by format (xlsx, csv).')
+EXPORT_SECONDS = Histogram('exam_export_seconds', 'Time to build a result export, by format.')
+ADMISSION_QUEUE_DEPTH = Gauge('exam_admission_queue_depth', 'Students waiting in the admission queue, by test.')
+ADMISSION_ADMITTED = Gauge('exam_admission_admitted', 'Students admitted by admission control, by test.')
+
+# Session key holding the ids of tests whose attempt this session has counted in ACTIVE_ATTEMPTS
+ACTIVE_ATTEMPTS_SESSION_KEY = '_metrics_active_attempts'
+
+
+def attempt_started(request, test_id):
+    """Count an attempt as active the first time its paper is served in this session."""
+    started = request.session.get(ACTIVE_ATTEMPTS_SESSION_KEY, [])
+    if test_id not in started:
+        request.session[ACTIVE_ATTEMPTS_SESSION_KEY] = started + [test_id]
+        ACTIVE_ATTEMPTS.inc()
+
+
+def attempt_finished(request, test_id):
+    started = request.session.get(ACTIVE_ATTEMPTS_SESSION_KEY, [])
+    if test_id in started:
+        request.session[ACTIVE_ATTEMPTS_SESSION_KEY] = [other for other in started if other != test_id]
+        ACTIVE_ATTEMPTS.dec()
+
+
+async def aattempt_started(request, test_id):
+    """See attempt_started()."""
+    started = await request.session.aget(ACTIVE_ATTEMPTS_SESSION_KEY, [])
+    if test_id not in started:
+        await request.session.aset(ACTIVE_ATTEMPTS_SESSION_KEY, started + [test_id])
+        ACTIVE_ATTEMPTS.inc()
+
+
+async def aattempt_finished(request, test_id):
+    """See attempt_finished()."""
+    started = await request.session.aget(ACTIVE_ATTEMPTS_SESSION_KEY, [])
+    if test_id in started:
+        await request.session.aset(ACTIVE_ATTEMPTS_SESSION_KEY, [other for other in started if other != test_id])
+        ACTIVE_ATTEMPTS.dec()
+
+
+@REGISTRY.register_collector
+def admission_counters():
+    """Queue depth and admissions of published tests, read from the shared admission state at scrape time."""
+    from .admission import AdmissionController
+    from .models import Test
+
+    depth, admitted = [], []
+    for test_id in Test.objects.filter(status='Published').values_list('id', flat=True):
+        controller = AdmissionController(test_id)
+        counters = controller.peek() if controller.enabled else None
+        if counters is not None:
+            depth.append(({'test_id': test_id}, counters['queued']))
+            admitted.append(({'test_id': test_id}, counters['admitted']))
+    return {ADMISSION_QUEUE_DEPTH.name: depth, ADMISSION_ADMITTED.name: admitted}
@@ -0,0 +1,69 @@
+from functools import partial
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.contrib.auth.middleware import AuthenticationMiddleware
+from django.utils.functional import SimpleLazyObject
+
+from .auth_cache import get_cached_user
+from .profiling import check_budget, finish_request_stats, start_request_stats
+
+
+async def acached_user(request):
+    if not hasattr(request, '_acached_user'):
+        request._acached_user = await sync_to_async(get_cached_user)(request)
+    return request._acached_user
+
+
+class CachedAuthenticationMiddleware(AuthenticationMiddleware):
+    """
+    AuthenticationMiddleware that serves request.user (and request.auser() in async views)
+    from the per-session user cache (see core/auth_cache.py) instead of reading the user row on every request.
+    """
+
+    def process_request(self, request):
+        super().process_request(request)
+        request.user = SimpleLazyObject(lambda: get_cached_user(request))
+        request.auser = partial(acached_user, request)
+
+
+class QueryBudgetMiddleware:
+    """
+    Record each request's query count, database time, template render time and response size,
+    and check them against the view's budget (QUERY_BUDGETS in core/urls.py).
+    Requests over budget are logged to 'core.slow_requests', or fail in strict mode.
+    Async-capable, so that under ASGI it does not push the async exam API onto sync threads.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        stats, token = start_request_stats()
+        try:
+            response = self.get_response(request)
+        finally:
+            finish_request_stats(token)
+        return self._finish(request, response, stats)
+
+    async def __acall__(self, request):
+        # Queries are counted by core.profiling.record_query(), which every connection has from creation on
+        # and which reads the stats from the context, including in the threads the async ORM runs in
+        stats, token = start_request_stats()
+        try:
+            response = await self.get_response(request)
+        finally:
+            finish_request_stats(token)
+        return self._finish(request, response, stats)
+
+    def _finish(self, request, response, stats):
+        if not response.streaming:
+            stats.response_bytes = len(response.content)
+        match = getattr(request, 'resolver_match', None)
+        check_budget(match.view_name if match else None, request.path, stats)
+        return response
@@ -0,0 +1,58 @@
+# Generated by Django 5.2.18 on 2026-10-19 07:50
+
+import hashlib
+import unicodedata
+
+from django.db import migrations, models
+
+
+# Frozen copies of core.question_bank.normalise_text() and question_content_hash() as of this migration
+def normalise_text(text):
+    text = unicodedata.normalize('NFKC', str(text or ''))
+    return ' '.join(text.casefold().split())
+
+
+def question_content_hash(question_text, question_type='MCQ', answers=()):
+    answer_parts = sorted(
+        f"{'1' if is_correct else '0'}:{normalise_text(answer_text)}"
+        for answer_text, is_correct in answers
+    )
+    payload = '\x1f'.join([question_type or 'MCQ', normalise_text(question_text)] + answer_parts)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def backfill_content_hashes(apps, schema_editor):
+    Question = apps.get_model('core', 'Question')
+    Answer = apps.get_model('core', 'Answer')
+
+    answers_by_question = {}
+    for question_id, answer_text, is_correct in Answer.objects.values_list('question_id', 'answer_text', 'is_correct'):
+        answers_by_question.setdefault(question_id, []).append((answer_text, is_correct))
+
+    questions = list(Question.objects.only('id', 'question_text', 'question_type'))
+    for question in questions:
+        question.content_hash = question_content_hash(
+            question.question_text, question.question_type, answers_by_question.get(question.id, ())
+        )
+    Question.objects.bulk_update(questions, ['content_hash'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_customuser_course_customuser_student_full_name_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customuser',
+            name='student_direction',
+            field=models.CharField(blank=True, max_length=200, null=True),
+        ),
+        migrations.AddField(
+            model_name='question',
+            name='content_hash',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=64),
+        ),
+        migrations.RunPython(backfill_content_hashes, migrations.RunPython.noop),
+    ]
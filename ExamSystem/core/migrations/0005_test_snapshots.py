@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-19 07:53
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_customuser_student_direction_question_content_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='test',
+            name='published_version',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='TestSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.PositiveIntegerField()),
+                ('payload', models.JSONField()),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('test', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='snapshots', to='core.test')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('test', 'version'), name='unique_test_snapshot_version')],
+            },
+        ),
+    ]
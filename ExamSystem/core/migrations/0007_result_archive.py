@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-19 08:02
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_query_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedStudentResult',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score_achieved', models.FloatField(blank=True, default=0.0, null=True)),
+                ('total_score', models.FloatField(blank=True, default=0.0, null=True)),
+                ('time_taken', models.IntegerField(blank=True, default=0, null=True)),
+                ('completion_date', models.DateTimeField(blank=True, null=True)),
+                ('status', models.CharField(choices=[('Pending', 'Pending'), ('Completed', 'Completed')], default='Completed', max_length=10)),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_results', to=settings.AUTH_USER_MODEL)),
+                ('test', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_results', to='core.test')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['student', 'test'], name='archived_student_test_idx'), models.Index(fields=['completion_date'], name='archived_completion_date_idx')],
+            },
+        ),
+    ]
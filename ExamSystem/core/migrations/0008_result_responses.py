@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-19 08:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_result_archive'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='archivedstudentresult',
+            name='responses',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name='archivedstudentresult',
+            name='snapshot_version',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='studentresult',
+            name='responses',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name='studentresult',
+            name='snapshot_version',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+    ]
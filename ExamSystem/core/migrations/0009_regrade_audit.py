@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-19 08:45
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_result_responses'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RegradeAudit',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('answer_key', models.JSONField(default=dict)),
+                ('attempts_checked', models.PositiveIntegerField(default=0)),
+                ('attempts_changed', models.PositiveIntegerField(default=0)),
+                ('attempts_skipped', models.PositiveIntegerField(default=0)),
+                ('changes', models.JSONField(default=dict)),
+                ('seconds', models.FloatField(default=0.0)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('performed_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='regrades_performed', to=settings.AUTH_USER_MODEL)),
+                ('test', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='regrade_audits', to='core.test')),
+            ],
+        ),
+    ]
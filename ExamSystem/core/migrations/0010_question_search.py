@@ -0,0 +1,46 @@
+# Generated by Django 5.2.18 on 2026-10-19 09:02
+
+from django.db import migrations
+
+# Frozen copies of core.question_search.SEARCH_TABLE and INDEX_SQL as they were when this migration was written
+SEARCH_TABLE = 'core_question_search'
+
+
+def create_search_index(apps, schema_editor):
+    """
+    FTS5 index over question and answer text, one row per question with rowid = core_question.id.
+    SQLite only: on other databases search_questions() falls back to substring matching.
+    """
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(
+        f'CREATE VIRTUAL TABLE {SEARCH_TABLE} USING fts5('
+        "question_text, answer_text, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+    )
+    tables = {
+        'search': SEARCH_TABLE,
+        'question': apps.get_model('core', 'Question')._meta.db_table,
+        'answer': apps.get_model('core', 'Answer')._meta.db_table,
+    }
+    schema_editor.execute(
+        'INSERT INTO {search} (rowid, question_text, answer_text) '
+        "SELECT q.id, q.question_text, COALESCE(group_concat(a.answer_text, char(10)), '') "
+        'FROM {question} q LEFT JOIN {answer} a ON a.question_id = q.id '
+        'GROUP BY q.id'.format(**tables)
+    )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute(f'DROP TABLE IF EXISTS {SEARCH_TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_regrade_audit'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,87 @@
+# Generated by Django 5.2.18 on 2026-10-19 08:56
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+from django.db.models.functions import Trim
+
+# CustomUser text field -> (cohort foreign key, cohort model)
+COHORT_FIELDS = {
+    'student_groups': ('cohort_group', 'StudentGroup'),
+    'course': ('cohort_course', 'Course'),
+    'student_direction': ('cohort_direction', 'Direction'),
+}
+
+
+def backfill_cohorts(apps, schema_editor):
+    """
+    One row per distinct trimmed value of each text field, then one set-based UPDATE per field.
+    """
+    CustomUser = apps.get_model('core', 'CustomUser')
+    for text_field, (foreign_key, model_name) in COHORT_FIELDS.items():
+        Cohort = apps.get_model('core', model_name)
+        values = CustomUser.objects.exclude(**{f'{text_field}__isnull': True}).values_list(text_field, flat=True).distinct()
+        names = {value.strip() for value in values} - {''}
+        Cohort.objects.bulk_create([Cohort(name=name) for name in sorted(names)], batch_size=500)
+        CustomUser.objects.exclude(**{f'{text_field}__isnull': True}).update(**{
+            foreign_key: Subquery(Cohort.objects.filter(name=Trim(OuterRef(text_field))).values('id')[:1]),
+        })
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_question_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Course',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=200, unique=True)),
+            ],
+            options={
+                'ordering': ['name'],
+                'abstract': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='Direction',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=200, unique=True)),
+            ],
+            options={
+                'ordering': ['name'],
+                'abstract': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='StudentGroup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=200, unique=True)),
+            ],
+            options={
+                'ordering': ['name'],
+                'abstract': False,
+            },
+        ),
+        migrations.AddField(
+            model_name='customuser',
+            name='cohort_course',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='students', to='core.course'),
+        ),
+        migrations.AddField(
+            model_name='customuser',
+            name='cohort_direction',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='students', to='core.direction'),
+        ),
+        migrations.AddField(
+            model_name='customuser',
+            name='cohort_group',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='students', to='core.studentgroup'),
+        ),
+        migrations.RunPython(backfill_cohorts, migrations.RunPython.noop),
+    ]
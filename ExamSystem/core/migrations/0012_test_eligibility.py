@@ -0,0 +1,67 @@
+# Generated by Django 5.2.18 on 2026-10-19 09:03
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+def materialise_eligibility(apps, schema_editor):
+    """
+    Existing tests have no assignments: every student is eligible for every Published test. can_start
+    is true with a pending retake or without a completed attempt, live or archived. A frozen copy of
+    what core.eligibility.sync_eligibility() did when this migration was written.
+    """
+    tables = {
+        name: apps.get_model('core', model)._meta.db_table
+        for name, model in [('eligibility', 'TestEligibility'), ('test', 'Test'), ('user', 'CustomUser'),
+                            ('result', 'StudentResult'), ('archived', 'ArchivedStudentResult')]
+    }
+    schema_editor.execute(
+        'INSERT INTO {eligibility} (student_id, test_id, can_start) '
+        'SELECT u.id, t.id, (EXISTS ('
+        "    SELECT 1 FROM {result} r WHERE r.student_id = u.id AND r.test_id = t.id AND r.status = 'Pending'"
+        ') OR NOT ('
+        "    EXISTS (SELECT 1 FROM {result} r WHERE r.student_id = u.id AND r.test_id = t.id AND r.status = 'Completed')"
+        '    OR EXISTS (SELECT 1 FROM {archived} a WHERE a.student_id = u.id AND a.test_id = t.id)'
+        ')) '
+        "FROM {test} t CROSS JOIN {user} u WHERE t.status = 'Published' AND u.role = 'Student'".format(**tables)
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_student_cohorts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TestAssignment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('course', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='assignments', to='core.course')),
+                ('direction', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='assignments', to='core.direction')),
+                ('student', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='test_assignments', to=settings.AUTH_USER_MODEL)),
+                ('student_group', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='assignments', to='core.studentgroup')),
+                ('test', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='assignments', to='core.test')),
+            ],
+            options={
+                'constraints': [models.CheckConstraint(condition=models.Q(models.Q(('course__isnull', True), ('direction__isnull', True), ('student__isnull', True), ('student_group__isnull', False)), models.Q(('course__isnull', False), ('direction__isnull', True), ('student__isnull', True), ('student_group__isnull', True)), models.Q(('course__isnull', True), ('direction__isnull', False), ('student__isnull', True), ('student_group__isnull', True)), models.Q(('course__isnull', True), ('direction__isnull', True), ('student__isnull', False), ('student_group__isnull', True)), _connector='OR'), name='test_assignment_one_target')],
+            },
+        ),
+        migrations.CreateModel(
+            name='TestEligibility',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('can_start', models.BooleanField(default=True)),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='eligible_tests', to=settings.AUTH_USER_MODEL)),
+                ('test', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='eligible_students', to='core.test')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('student', 'test'), name='unique_test_eligibility')],
+            },
+        ),
+        migrations.RunPython(materialise_eligibility, migrations.RunPython.noop),
+    ]
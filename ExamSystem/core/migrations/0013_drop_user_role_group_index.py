@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-19 09:46
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_test_eligibility'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='customuser',
+            name='user_role_group_idx',
+        ),
+    ]
@@ -1,7 +1,37 @@
+from django.contrib.auth.hashers import acheck_password, check_password
 from django.contrib.auth.models import AbstractUser
 from django.db import models
 from django.utils import timezone
 
+from .hashers import make_student_password, student_password_hasher
+
+
+class Cohort(models.Model):
+    """
+    A named set of students. The student_groups, course and student_direction text of CustomUser
+    are normalised into these tables (see core/cohorts.py).
+    """
+    name = models.CharField(max_length=200, unique=True)
+
+    class Meta:
+        abstract = True
+        ordering = ['name']
+
+    def __str__(self):
+        return self.name
+
+
+class StudentGroup(Cohort):
+    pass
+
+
+class Course(Cohort):
+    pass
+
+
+class Direction(Cohort):
+    pass
+
 
 class CustomUser(AbstractUser):
     ROLE_CHOICES = [
@@ -19,11 +49,44 @@ class CustomUser(AbstractUser):
     student_groups = models.CharField(max_length=200, blank=True, null=True)
     course = models.CharField(max_length=200, blank=True, null=True)
     student_direction = models.CharField(max_length=200, blank=True, null=True)
-
+    # The text fields above, resolved to cohort rows on save and on import; filter and group on these
+    cohort_group = models.ForeignKey(StudentGroup, on_delete=models.SET_NULL, null=True, blank=True, related_name='students')
+    cohort_course = models.ForeignKey(Course, on_delete=models.SET_NULL, null=True, blank=True, related_name='students')
+    cohort_direction = models.ForeignKey(Direction, on_delete=models.SET_NULL, null=True, blank=True, related_name='students')
 
     def __str__(self):
         return f"{self.username} ({self.role})"
 
+    def _preferred_hasher(self):
+        return student_password_hasher() if self.role == 'Student' else 'default'
+
+    def set_password(self, raw_password):
+        if self.role != 'Student':
+            return super().set_password(raw_password)
+        self.password = make_student_password(raw_password)
+        self._password = raw_password
+
+    def check_password(self, raw_password):
+        """
+        Like AbstractBaseUser.check_password, but a hash that does not match the role's hasher policy
+        is rewritten with that policy on a successful login.
+        """
+        def setter(raw_password):
+            self.set_password(raw_password)
+            # Password hash upgrades shouldn't be considered password changes
+            self._password = None
+            self.save(update_fields=['password'])
+
+        return check_password(raw_password, self.password, setter, preferred=self._preferred_hasher())
+
+    async def acheck_password(self, raw_password):
+        async def setter(raw_password):
+            self.set_password(raw_password)
+            self._password = None
+            await self.asave(update_fields=['password'])
+
+        return await acheck_password(raw_password, self.password, setter, preferred=self._preferred_hasher())
+
 
 class Subject(models.Model):
     name = models.CharField(max_length=200)
@@ -47,13 +110,101 @@ class Test(models.Model):
     created_by = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='tests_created')
     total_time_minutes = models.IntegerField(default=60)  # Time in minutes
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='Draft')
+    # Version of the TestSnapshot students are currently served; null until first published
+    published_version = models.PositiveIntegerField(null=True, blank=True)
     created_at = models.DateTimeField(default=timezone.now)
     updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status'], name='test_status_idx'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        test = super().from_db(db, field_names, values)
+        # Status as loaded, so post_save receivers can tell a publish or unpublish from an ordinary edit
+        test._loaded_status = test.__dict__.get('status')
+        return test
     
     def __str__(self):
         return self.test_name
 
 
+class TestSnapshot(models.Model):
+    """
+    Immutable serialised copy of a published test: questions, answers, answer key and points.
+    """
+    test = models.ForeignKey(Test, on_delete=models.CASCADE, related_name='snapshots')
+    version = models.PositiveIntegerField()
+    payload = models.JSONField()
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['test', 'version'], name='unique_test_snapshot_version'),
+        ]
+
+    def __str__(self):
+        return f"{self.test_id} v{self.version}"
+
+
+class TestAssignment(models.Model):
+    """
+    Who may take a test: one student group, course, direction or single student per row.
+    A test without assignments is open to every student.
+    """
+    test = models.ForeignKey(Test, on_delete=models.CASCADE, related_name='assignments')
+    student_group = models.ForeignKey(StudentGroup, on_delete=models.CASCADE, null=True, blank=True, related_name='assignments')
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, null=True, blank=True, related_name='assignments')
+    direction = models.ForeignKey(Direction, on_delete=models.CASCADE, null=True, blank=True, related_name='assignments')
+    student = models.ForeignKey(CustomUser, on_delete=models.CASCADE, null=True, blank=True, related_name='test_assignments')
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        constraints = [
+            models.CheckConstraint(
+                condition=(
+                    models.Q(student_group__isnull=False, course__isnull=True, direction__isnull=True, student__isnull=True)
+                    | models.Q(student_group__isnull=True, course__isnull=False, direction__isnull=True, student__isnull=True)
+                    | models.Q(student_group__isnull=True, course__isnull=True, direction__isnull=False, student__isnull=True)
+                    | models.Q(student_group__isnull=True, course__isnull=True, direction__isnull=True, student__isnull=False)
+                ),
+                name='test_assignment_one_target',
+            ),
+        ]
+
+    @property
+    def target(self):
+        return self.student_group or self.course or self.direction or self.student
+
+    @property
+    def kind(self):
+        return next(kind for kind in ('student_group', 'course', 'direction', 'student') if getattr(self, f'{kind}_id'))
+
+    def __str__(self):
+        return f"{self.test_id} -> {self.target}"
+
+
+class TestEligibility(models.Model):
+    """
+    Materialised (student, Published test) pairs the student may see, kept in sync by core/eligibility.py
+    from test status, assignments and cohort membership. can_start caches whether the student may start
+    an attempt now: a pending retake, or no completed attempt (live or archived).
+    """
+    student = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='eligible_tests')
+    test = models.ForeignKey(Test, on_delete=models.CASCADE, related_name='eligible_students')
+    can_start = models.BooleanField(default=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['student', 'test'], name='unique_test_eligibility'),
+        ]
+
+    def __str__(self):
+        return f"{self.student_id} -> {self.test_id}"
+
+
 class Question(models.Model):
     QUESTION_TYPE_CHOICES = [
         ('MCQ', 'Multiple Choice'),
@@ -65,6 +216,8 @@ class Question(models.Model):
     question_text = models.TextField()
     question_type = models.CharField(max_length=10, choices=QUESTION_TYPE_CHOICES, default='MCQ')
     points_value = models.IntegerField(default=1)
+    # Normalised hash of the question and its answers, used to spot duplicates in the bank
+    content_hash = models.CharField(max_length=64, blank=True, default='', db_index=True)
     created_at = models.DateTimeField(default=timezone.now)
     
     def __str__(self):
@@ -94,6 +247,66 @@ class StudentResult(models.Model):
     time_taken = models.IntegerField(default=0, null=True, blank=True)  # Time in seconds
     completion_date = models.DateTimeField(null=True, blank=True)
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='Pending')
+    # Question id -> submitted answer (both strings), kept up to date by autosave and submission
+    responses = models.JSONField(default=dict, blank=True)
+    # The TestSnapshot version the attempt was served and graded against
+    snapshot_version = models.PositiveIntegerField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['student', 'test', 'status'], name='result_student_test_status_idx'),
+            models.Index(fields=['test', 'status'], name='result_test_status_idx'),
+            models.Index(fields=['completion_date'], name='result_completion_date_idx'),
+        ]
     
     def __str__(self):
         return f"{self.student.username} - {self.test.test_name}: {self.score_achieved}/{self.total_score} ({self.status})"
+
+
+class ArchivedStudentResult(models.Model):
+    """
+    Completed results moved out of StudentResult by `manage.py archive_results`.
+    Rows keep the id they had in StudentResult.
+    """
+    student = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='archived_results')
+    test = models.ForeignKey(Test, on_delete=models.CASCADE, related_name='archived_results')
+    score_achieved = models.FloatField(default=0.0, null=True, blank=True)
+    total_score = models.FloatField(default=0.0, null=True, blank=True)
+    time_taken = models.IntegerField(default=0, null=True, blank=True)  # Time in seconds
+    completion_date = models.DateTimeField(null=True, blank=True)
+    status = models.CharField(max_length=10, choices=StudentResult.STATUS_CHOICES, default='Completed')
+    responses = models.JSONField(default=dict, blank=True)
+    snapshot_version = models.PositiveIntegerField(null=True, blank=True)
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['student', 'test'], name='archived_student_test_idx'),
+            models.Index(fields=['completion_date'], name='archived_completion_date_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.student.username} - {self.test.test_name}: {self.score_achieved}/{self.total_score} (archived)"
+
+
+class RegradeAudit(models.Model):
+    """
+    One re-grade of a test's submitted attempts against its current answer key (see core/regrade.py).
+    """
+    test = models.ForeignKey(Test, on_delete=models.CASCADE, related_name='regrade_audits')
+    performed_by = models.ForeignKey(
+        CustomUser, on_delete=models.SET_NULL, null=True, blank=True, related_name='regrades_performed'
+    )
+    # Question id -> correct answer ids applied, as in PublishedTest.answer_key
+    answer_key = models.JSONField(default=dict)
+    attempts_checked = models.PositiveIntegerField(default=0)
+    attempts_changed = models.PositiveIntegerField(default=0)
+    # Attempts submitted before responses were stored, which cannot be re-graded
+    attempts_skipped = models.PositiveIntegerField(default=0)
+    # {'results': {id: [old, new]}, 'archived_results': {id: [old, new]}} for every changed score
+    changes = models.JSONField(default=dict)
+    seconds = models.FloatField(default=0.0)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"{self.test.test_name} re-graded {self.created_at:%Y-%m-%d %H:%M}: {self.attempts_changed} changed"
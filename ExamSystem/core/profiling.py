@@ -0,0 +1,101 @@
+import logging
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+
+logger = logging.getLogger('core.slow_requests')
+
+# The RequestStats of the request being handled, if QueryBudgetMiddleware is active
+_current_stats = ContextVar('request_stats', default=None)
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+class RequestStats:
+    """
+    What one request cost: queries, time spent in the database and in templates, and response size.
+    """
+
+    def __init__(self):
+        self.queries = 0
+        self.db_ms = 0.0
+        self.template_ms = 0.0
+        self.response_bytes = 0
+
+    def as_dict(self):
+        return {
+            'queries': self.queries,
+            'db_ms': round(self.db_ms, 1),
+            'template_ms': round(self.template_ms, 1),
+            'response_bytes': self.response_bytes,
+        }
+
+
+def current_stats():
+    return _current_stats.get()
+
+
+def record_query(execute, sql, params, many, context):
+    """
+    Execute wrapper that counts the query towards the current request's RequestStats, if any.
+    Installed once per connection, it finds the request through the context, so concurrent async requests
+    sharing the ORM thread's connection each count their own queries.
+    """
+    stats = _current_stats.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.queries += 1
+        stats.db_ms += (time.perf_counter() - started) * 1000
+
+
+def install_query_recorder(sender, connection, **kwargs):
+    """connection_created receiver: put record_query() in front of the connection's execute wrappers."""
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, record_query)
+
+
+def start_request_stats():
+    stats = RequestStats()
+    return stats, _current_stats.set(stats)
+
+
+def finish_request_stats(token):
+    _current_stats.reset(token)
+
+
+def record_template_time(ms):
+    stats = _current_stats.get()
+    if stats is not None:
+        stats.template_ms += ms
+
+
+def budget_for(view_name):
+    """
+    The budget for a URL name: the defaults from settings.QUERY_BUDGET_DEFAULTS,
+    overridden by the entry for the view in QUERY_BUDGETS in core/urls.py.
+    """
+    from .urls import QUERY_BUDGETS
+    return dict(settings.QUERY_BUDGET_DEFAULTS, **QUERY_BUDGETS.get(view_name, {}))
+
+
+def check_budget(view_name, path, stats):
+    """
+    Log requests that went over their view's budget; in strict mode raise QueryBudgetExceeded instead.
+    """
+    budget = budget_for(view_name)
+    measured = stats.as_dict()
+    exceeded = {key: (measured[key], limit) for key, limit in budget.items() if limit is not None and measured[key] > limit}
+    if not exceeded:
+        return
+    details = ', '.join(f'{key} {value} > {limit}' for key, (value, limit) in exceeded.items())
+    message = f'{view_name or path} over budget: {details}'
+    if getattr(settings, 'QUERY_BUDGET_STRICT', False):
+        raise QueryBudgetExceeded(message)
+    logger.warning(message, extra={'view_name': view_name, 'path': path, **measured})
@@ -0,0 +1,34 @@
+import re
+
+from .models import CustomUser, Subject, Test, TestEligibility, StudentResult, ArchivedStudentResult
+
+# A SQLite plan step that reads a whole core table (or a whole index of it) instead of searching it
+FULL_SCAN_RE = re.compile(r'\bSCAN (core_\w+)')
+
+
+def critical_querysets(student, test, teacher, completed_before):
+    """
+    The hot lookups issued by core/views.py, keyed by a short description.
+    Shared by the query-plan tests and the bench_result_indexes command.
+    """
+    return {
+        'pending attempt (take/submit)': StudentResult.objects.filter(student=student, test=test, status='Pending'),
+        'completed attempt (take)': StudentResult.objects.filter(student=student, test=test, status='Completed'),
+        'archived attempt (take)': ArchivedStudentResult.objects.filter(student=student, test=test),
+        'student results (student dashboard)': StudentResult.objects.filter(student=student),
+        'eligible tests (student dashboard)': TestEligibility.objects.filter(student=student),
+        'eligibility for a test (take/submit)': TestEligibility.objects.filter(student=student, test=test),
+        'results of a test by status (bulk reopen)': StudentResult.objects.filter(test=test, status='Completed'),
+        'results completed before a date (archive)': StudentResult.objects.filter(completion_date__lt=completed_before),
+        'students in a group (bulk operations)': CustomUser.objects.filter(role='Student', cohort_group__name='A'),
+        'teacher tests (teacher dashboard)': Test.objects.filter(created_by=teacher),
+        'teacher subjects (teacher dashboard)': Subject.objects.filter(created_by=teacher),
+    }
+
+
+def full_table_scans(queryset):
+    """
+    Return the core tables the SQLite query plan for `queryset` scans in full.
+    """
+    plan = queryset.explain()
+    return FULL_SCAN_RE.findall(plan)
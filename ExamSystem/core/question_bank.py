@@ -0,0 +1,72 @@
+import hashlib
+import unicodedata
+
+from django.contrib import messages
+
+from .models import Question
+
+
+def normalise_text(text):
+    """
+    Normalise text for content hashing: unicode-fold, lowercase and collapse whitespace.
+    """
+    text = unicodedata.normalize('NFKC', str(text or ''))
+    return ' '.join(text.casefold().split())
+
+
+def question_content_hash(question_text, question_type='MCQ', answers=()):
+    """
+    Return the hex SHA-256 of a question and its answers.
+    `answers` is an iterable of (answer_text, is_correct) pairs; order does not matter.
+    """
+    answer_parts = sorted(
+        f"{'1' if is_correct else '0'}:{normalise_text(answer_text)}"
+        for answer_text, is_correct in answers
+    )
+    payload = '\x1f'.join([question_type or 'MCQ', normalise_text(question_text)] + answer_parts)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def refresh_content_hashes(questions):
+    """
+    Recompute and store content hashes for the given Question queryset.
+    """
+    changed = []
+    for question in questions.prefetch_related('answers'):
+        content_hash = question_content_hash(
+            question.question_text,
+            question.question_type,
+            [(answer.answer_text, answer.is_correct) for answer in question.answers.all()],
+        )
+        if question.content_hash != content_hash:
+            question.content_hash = content_hash
+            changed.append(question)
+    Question.objects.bulk_update(changed, ['content_hash'], batch_size=500)
+    return len(changed)
+
+
+def existing_content_hashes(content_hashes, teacher=None, exclude_test=None):
+    """
+    Return the subset of `content_hashes` already present in the question bank,
+    optionally limited to tests created by `teacher`. One indexed lookup per batch.
+    """
+    content_hashes = set(content_hashes)
+    if not content_hashes:
+        return set()
+    questions = Question.objects.filter(content_hash__in=content_hashes)
+    if teacher is not None:
+        questions = questions.filter(test__created_by=teacher)
+    if exclude_test is not None:
+        questions = questions.exclude(test=exclude_test)
+    return set(questions.values_list('content_hash', flat=True).distinct())
+
+
+def warn_about_duplicates(request, content_hashes, exclude_test=None):
+    """
+    Add a message telling the teacher how many of the given questions are already in their bank.
+    """
+    duplicates = existing_content_hashes(content_hashes, teacher=request.user, exclude_test=exclude_test)
+    if duplicates:
+        count = sum(1 for content_hash in content_hashes if content_hash in duplicates)
+        messages.info(request, f'{count} question(s) already exist in your question bank.')
+    return duplicates
@@ -0,0 +1,187 @@
+import re
+
+from django.db import connection, connections, transaction
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+from .models import Question, Answer
+
+# FTS5 table over the question bank, one row per question with rowid = Question.id (created by migration 0010)
+SEARCH_TABLE = 'core_question_search'
+INDEX_BATCH_SIZE = 500
+MAX_RESULTS = 100
+RANKED_MATCHES = 5000
+
+# Question text weighs more than answer text in the ranking (bm25 weights, in column order)
+RANK = f'bm25({SEARCH_TABLE}, 2.0, 1.0)'
+
+INDEX_SQL = f'''
+    INSERT INTO {SEARCH_TABLE} (rowid, question_text, answer_text)
+    SELECT q.id, q.question_text, COALESCE(group_concat(a.answer_text, char(10)), '')
+    FROM core_question q LEFT JOIN core_answer a ON a.question_id = q.id
+    {{where}}
+    GROUP BY q.id
+'''
+
+
+def search_index_available(using=connection):
+    """True when the database has the FTS5 question index (SQLite only). A positive answer is kept per connection."""
+    if using.vendor != 'sqlite':
+        return False
+    if not getattr(using, '_question_search_available', False):
+        using._question_search_available = SEARCH_TABLE in using.introspection.table_names()
+    return using._question_search_available
+
+
+def index_questions(question_ids):
+    """
+    (Re)write the index rows of the given questions from their current text and answers.
+    Call after any write that bypasses post_save (bulk_create, bulk_update, queryset.update()).
+    Rows of questions deleted since are removed.
+    """
+    if not search_index_available():
+        return
+    question_ids = sorted(set(question_ids))
+    with connection.cursor() as cursor:
+        for start in range(0, len(question_ids), INDEX_BATCH_SIZE):
+            batch = question_ids[start:start + INDEX_BATCH_SIZE]
+            placeholders = ', '.join(['%s'] * len(batch))
+            cursor.execute(f'DELETE FROM {SEARCH_TABLE} WHERE rowid IN ({placeholders})', batch)
+            cursor.execute(INDEX_SQL.format(where=f'WHERE q.id IN ({placeholders})'), batch)
+
+
+def index_test_questions(test_id):
+    """
+    Re-index every question of a test, e.g. after an edit that created, changed and deleted some.
+    Two statements whatever the size of the test; rows of deleted questions are left to rebuild_question_index().
+    """
+    if not search_index_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {SEARCH_TABLE} WHERE rowid IN (SELECT id FROM core_question WHERE test_id = %s)', [test_id])
+        cursor.execute(INDEX_SQL.format(where='WHERE q.test_id = %s'), [test_id])
+
+
+def rebuild_question_index():
+    """
+    Rebuild the whole index from the question and answer tables, dropping rows of deleted questions.
+    Returns the number of questions indexed.
+    """
+    if not search_index_available():
+        return 0
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {SEARCH_TABLE}')
+        cursor.execute(INDEX_SQL.format(where=''))
+        cursor.execute(f"INSERT INTO {SEARCH_TABLE} ({SEARCH_TABLE}) VALUES ('optimize')")
+        cursor.execute(f'SELECT count(*) FROM {SEARCH_TABLE}')
+        return cursor.fetchone()[0]
+
+
+def index_question_on_change(sender, instance, raw=False, **kwargs):
+    """
+    post_save receiver for Question and Answer that keeps the saved question's index row current.
+    Deleted questions need no receiver: search joins the index to core_question, so their rows never match.
+    """
+    if raw:
+        return  # loaddata: the index is rebuilt afterwards with rebuild_question_search
+    index_questions([instance.question_id if isinstance(instance, Answer) else instance.id])
+
+
+class _PendingReindex:
+    """Questions whose answers were deleted in the current transaction, re-indexed on commit."""
+
+    def __init__(self):
+        self.question_ids = set()
+        self.done = False
+
+    def __call__(self):
+        self.done = True
+        index_questions(self.question_ids)
+
+
+def index_question_on_answer_delete(sender, instance, using, **kwargs):
+    """
+    post_delete receiver for Answer: drop the deleted answer from its question's index row.
+    Deletes inside a transaction (a question or test deleted with its answers) are batched into one re-index
+    on commit; rows of questions deleted alongside are simply removed.
+    """
+    db = connections[using]
+    if not db.in_atomic_block:
+        index_questions([instance.question_id])
+        return
+    pending = next((func for _, func, _ in db.run_on_commit if isinstance(func, _PendingReindex) and not func.done), None)
+    if pending is None:
+        pending = _PendingReindex()
+        transaction.on_commit(pending, using=using)
+    pending.question_ids.add(instance.question_id)
+
+
+def match_expression(query):
+    """
+    Turn free text into an FTS5 MATCH expression: every word must appear, and the last one may be a prefix
+    (for search-as-you-type). Words are quoted, so FTS5 operators in the input are matched literally.
+    """
+    words = re.findall(r'\w+', query)
+    if not words:
+        return None
+    terms = [f'"{word}"' for word in words]
+    terms[-1] += '*'
+    return ' '.join(terms)
+
+
+def matching_question_ids(query):
+    """
+    A subquery of the ids of questions matching `query`, for filter(id__in=...), or None when `query`
+    has no words or there is no FTS5 index.
+    """
+    expression = match_expression(query)
+    if expression is None or not search_index_available():
+        return None
+    return RawSQL(f'SELECT rowid FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s', [expression])
+
+
+def search_questions(query, subject_id=None, teacher_id=None, limit=20):
+    """
+    Questions whose text or answers contain every word of `query`, best match first, optionally only from
+    tests of one subject and/or created by one teacher. Only the RANKED_MATCHES newest matches are ranked. Returns a list of Questions with test, subject,
+    teacher and answers loaded. Without the FTS5 index it falls back to unranked substring matching.
+    """
+    limit = max(1, min(int(limit), MAX_RESULTS))
+    expression = match_expression(query)
+    if expression is None:
+        return []
+    related = Question.objects.select_related('test__subject', 'test__created_by').prefetch_related('answers')
+
+    if not search_index_available():
+        words = re.findall(r'\w+', query)
+        questions = related
+        for word in words:
+            questions = questions.filter(Q(question_text__icontains=word) | Q(answers__answer_text__icontains=word))
+        if subject_id is not None:
+            questions = questions.filter(test__subject_id=subject_id)
+        if teacher_id is not None:
+            questions = questions.filter(test__created_by_id=teacher_id)
+        return list(questions.distinct().order_by('-id')[:limit])
+
+    # Ranking every match of a word found in most questions costs about 1 µs a row (half a second at 500k),
+    # so only the RANKED_MATCHES newest matches are ranked: FTS5 returns matches in rowid order and stops there
+    sql = [
+        f'SELECT id FROM (SELECT q.id AS id, {RANK} AS score FROM {SEARCH_TABLE}',
+        f'JOIN core_question q ON q.id = {SEARCH_TABLE}.rowid',
+        'JOIN core_test t ON t.id = q.test_id',
+        f'WHERE {SEARCH_TABLE} MATCH %s',
+    ]
+    params = [expression]
+    if subject_id is not None:
+        sql.append('AND t.subject_id = %s')
+        params.append(subject_id)
+    if teacher_id is not None:
+        sql.append('AND t.created_by_id = %s')
+        params.append(teacher_id)
+    sql.append(f'ORDER BY {SEARCH_TABLE}.rowid DESC LIMIT %s) ORDER BY score LIMIT %s')
+    params += [RANKED_MATCHES, limit]
+    with connection.cursor() as cursor:
+        cursor.execute(' '.join(sql), params)
+        ids = [row[0] for row in cursor.fetchall()]
+    questions = related.in_bulk(ids)
+    return [questions[question_id] for question_id in ids if question_id in questions]
@@ -0,0 +1,103 @@
+import time
+
+from django.db import transaction
+
+from .models import StudentResult, ArchivedStudentResult, RegradeAudit
+from .snapshots import PublishedTest, build_snapshot_payload, get_test_snapshot
+
+REGRADE_BATCH_SIZE = 500
+
+# Result models whose Completed attempts are re-graded, keyed as in RegradeAudit.changes
+REGRADED_MODELS = {'results': StudentResult, 'archived_results': ArchivedStudentResult}
+
+
+def current_answer_key(test):
+    """
+    The answer key of the test's live questions, as a PublishedTest.answer_key.
+    """
+    return PublishedTest(test.id, None, build_snapshot_payload(test)).answer_key
+
+
+def corrected_key(served_key, answer_key):
+    """
+    Grade an attempt on the questions it was served, with their points, but with the correct answers
+    from `answer_key`. Questions deleted since keep the key they were served with.
+    """
+    return {
+        question_id: (points_value, answer_key[question_id][1] if question_id in answer_key else correct_answer_ids)
+        for question_id, (points_value, correct_answer_ids) in served_key.items()
+    }
+
+
+def score(key, responses):
+    return sum(points_value for question_id, (points_value, correct) in key.items() if responses.get(question_id) in correct)
+
+
+class RegradePlan:
+    """
+    The new score of every Completed attempt of a test whose score differs under `answer_key`.
+    Attempts are scored from their stored responses in one pass, one key per snapshot version served.
+    """
+
+    def __init__(self, test, answer_key=None):
+        started = time.perf_counter()
+        self.test = test
+        self.answer_key = current_answer_key(test) if answer_key is None else answer_key
+        self.checked = 0
+        self.skipped = 0
+        self.changes = {name: {} for name in REGRADED_MODELS}
+        keys = {}
+        for name, model in REGRADED_MODELS.items():
+            rows = (
+                model.objects.filter(test=test, status='Completed')
+                .values_list('id', 'score_achieved', 'snapshot_version', 'responses')
+            )
+            for result_id, old_score, version, responses in rows.iterator(chunk_size=2000):
+                self.checked += 1
+                if version not in keys:
+                    served = get_test_snapshot(test.id, version) if version is not None else None
+                    keys[version] = None if served is None else corrected_key(served.answer_key, self.answer_key)
+                if keys[version] is None:
+                    self.skipped += 1
+                    continue
+                new_score = score(keys[version], responses)
+                if old_score is None or float(old_score) != new_score:
+                    self.changes[name][result_id] = (old_score, new_score)
+        self.seconds = time.perf_counter() - started
+
+    @property
+    def changed(self):
+        return sum(len(changes) for changes in self.changes.values())
+
+
+def apply_regrade(plan, performed_by=None, batch_size=REGRADE_BATCH_SIZE):
+    """
+    Write the plan's new scores, one UPDATE ... CASE per batch in its own transaction, and record a RegradeAudit.
+    """
+    started = time.perf_counter()
+    for name, model in REGRADED_MODELS.items():
+        changes = list(plan.changes[name].items())
+        for start in range(0, len(changes), batch_size):
+            with transaction.atomic():
+                model.objects.bulk_update(
+                    [model(id=result_id, score_achieved=new_score) for result_id, (_, new_score) in changes[start:start + batch_size]],
+                    ['score_achieved'],
+                )
+    return RegradeAudit.objects.create(
+        test=plan.test,
+        performed_by=performed_by,
+        answer_key={question_id: sorted(correct) for question_id, (_, correct) in plan.answer_key.items()},
+        attempts_checked=plan.checked,
+        attempts_changed=plan.changed,
+        attempts_skipped=plan.skipped,
+        changes={name: {str(result_id): list(change) for result_id, change in changes.items()} for name, changes in plan.changes.items()},
+        seconds=plan.seconds + time.perf_counter() - started,
+    )
+
+
+def regrade_test(test, performed_by=None, batch_size=REGRADE_BATCH_SIZE):
+    """
+    Re-grade every Completed attempt of `test` (archived ones included) against its current answer key.
+    Returns the RegradeAudit.
+    """
+    return apply_regrade(RegradePlan(test), performed_by, batch_size)
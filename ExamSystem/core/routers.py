@@ -0,0 +1,76 @@
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+
+# True while a reporting view runs and may read from the replica
+_replica_reads = ContextVar('replica_reads', default=False)
+
+# Apps whose tables must always be read from the primary (sessions, auth bookkeeping)
+PRIMARY_ONLY_APPS = {'sessions', 'contenttypes', 'auth', 'admin'}
+
+
+def replica_alias():
+    return getattr(settings, 'REPLICA_DATABASE_ALIAS', 'replica')
+
+
+def replica_lag_seconds():
+    """
+    Seconds since the replica was last synced, or None if it is unavailable.
+    For SQLite replicas kept in sync by `manage.py sync_replica`, this is the age of the replica file.
+    Other backends are assumed to replicate continuously.
+    """
+    database = settings.DATABASES.get(replica_alias())
+    if database is None:
+        return None
+    if database['ENGINE'] != 'django.db.backends.sqlite3':
+        return 0
+    try:
+        return max(0.0, time.time() - os.path.getmtime(database['NAME']))
+    except OSError:
+        return None
+
+
+def replica_usable():
+    lag = replica_lag_seconds()
+    return lag is not None and lag <= getattr(settings, 'REPLICA_MAX_LAG_SECONDS', 300)
+
+
+@contextmanager
+def replica_reads(enabled=True):
+    """
+    Route reads made inside the block to the replica (enabled=True) or force the primary (enabled=False).
+    """
+    token = _replica_reads.set(enabled)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+class ReplicaRouter:
+    """
+    Send reads from reporting views to the replica; everything else, and every write, goes to the primary.
+    """
+
+    def db_for_read(self, model, **hints):
+        if not _replica_reads.get() or model._meta.app_label in PRIMARY_ONLY_APPS:
+            return None
+        if replica_usable():
+            return replica_alias()
+        return None
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The replica is a copy of the primary, so objects from either may be related
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replica receives the schema together with the data from sync_replica
+        if db == replica_alias():
+            return False
+        return None
@@ -0,0 +1,61 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.sessions.backends.cached_db import SessionStore as CachedDBStore
+from django.utils import timezone
+
+
+class SessionStore(CachedDBStore):
+    """
+    cached_db sessions with coalesced expiry refreshes.
+
+    With SESSION_SAVE_EVERY_REQUEST every response saves the session just to slide its expiry.
+    Here such a save only refreshes the cache entry; the database row is rewritten when the
+    session data changes, or at most once per SESSION_DB_WRITE_INTERVAL seconds otherwise.
+    Enable with SESSION_ENGINE = 'core.sessions'.
+    """
+    cache_key_prefix = 'core.sessions'
+
+    @property
+    def write_interval(self):
+        return getattr(settings, 'SESSION_DB_WRITE_INTERVAL', 60)
+
+    def _written_key(self, session_key):
+        return f'{self.cache_key_prefix}{session_key}:written'
+
+    def _written_recently(self):
+        written_at = self._cache.get(self._written_key(self.session_key))
+        return written_at is not None and time.time() - written_at < self.write_interval
+
+    def create_model_instance(self, data):
+        # The row can be up to one interval behind the real expiry, so store it with that much grace;
+        # otherwise clearsessions could delete a session that is still alive in the cache
+        session = super().create_model_instance(data)
+        session.expire_date += timedelta(seconds=self.write_interval)
+        return session
+
+    def _get_session_from_db(self):
+        session = super()._get_session_from_db()
+        if session is None:
+            return None
+        # Drop the grace again so a session reloaded from the database never outlives its real expiry
+        session.expire_date -= timedelta(seconds=self.write_interval)
+        if session.expire_date <= timezone.now():
+            return None
+        return session
+
+    def save(self, must_create=False):
+        if not must_create and not self.modified and self.session_key and self._written_recently():
+            # Only the expiry moved: slide it in the cache and leave the database row alone
+            self._cache.set(self.cache_key, self._session, self.get_expiry_age())
+            return
+        super().save(must_create)
+        self._cache.set(self._written_key(self.session_key), time.time(), self.get_expiry_age())
+
+    def delete(self, session_key=None):
+        if session_key is None:
+            session_key = self.session_key
+        super().delete(session_key)
+        if session_key is not None:
+            self._cache.delete(self._written_key(session_key))
@@ -1,2 +1,25 @@
-# This file can be used for Django signals if needed in the future
-# Currently empty as we don't have specific signals to implement
\ No newline at end of file
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save, pre_save
+
+from .auth_cache import invalidate_cached_user_on_change
+from .cohorts import sync_cohorts_on_save
+from .eligibility import refresh_attempt_on_change, sync_assignment_on_change, sync_student_on_save, sync_test_on_save
+from .models import CustomUser, Test, TestAssignment, Question, Answer, StudentResult
+from .profiling import install_query_recorder
+from .question_search import index_question_on_answer_delete, index_question_on_change
+from .sqlite import configure_sqlite_connection
+
+connection_created.connect(configure_sqlite_connection, dispatch_uid='core.sqlite.configure_sqlite_connection')
+connection_created.connect(install_query_recorder, dispatch_uid='core.profiling.install_query_recorder')
+post_save.connect(invalidate_cached_user_on_change, sender=CustomUser, dispatch_uid='core.auth_cache.invalidate_on_save')
+post_delete.connect(invalidate_cached_user_on_change, sender=CustomUser, dispatch_uid='core.auth_cache.invalidate_on_delete')
+pre_save.connect(sync_cohorts_on_save, sender=CustomUser, dispatch_uid='core.cohorts.sync_on_save')
+post_save.connect(index_question_on_change, sender=Question, dispatch_uid='core.question_search.index_question_on_save')
+post_save.connect(index_question_on_change, sender=Answer, dispatch_uid='core.question_search.index_answer_on_save')
+post_delete.connect(index_question_on_answer_delete, sender=Answer, dispatch_uid='core.question_search.index_answer_on_delete')
+post_save.connect(sync_test_on_save, sender=Test, dispatch_uid='core.eligibility.sync_test_on_save')
+post_save.connect(sync_assignment_on_change, sender=TestAssignment, dispatch_uid='core.eligibility.sync_assignment_on_save')
+post_delete.connect(sync_assignment_on_change, sender=TestAssignment, dispatch_uid='core.eligibility.sync_assignment_on_delete')
+post_save.connect(sync_student_on_save, sender=CustomUser, dispatch_uid='core.eligibility.sync_student_on_save')
+post_save.connect(refresh_attempt_on_change, sender=StudentResult, dispatch_uid='core.eligibility.refresh_attempt_on_save')
+post_delete.connect(refresh_attempt_on_change, sender=StudentResult, dispatch_uid='core.eligibility.refresh_attempt_on_delete')
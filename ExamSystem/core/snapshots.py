@@ -0,0 +1,234 @@
+import threading
+from collections import OrderedDict
+
+from asgiref.sync import sync_to_async
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max
+from django.utils.functional import cached_property
+
+from .models import Test, TestSnapshot
+
+
+class PublishedTest:
+    """
+    A loaded TestSnapshot with its answer key pre-computed for grading.
+    """
+
+    def __init__(self, test_id, version, payload):
+        self.test_id = test_id
+        self.version = version
+        self.payload = payload
+        self.test = payload['test']
+        self.questions = payload['questions']
+        self.answer_key = {
+            str(question['id']): (
+                question['points_value'],
+                {str(answer['id']) for answer in question['answers'] if answer['is_correct']},
+            )
+            for question in self.questions
+        }
+
+    @cached_property
+    def paper(self):
+        """
+        The payload as served to students: everything except which answers are correct.
+        """
+        return {
+            'test': self.test,
+            'version': self.version,
+            'questions': [
+                dict(question, answers=[
+                    {'id': answer['id'], 'answer_text': answer['answer_text']} for answer in question['answers']
+                ])
+                for question in self.questions
+            ],
+        }
+
+    def grade(self, responses):
+        """
+        Score a mapping of question id -> selected answer id (both as strings).
+        Returns (score, total_score) where total_score is the sum of all question points.
+        """
+        score = 0
+        total_score = 0
+        for question_id, (points_value, correct_answer_ids) in self.answer_key.items():
+            total_score += points_value
+            if responses.get(question_id) in correct_answer_ids:
+                score += points_value
+        return score, total_score
+
+
+# Bounded in-process LRU of PublishedTest objects keyed by (test_id, version).
+# Snapshots never change once written, so entries never need invalidating.
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def _cache_size():
+    return getattr(settings, 'TEST_SNAPSHOT_CACHE_SIZE', 128)
+
+
+def _cache_get(key):
+    with _cache_lock:
+        published = _cache.get(key)
+        if published is not None:
+            _cache.move_to_end(key)
+        return published
+
+
+def _cache_put(published):
+    with _cache_lock:
+        _cache[(published.test_id, published.version)] = published
+        _cache.move_to_end((published.test_id, published.version))
+        while len(_cache) > _cache_size():
+            _cache.popitem(last=False)
+
+
+def clear_snapshot_cache():
+    with _cache_lock:
+        _cache.clear()
+
+
+def build_snapshot_payload(test):
+    """
+    Serialise a test, its questions and answers (including the answer key) into a plain dict.
+    """
+    questions = test.questions.order_by('id').prefetch_related('answers')
+    return {
+        'test': {
+            'id': test.id,
+            'test_name': test.test_name,
+            'subject_name': test.subject.name,
+            'total_time_minutes': test.total_time_minutes,
+        },
+        'questions': [
+            {
+                'id': question.id,
+                'question_text': question.question_text,
+                'question_type': question.question_type,
+                'points_value': question.points_value,
+                'answers': [
+                    {'id': answer.id, 'answer_text': answer.answer_text, 'is_correct': answer.is_correct}
+                    for answer in sorted(question.answers.all(), key=lambda answer: answer.id)
+                ],
+            }
+            for question in questions
+        ],
+    }
+
+
+def publish_test_snapshot(test):
+    """
+    Freeze the test's current questions into a new snapshot version and serve it to students.
+    If nothing changed since the current version, that version is kept.
+    """
+    payload = build_snapshot_payload(test)
+    if test.published_version is not None:
+        current = get_test_snapshot(test.id, test.published_version)
+        if current is not None and current.payload == payload:
+            return current
+
+    with transaction.atomic():
+        # Lock the test row so concurrent publishes get distinct versions
+        Test.objects.select_for_update().filter(id=test.id).exists()
+        latest = test.snapshots.aggregate(latest=Max('version'))['latest'] or 0
+        snapshot = TestSnapshot.objects.create(test=test, version=latest + 1, payload=payload)
+        Test.objects.filter(id=test.id).update(published_version=snapshot.version)
+    test.published_version = snapshot.version
+
+    published = PublishedTest(test.id, snapshot.version, payload)
+    _cache_put(published)
+    return published
+
+
+def get_test_snapshot(test_id, version):
+    """
+    Return the PublishedTest for a test version, or None if that version does not exist.
+    """
+    published = _cache_get((test_id, version))
+    if published is None:
+        payload = TestSnapshot.objects.filter(test_id=test_id, version=version).values_list('payload', flat=True).first()
+        if payload is None:
+            return None
+        published = PublishedTest(test_id, version, payload)
+        _cache_put(published)
+    return published
+
+
+def current_test_snapshot(test):
+    """
+    Return the snapshot students should be served for a published test,
+    publishing one first if the test was published without going through the views (e.g. the admin).
+    """
+    published = None
+    if test.published_version is not None:
+        published = get_test_snapshot(test.id, test.published_version)
+    if published is None:
+        published = publish_test_snapshot(test)
+    return published
+
+
+async def aget_test_snapshot(test_id, version):
+    """See get_test_snapshot()."""
+    published = _cache_get((test_id, version))
+    if published is None:
+        payload = await TestSnapshot.objects.filter(test_id=test_id, version=version).values_list('payload', flat=True).afirst()
+        if payload is None:
+            return None
+        published = PublishedTest(test_id, version, payload)
+        _cache_put(published)
+    return published
+
+
+async def acurrent_test_snapshot(test):
+    """See current_test_snapshot()."""
+    published = None
+    if test.published_version is not None:
+        published = await aget_test_snapshot(test.id, test.published_version)
+    if published is None:
+        # Publishing needs a transaction, which the async ORM does not provide
+        published = await sync_to_async(publish_test_snapshot)(test)
+    return published
+
+
+# Session key for {test id: snapshot version} of the papers a student was last served. Answers are graded
+# against the version recorded server-side, never one named by the client.
+SERVED_SNAPSHOTS_SESSION_KEY = 'served_snapshots'
+
+
+def remember_served_snapshot(session, published):
+    """Record in the student's session that they were served this snapshot of the test."""
+    served = dict(session.get(SERVED_SNAPSHOTS_SESSION_KEY, {}))
+    served[str(published.test_id)] = published.version
+    session[SERVED_SNAPSHOTS_SESSION_KEY] = served
+
+
+def served_snapshot_version(session, test_id):
+    """The snapshot version of the test last served to the student in this session, or None."""
+    return session.get(SERVED_SNAPSHOTS_SESSION_KEY, {}).get(str(test_id))
+
+
+def graded_snapshot(test, version):
+    """The snapshot to grade against: `version` (as served) if known and existing, else the current one."""
+    published = get_test_snapshot(test.id, version) if version is not None else None
+    return published or current_test_snapshot(test)
+
+
+async def aremember_served_snapshot(session, published):
+    """See remember_served_snapshot()."""
+    served = dict(await session.aget(SERVED_SNAPSHOTS_SESSION_KEY, {}))
+    served[str(published.test_id)] = published.version
+    await session.aset(SERVED_SNAPSHOTS_SESSION_KEY, served)
+
+
+async def aserved_snapshot_version(session, test_id):
+    """See served_snapshot_version()."""
+    return (await session.aget(SERVED_SNAPSHOTS_SESSION_KEY, {})).get(str(test_id))
+
+
+async def agraded_snapshot(test, version):
+    """See graded_snapshot()."""
+    published = await aget_test_snapshot(test.id, version) if version is not None else None
+    return published or await acurrent_test_snapshot(test)
@@ -0,0 +1,16 @@
+# pandas (with numpy) and openpyxl cost every worker about half a second and tens of MB at import, but only
+# the Excel import and export views use them: they are imported on first use here, never at module level.
+# Importing core.views must not pull in any of these (checked by the tests and by `manage.py startup_profile`).
+MODULES_IMPORTED_LAZILY = ('pandas', 'numpy', 'openpyxl')
+
+
+def read_excel(file):
+    """The first sheet of an uploaded .xls/.xlsx file as a pandas DataFrame."""
+    import pandas as pd
+    return pd.read_excel(file)
+
+
+def new_workbook():
+    """An empty openpyxl Workbook."""
+    import openpyxl
+    return openpyxl.Workbook()
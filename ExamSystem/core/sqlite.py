@@ -0,0 +1,19 @@
+from django.conf import settings
+
+
+def apply_sqlite_pragmas(cursor, pragmas):
+    """
+    Run `PRAGMA name = value` for each entry of `pragmas` on a DB-API cursor.
+    """
+    for name, value in pragmas.items():
+        cursor.execute(f'PRAGMA {name} = {value}')
+
+
+def configure_sqlite_connection(sender, connection, **kwargs):
+    """
+    connection_created receiver that applies settings.SQLITE_PRAGMAS in high-concurrency mode.
+    """
+    if connection.vendor != 'sqlite' or not getattr(settings, 'SQLITE_HIGH_CONCURRENCY', False):
+        return
+    with connection.cursor() as cursor:
+        apply_sqlite_pragmas(cursor, settings.SQLITE_PRAGMAS)
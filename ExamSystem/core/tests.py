@@ -1,3 +1,1550 @@
-from django.test import TestCase
+import asyncio
+import heapq
+import importlib
+import json
+import os
+import random
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import closing
+from datetime import timedelta
+from io import BytesIO, StringIO
+from types import SimpleNamespace
+from unittest import skipUnless
+from unittest.mock import patch
 
-# Create your tests here.
+import openpyxl
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.apps import apps as django_apps
+from django.conf import settings
+from django.contrib.auth import authenticate
+from django.contrib.auth.hashers import make_password
+from django.contrib.messages import get_messages
+from django.contrib.sessions.models import Session
+from django.core.cache import caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.http import HttpResponse
+from django.test import Client, RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from .admission import AdmissionController
+from .archive import archive_cutoff, archive_results, has_completed_attempt
+from .authoring import create_questions
+from .decorators import PRIMARY_PIN_SESSION_KEY
+from .hashers import student_password_hasher
+from .middleware import QueryBudgetMiddleware
+from .metrics import ACTIVE_ATTEMPTS, REGISTRY, Counter, Gauge, Histogram, Registry
+from .models import (
+    CustomUser, StudentGroup, Course, Direction, Subject, Test, TestSnapshot, TestAssignment, TestEligibility, Question, Answer,
+    StudentResult, ArchivedStudentResult, RegradeAudit,
+)
+from .profiling import QueryBudgetExceeded
+from .query_plans import critical_querysets, full_table_scans
+from .question_bank import question_content_hash
+from .cohorts import group_result_summary
+from .eligibility import eligible_test, eligible_tests, refresh_attempt_state, sync_eligibility
+from .question_search import search_questions
+from .regrade import RegradePlan
+from .routers import ReplicaRouter, replica_reads
+from .sessions import SessionStore as CoalescedSessionStore
+from .snapshots import clear_snapshot_cache, publish_test_snapshot
+from .spreadsheets import MODULES_IMPORTED_LAZILY
+from .sqlite import configure_sqlite_connection
+from .urls import QUERY_BUDGETS, urlpatterns
+
+
+class QuestionContentHashTests(TestCase):
+    def setUp(self):
+        self.teacher = CustomUser.objects.create_user(username='teacher', password='pw', role='Teacher')
+        self.subject = Subject.objects.create(name='Maths', created_by=self.teacher)
+        self.client.force_login(self.teacher)
+
+    def create_test(self, name='Algebra'):
+        return self.client.post(reverse('create_test'), {
+            'test_name': name,
+            'subject': self.subject.id,
+            'total_time_minutes': 30,
+            'default_points_value': 1,
+            'question_text': ['What is 2 + 2?'],
+            'question_0_answer_text': ['3', '4'],
+            'question_0_is_correct': ['1'],
+        }, follow=True)
+
+    def test_hash_ignores_case_whitespace_and_answer_order(self):
+        self.assertEqual(
+            question_content_hash('What is  2 + 2?', 'MCQ', [('3', False), ('4', True)]),
+            question_content_hash(' what is 2 + 2? ', 'MCQ', [('4 ', True), ('3', False)]),
+        )
+        self.assertNotEqual(
+            question_content_hash('What is 2 + 2?', 'MCQ', [('3', True), ('4', False)]),
+            question_content_hash('What is 2 + 2?', 'MCQ', [('3', False), ('4', True)]),
+        )
+
+    def test_backfill_migration_hashes_like_the_live_function(self):
+        # Migration 0004 carries a frozen copy; it must agree with the hashes stored by the running code
+        migration = importlib.import_module('core.migrations.0004_customuser_student_direction_question_content_hash')
+        question = ('  Ünïcode  ＴＥＸＴ ', 'TF', [('Yes', True), ('No ', False)])
+        self.assertEqual(migration.question_content_hash(*question), question_content_hash(*question))
+
+    def test_create_test_stores_hash_and_reports_duplicates(self):
+        self.create_test()
+        question = Question.objects.get()
+        self.assertEqual(question.content_hash, question_content_hash('What is 2 + 2?', 'MCQ', [('3', False), ('4', True)]))
+
+        response = self.create_test('Algebra again')
+        self.assertContains(response, '1 question(s) already exist in your question bank.')
+
+        out = StringIO()
+        call_command('report_duplicate_questions', stdout=out)
+        self.assertIn('1 duplicate cluster(s), 1 redundant question(s).', out.getvalue())
+
+
+# Count the view's own queries; the cached user would hide the user load from only the first request
+@override_settings(AUTH_USER_CACHE_TTL=0)
+class EditTestDiffTests(TestCase):
+    def setUp(self):
+        self.teacher = CustomUser.objects.create_user(username='teacher', password='pw', role='Teacher')
+        self.subject = Subject.objects.create(name='Maths', created_by=self.teacher)
+        self.client.force_login(self.teacher)
+
+    def make_test(self, question_count):
+        test = Test.objects.create(test_name='Quiz', subject=self.subject, created_by=self.teacher)
+        for i in range(question_count):
+            question = Question.objects.create(test=test, question_text=f'Question {i}')
+            Answer.objects.create(question=question, answer_text='Right', is_correct=True)
+            Answer.objects.create(question=question, answer_text='Wrong')
+        return test
+
+    def edit_payload(self, test, **overrides):
+        data = {
+            'test_name': test.test_name,
+            'subject': self.subject.id,
+            'total_time_minutes': 45,
+            'status': 'Draft',
+            'default_points_value': 2,
+            'question_id': [],
+            'question_text': [],
+        }
+        for i, question in enumerate(test.questions.order_by('id')):
+            answers = list(question.answers.order_by('id'))
+            data['question_id'].append(question.id)
+            data['question_text'].append(f'{question.question_text} (edited)')
+            data[f'question_{i}_answer_id'] = [answer.id for answer in answers]
+            data[f'question_{i}_answer_text'] = [answer.answer_text for answer in answers]
+            # Flip the answer key
+            data[f'question_{i}_is_correct'] = [str(j) for j, answer in enumerate(answers) if not answer.is_correct]
+        data.update(overrides)
+        return data
+
+    def test_edit_updates_creates_and_deletes(self):
+        test = self.make_test(3)
+        data = self.edit_payload(test)
+        removed_id = data['question_id'].pop(2)
+        data['question_text'].pop(2)
+        data['question_id'].append('')
+        data['question_text'].append('Brand new question')
+        data['question_2_answer_id'] = ['']
+        data['question_2_answer_text'] = ['Only answer']
+        data['question_2_is_correct'] = ['0']
+
+        self.client.post(reverse('edit_test', args=[test.id]), data)
+
+        self.assertFalse(Question.objects.filter(id=removed_id).exists())
+        self.assertEqual(test.questions.count(), 3)
+        self.assertEqual(set(test.questions.values_list('points_value', flat=True)), {2})
+        edited = test.questions.get(id=data['question_id'][0])
+        self.assertEqual(edited.question_text, 'Question 0 (edited)')
+        self.assertEqual(edited.answers.get(is_correct=True).answer_text, 'Wrong')
+        new_question = test.questions.get(question_text='Brand new question')
+        self.assertEqual(new_question.content_hash, question_content_hash('Brand new question', 'MCQ', [('Only answer', True)]))
+        self.assertTrue(new_question.answers.get().is_correct)
+
+    def test_clearing_an_answer_text_keeps_the_answer(self):
+        test = self.make_test(1)
+        data = self.edit_payload(test, question_0_answer_text=['Right', ''])
+        self.client.post(reverse('edit_test', args=[test.id]), data)
+
+        question = test.questions.get()
+        self.assertEqual(list(question.answers.order_by('id').values_list('answer_text', 'is_correct')),
+                         [('Right', False), ('Wrong', False)])
+        self.assertEqual(question.content_hash, question_content_hash(
+            'Question 0 (edited)', 'MCQ', [('Right', False), ('Wrong', False)]
+        ))
+
+    def test_edit_query_count_does_not_grow_with_test_size(self):
+        def count_queries(question_count):
+            test = self.make_test(question_count)
+            data = self.edit_payload(test)
+            with CaptureQueriesContext(connection) as ctx:
+                self.client.post(reverse('edit_test', args=[test.id]), data)
+            return len(ctx.captured_queries)
+
+        self.assertEqual(count_queries(3), count_queries(40))
+
+
+@override_settings(AUTH_USER_CACHE_TTL=0)
+class CreateTestBulkTests(TestCase):
+    def setUp(self):
+        self.teacher = CustomUser.objects.create_user(username='teacher', password='pw', role='Teacher')
+        self.subject = Subject.objects.create(name='Maths', created_by=self.teacher)
+        self.client.force_login(self.teacher)
+
+    def post_test(self, question_count):
+        data = {
+            'test_name': 'Bulk',
+            'subject': self.subject.id,
+            'total_time_minutes': 30,
+            'default_points_value': 1,
+            'question_text': [f'Question {i}' for i in range(question_count)],
+        }
+        for i in range(question_count):
+            data[f'question_{i}_answer_text'] = ['A', 'B', 'C', 'D']
+            data[f'question_{i}_is_correct'] = ['2']
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.post(reverse('create_test'), data)
+        return len(ctx.captured_queries)
+
+    def test_create_query_count_does_not_grow_with_test_size(self):
+        self.assertEqual(self.post_test(2), self.post_test(60))
+        self.assertEqual(Question.objects.count(), 62)
+        self.assertEqual(Answer.objects.filter(is_correct=True, answer_text='C').count(), 62)
+
+
+class PublishedSnapshotTests(TestCase):
+    def setUp(self):
+        clear_snapshot_cache()
+        self.teacher = CustomUser.objects.create_user(username='teacher', password='pw', role='Teacher')
+        self.student = CustomUser.objects.create_user(username='student', password='pw', role='Student')
+        self.subject = Subject.objects.create(name='Maths', created_by=self.teacher)
+        self.client.force_login(self.teacher)
+        self.client.post(reverse('create_test'), {
+            'test_name': 'Published quiz',
+            'subject': self.subject.id,
+            'total_time_minutes': 30,
+            'status': 'Published',
+            'default_points_value': 1,
+            'question_text': ['What is 2 + 2?'],
+            'question_0_answer_text': ['3', '4'],
+            'question_0_is_correct': ['1'],
+        })
+        self.test = Test.objects.get()
+        self.question = self.test.questions.get()
+        self.wrong, self.right = self.question.answers.order_by('id')
+
+    def test_publishing_freezes_a_snapshot(self):
+        self.assertEqual(self.test.published_version, 1)
+        snapshot = TestSnapshot.objects.get(test=self.test)
+        self.assertEqual(snapshot.payload['questions'][0]['question_text'], 'What is 2 + 2?')
+
+    def test_take_test_reads_only_the_snapshot(self):
+        self.client.force_login(self.student)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('take_test', args=[self.test.id]))
+        self.assertContains(response, 'What is 2 + 2?')
+        self.assertContains(response, 'name="snapshot_version" value="1"')
+        self.assertFalse(any('"core_question"' in query['sql'] or '"core_answer"' in query['sql'] for query in ctx.captured_queries))
+
+    def test_edit_creates_new_version_and_submission_uses_served_version(self):
+        student = Client()
+        student.force_login(self.student)
+        student.get(reverse('take_test', args=[self.test.id]))  # Served version 1
+        self.client.post(reverse('edit_test', args=[self.test.id]), {
+            'test_name': 'Published quiz',
+            'subject': self.subject.id,
+            'total_time_minutes': 30,
+            'status': 'Published',
+            'default_points_value': 1,
+            'question_id': [self.question.id],
+            'question_text': ['What is 2 + 2?'],
+            'question_0_answer_id': [self.wrong.id, self.right.id],
+            'question_0_answer_text': ['3', '4'],
+            'question_0_is_correct': ['0'],
+        })
+        self.test.refresh_from_db()
+        self.assertEqual(self.test.published_version, 2)
+
+        student.post(reverse('submit_test', args=[self.test.id]), {
+            'snapshot_version': 1,
+            f'question_{self.question.id}': self.right.id,
+            'time_taken': 10,
+        })
+        self.assertEqual(StudentResult.objects.get().score_achieved, 1)
+
+    def test_submission_cannot_pick_another_version(self):
+        self.client.post(reverse('edit_test', args=[self.test.id]), {
+            'test_name': 'Published quiz', 'subject': self.subject.id, 'total_time_minutes': 30, 'status': 'Published',
+            'default_points_value': 1, 'question_id': [self.question.id], 'question_text': ['What is 2 + 2?'],
+            'question_0_answer_id': [self.wrong.id, self.right.id], 'question_0_answer_text': ['3', '4'],
+            'question_0_is_correct': ['0'],
+        })
+        # Served version 2 (or never served), the student posts the old version whose key they prefer
+        self.client.force_login(self.student)
+        for served in (False, True):
+            if served:
+                self.client.get(reverse('take_test', args=[self.test.id]))
+            response = self.client.post(reverse('submit_test', args=[self.test.id]), {
+                'snapshot_version': 1, f'question_{self.question.id}': self.right.id, 'time_taken': 10,
+            }, follow=True)
+            self.assertContains(response, 'This test paper is out of date.')
+        self.assertFalse(StudentResult.objects.exists())
+
+    def test_completed_test_cannot_be_submitted_again_without_a_retake(self):
+        self.client.force_login(self.student)
+        data = {'snapshot_version': 1, f'question_{self.question.id}': self.right.id, 'time_taken': 10}
+        self.client.post(reverse('submit_test', args=[self.test.id]), data)
+        response = self.client.post(reverse('submit_test', args=[self.test.id]), data, follow=True)
+        self.assertContains(response, 'You have already completed this test.')
+        self.assertEqual(StudentResult.objects.filter(status='Completed').count(), 1)
+
+        StudentResult.objects.create(student=self.student, test=self.test)  # A retake
+        self.client.post(reverse('submit_test', args=[self.test.id]), data)
+        self.assertEqual(list(StudentResult.objects.values_list('status', flat=True)), ['Completed', 'Completed'])
+
+
+class BulkResultsTests(TestCase):
+    def setUp(self):
+        self.admin = CustomUser.objects.create(username='admin', role='Admin')
+        teacher = CustomUser.objects.create(username='teacher', role='Teacher')
+        subject = Subject.objects.create(name='Maths', created_by=teacher)
+        self.test = Test.objects.create(test_name='Quiz', subject=subject, created_by=teacher, status='Published')
+        for i in range(6):
+            student = CustomUser.objects.create(
+                username=f'student{i}', role='Student', student_groups='A' if i < 4 else 'B'
+            )
+            StudentResult.objects.create(student=student, test=self.test, status='Completed', score_achieved=i)
+        # One student in group A already has a retake waiting
+        StudentResult.objects.create(student=CustomUser.objects.get(username='student0'), test=self.test)
+        self.client.force_login(self.admin)
+
+    def test_preview_then_reopen_for_group(self):
+        data = {'action': 'reopen', 'test': self.test.id, 'group': 'A'}
+        response = self.client.post(reverse('bulk_results'), data)
+        self.assertContains(response, '3 student(s) will get a new retake attempt.')
+        self.assertEqual(StudentResult.objects.filter(status='Pending').count(), 1)
+
+        self.client.post(reverse('bulk_results'), dict(data, confirm='1', preview_token=response.context['preview_token']))
+        self.assertEqual(StudentResult.objects.filter(status='Pending').count(), 4)
+        self.assertEqual(StudentResult.objects.filter(status='Pending', student__student_groups='B').count(), 0)
+
+    def test_confirm_applies_only_the_previewed_filters(self):
+        data = {'action': 'clear', 'test': self.test.id, 'group': 'B'}
+        token = self.client.post(reverse('bulk_results'), data).context['preview_token']
+        # The group was edited after the preview, and a forged token: both only preview again
+        for changed in (dict(data, group='', preview_token=token), dict(data, preview_token=token + 'x')):
+            response = self.client.post(reverse('bulk_results'), dict(changed, confirm='1'))
+            self.assertContains(response, 'Check the new preview before confirming.')
+        self.assertEqual(StudentResult.objects.count(), 7)
+
+        self.client.post(reverse('bulk_results'), dict(data, confirm='1', preview_token=token))
+        self.assertEqual(StudentResult.objects.count(), 5)
+        self.assertEqual(StudentResult.objects.filter(student__student_groups='B').count(), 0)
+
+    def test_unknown_test_is_a_bad_request(self):
+        for test_id in ('abc', '999999'):
+            response = self.client.post(reverse('bulk_results'), {'action': 'clear', 'test': test_id, 'status': 'Completed'})
+            self.assertEqual(response.status_code, 400)
+        self.assertEqual(StudentResult.objects.count(), 7)
+
+    def test_clear_by_filter_command(self):
+        out = StringIO()
+        call_command('bulk_results', 'clear', '--group', 'B', '--dry-run', stdout=out)
+        self.assertIn('2 result(s) would be deleted.', out.getvalue())
+        call_command('bulk_results', 'clear', '--group', 'B', '--status', 'Completed', stdout=out)
+        self.assertEqual(StudentResult.objects.filter(student__student_groups='B').count(), 0)
+        self.assertEqual(StudentResult.objects.count(), 5)
+
+
+@override_settings(AUTH_USER_CACHE_TTL=0)
+class AdminChangelistQueryTests(TestCase):
+    def setUp(self):
+        self.admin = CustomUser.objects.create(username='admin', role='Admin', is_staff=True, is_superuser=True)
+        self.teacher = CustomUser.objects.create(username='teacher', role='Teacher')
+        self.subject = Subject.objects.create(name='Maths', created_by=self.teacher)
+        self.client.force_login(self.admin)
+        self.seeded = 0
+
+    def seed(self, count):
+        for i in range(self.seeded, self.seeded + count):
+            student = CustomUser.objects.create(username=f'student{i}', role='Student')
+            test = Test.objects.create(test_name=f'Quiz {i}', subject=self.subject, created_by=self.teacher)
+            question = Question.objects.create(test=test, question_text=f'Question {i}')
+            Answer.objects.create(question=question, answer_text=f'Answer {i}', is_correct=True)
+            StudentResult.objects.create(student=student, test=test, status='Completed')
+        self.seeded += count
+
+    def changelist_queries(self, model):
+        url = reverse(f'admin:core_{model}_changelist')
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries)
+
+    def test_changelist_queries_do_not_grow_with_rows(self):
+        for model in ('customuser', 'subject', 'test', 'question', 'answer', 'studentresult'):
+            with self.subTest(model=model):
+                self.seed(3)
+                small = self.changelist_queries(model)
+                self.seed(30)
+                self.assertEqual(small, self.changelist_queries(model))
+
+    def test_fk_filters_are_not_rendered_as_choices(self):
+        self.seed(5)
+        response = self.client.get(reverse('admin:core_studentresult_changelist'))
+        self.assertNotContains(response, '?student__id__exact=')
+        self.assertNotContains(response, '?test__id__exact=')
+
+    def test_searches_match_within_the_text(self):
+        self.seed(12)
+        for model, term in (('answer', 'swer 11'), ('question', 'uiz 11'), ('studentresult', 'ent11'), ('test', 'uiz 11')):
+            with self.subTest(model=model):
+                response = self.client.get(reverse(f'admin:core_{model}_changelist'), {'q': term})
+                self.assertEqual(len(response.context['cl'].result_list), 1)
+
+
+@skipUnless(connection.vendor == 'sqlite', 'Query plans are checked against SQLite')
+class QueryPlanTests(TestCase):
+    def test_critical_queries_do_not_scan_full_tables(self):
+        teacher = CustomUser.objects.create(username='teacher', role='Teacher')
+        student = CustomUser.objects.create(username='student', role='Student', student_groups='A')
+        subject = Subject.objects.create(name='Maths', created_by=teacher)
+        test = Test.objects.create(test_name='Quiz', subject=subject, created_by=teacher, status='Published')
+        querysets = critical_querysets(student, test, teacher, timezone.now())
+        for name, queryset in querysets.items():
+            with self.subTest(query=name):
+                self.assertEqual(full_table_scans(queryset), [], queryset.explain())
+
+
+class SQLiteHighConcurrencyTests(SimpleTestCase):
+    class FreshConnection:
+        vendor = 'sqlite'
+
+        def __init__(self):
+            self.raw = sqlite3.connect(':memory:', timeout=0)
+
+        def cursor(self):
+            return closing(self.raw.cursor())
+
+    def busy_timeout(self, fresh):
+        return fresh.raw.execute('PRAGMA busy_timeout').fetchone()[0]
+
+    def test_pragmas_applied_only_in_high_concurrency_mode(self):
+        fresh = self.FreshConnection()
+        with self.settings(SQLITE_HIGH_CONCURRENCY=False):
+            configure_sqlite_connection(None, fresh)
+        self.assertEqual(self.busy_timeout(fresh), 0)
+
+        with self.settings(SQLITE_HIGH_CONCURRENCY=True):
+            configure_sqlite_connection(None, fresh)
+        self.assertEqual(self.busy_timeout(fresh), 20000)
+
+
+class ReplicaRouterTests(TestCase):
+    def setUp(self):
+        self.router = ReplicaRouter()
+        replica = tempfile.NamedTemporaryFile(suffix='.sqlite3', delete=False)
+        replica.close()
+        self.addCleanup(os.unlink, replica.name)
+        self.replica_path = replica.name
+        self.databases_with_replica = dict(settings.DATABASES, replica={
+            'ENGINE': 'django.db.backends.sqlite3', 'NAME': replica.name,
+        })
+
+    def test_reads_stay_on_primary_without_a_replica(self):
+        with replica_reads():
+            self.assertIsNone(self.router.db_for_read(StudentResult))
+
+    def test_reporting_reads_use_a_fresh_replica(self):
+        with self.settings(DATABASES=self.databases_with_replica):
+            self.assertIsNone(self.router.db_for_read(StudentResult))
+            with replica_reads():
+                self.assertEqual(self.router.db_for_read(StudentResult), 'replica')
+                self.assertIsNone(self.router.db_for_read(Session))
+            self.assertEqual(self.router.db_for_write(StudentResult), 'default')
+
+    def test_lagging_replica_falls_back_to_primary(self):
+        stale = time.time() - 3600
+        os.utime(self.replica_path, (stale, stale))
+        with self.settings(DATABASES=self.databases_with_replica, REPLICA_MAX_LAG_SECONDS=60), replica_reads():
+            self.assertIsNone(self.router.db_for_read(StudentResult))
+
+    def test_write_views_pin_the_session_to_the_primary(self):
+        admin = CustomUser.objects.create(username='admin', role='Admin')
+        teacher = CustomUser.objects.create(username='teacher', role='Teacher')
+        subject = Subject.objects.create(name='Maths', created_by=teacher)
+        test = Test.objects.create(test_name='Quiz', subject=subject, created_by=teacher)
+        result = StudentResult.objects.create(student=admin, test=test, status='Completed')
+        self.client.force_login(admin)
+        self.client.get(reverse('retake_test', args=[result.id]))
+        self.assertGreater(self.client.session[PRIMARY_PIN_SESSION_KEY], time.time())
+
+
+class ResultArchiveTests(TestCase):
+    def setUp(self):
+        teacher = CustomUser.objects.create(username='teacher', role='Teacher')
+        subject = Subject.objects.create(name='Maths', created_by=teacher)
+        self.test = Test.objects.create(test_name='Quiz', subject=subject, created_by=teacher, status='Published')
+        self.student = CustomUser.objects.create(username='student', role='Student')
+        now = timezone.now()
+        self.old = StudentResult.objects.create(
+            student=self.student, test=self.test, status='Completed', score_achieved=20,
+            completion_date=now - timedelta(days=1000),
+        )
+        self.recent = StudentResult.objects.create(
+            student=self.student, test=self.test, status='Completed', score_achieved=22,
+            completion_date=now - timedelta(days=10),
+        )
+        # Pending attempts are never archived, whatever their date
+        self.pending = StudentResult.objects.create(
+            student=self.student, test=self.test, completion_date=now - timedelta(days=1000),
+        )
+
+    def test_command_moves_only_old_completed_results(self):
+        out = StringIO()
+        call_command('archive_results', '--days', '365', '--batch-size', '1', stdout=out)
+        self.assertIn('Archived 1 result(s)', out.getvalue())
+        self.assertEqual(set(StudentResult.objects.values_list('id', flat=True)), {self.recent.id, self.pending.id})
+        archived = ArchivedStudentResult.objects.get()
+        self.assertEqual((archived.id, archived.score_achieved), (self.old.id, 20))
+
+    def test_take_gate_and_history_see_archived_attempts(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            archive_results(archive_cutoff(365))
+            StudentResult.objects.filter(id__in=[self.recent.id, self.pending.id]).delete()
+        self.assertTrue(has_completed_attempt(self.student, self.test))
+
+        self.client.force_login(self.student)
+        response = self.client.get(reverse('take_test', args=[self.test.id]))
+        self.assertRedirects(response, reverse('student_dashboard'))
+        self.assertEqual(len(self.client.get(reverse('student_dashboard')).context['student_results']), 0)
+        response = self.client.get(reverse('student_dashboard'), {'include_archived': '1'})
+        self.assertEqual([r.id for r in response.context['student_results']], [self.old.id])
+
+    def test_export_unions_archive_on_request(self):
+        archive_results(archive_cutoff(365))
+        admin = CustomUser.objects.create(username='admin', role='Admin')
+        self.client.force_login(admin)
+        hot_only = self.client.get(reverse('export_student_results_csv')).content.decode()
+        both = self.client.get(reverse('export_student_results_csv'), {'include_archived': '1'}).content.decode()
+        self.assertEqual(len(hot_only.splitlines()), 3)
+        self.assertEqual(len(both.splitlines()), 4)
+        self.assertIn('student,Quiz,20.0', both)
+
+
+@override_settings(SESSION_CACHE_ALIAS='sessions', SESSION_DB_WRITE_INTERVAL=60)
+class CoalescedSessionTests(TestCase):
+    def setUp(self):
+        caches['sessions'].clear()
+        self.session = CoalescedSessionStore()
+        self.session['role'] = 'Student'
+        self.session.save()
+
+    def session_writes(self, save):
+        store = CoalescedSessionStore(self.session.session_key)
+        save(store)
+        with CaptureQueriesContext(connection) as queries:
+            store.save()
+        return sum(1 for query in queries.captured_queries if query['sql'].startswith(('UPDATE', 'INSERT')))
+
+    def test_expiry_refresh_is_coalesced_but_changes_are_written(self):
+        self.assertEqual(self.session_writes(lambda store: store['role']), 0)
+        self.assertEqual(self.session_writes(lambda store: store.__setitem__('answers', [1, 2])), 1)
+        with self.settings(SESSION_DB_WRITE_INTERVAL=0):
+            self.assertEqual(self.session_writes(lambda store: store['role']), 1)
+
+    def test_database_row_outlives_the_real_expiry_by_one_interval(self):
+        row = Session.objects.get(session_key=self.session.session_key)
+        real_expiry = timezone.now() + timedelta(seconds=settings.SESSION_COOKIE_AGE)
+        self.assertAlmostEqual((row.expire_date - real_expiry).total_seconds(), 60, delta=5)
+
+        # A session reloaded from the database after cache loss keeps its data, and dies with the real expiry
+        caches['sessions'].clear()
+        self.assertEqual(CoalescedSessionStore(self.session.session_key)['role'], 'Student')
+        Session.objects.filter(session_key=self.session.session_key).update(expire_date=timezone.now() + timedelta(seconds=30))
+        caches['sessions'].clear()
+        self.assertNotIn('role', CoalescedSessionStore(self.session.session_key))
+
+
+class CachedAuthenticationTests(TestCase):
+    def setUp(self):
+        caches['default'].clear()
+        self.student = CustomUser.objects.create(username='student', role='Student')
+        self.client.force_login(self.student)
+
+    def user_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        return response, [q for q in queries.captured_queries if 'FROM "core_customuser"' in q['sql']]
+
+    def test_repeat_requests_do_not_reload_the_user(self):
+        _, queries = self.user_queries(reverse('student_dashboard'))
+        self.assertEqual(len(queries), 1)
+        response, queries = self.user_queries(reverse('student_dashboard'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(queries, [])
+        self.assertEqual(response.wsgi_request.user.username, 'student')
+
+    def test_cached_user_carries_profile_and_cohort_fields(self):
+        self.student.student_groups = 'A-1'
+        self.student.course = '2'
+        self.student.save()
+        self.client.get(reverse('student_dashboard'))
+        response, _ = self.user_queries(reverse('student_dashboard'))
+        user = response.wsgi_request.user
+        with self.assertNumQueries(0):
+            values = (user.student_groups, user.course, user.student_direction, user.cohort_group_id, user.cohort_course_id)
+        self.assertEqual(values, ('A-1', '2', self.student.student_direction, self.student.cohort_group_id, self.student.cohort_course_id))
+        self.assertIsNotNone(user.cohort_group_id)
+
+    def test_role_change_and_deactivation_invalidate_the_cache(self):
+        self.client.get(reverse('student_dashboard'))
+        self.student.role = 'Teacher'
+        self.student.save()
+        self.assertEqual(self.client.get(reverse('student_dashboard')).status_code, 403)
+
+        self.student.is_active = False
+        self.student.save()
+        response = self.client.get(reverse('teacher_dashboard'))
+        self.assertEqual(response.status_code, 302)
+
+
+class StudentPasswordPolicyTests(TestCase):
+    def test_students_get_the_student_hasher_and_staff_the_default(self):
+        student = CustomUser(username='student', role='Student')
+        student.set_password('AB1234567')
+        teacher = CustomUser(username='teacher', role='Teacher')
+        teacher.set_password('AB1234567')
+        self.assertTrue(student.password.startswith('pbkdf2_sha256_student$100000$'))
+        self.assertTrue(teacher.password.startswith('pbkdf2_sha256$'))
+
+    def test_login_rehashes_to_the_current_student_policy(self):
+        student = CustomUser.objects.create(
+            username='student', role='Student', password=make_password('AB1234567', hasher='pbkdf2_sha256'),
+        )
+        self.assertIsNotNone(authenticate(None, username='student', password='AB1234567'))
+        student.refresh_from_db()
+        self.assertTrue(student.password.startswith('pbkdf2_sha256_student$100000$'))
+
+        with self.settings(STUDENT_PASSWORD_ITERATIONS=120000):
+            self.assertIsNotNone(authenticate(None, username='student', password='AB1234567'))
+        student.refresh_from_db()
+        self.assertTrue(student.password.startswith('pbkdf2_sha256_student$120000$'))
+        self.assertIsNone(authenticate(None, username='student', password='wrong'))
+
+
+class AsyncExamApiTests(TestCase):
+    def setUp(self):
+        clear_snapshot_cache()
+        teacher = CustomUser.objects.create(username='teacher', role='Teacher')
+        self.student = CustomUser.objects.create(username='student', role='Student')
+        subject = Subject.objects.create(name='Maths', created_by=teacher)
+        self.client.force_login(teacher)
+        self.client.post(reverse('create_test'), {
+            'test_name': 'Quiz',
+            'subject': subject.id,
+            'total_time_minutes': 30,
+            'status': 'Published',
+            'default_points_value': 1,
+            'question_text': ['What is 2 + 2?', 'What is 3 + 3?'],
+            'question_0_answer_text': ['3', '4'],
+            'question_0_is_correct': ['1'],
+            'question_1_answer_text': ['6', '7'],
+            'question_1_is_correct': ['0'],
+        })
+        self.test = Test.objects.get()
+        self.answers = {
+            str(question.id): {answer.answer_text: str(answer.id) for answer in question.answers.all()}
+            for question in self.test.questions.all()
+        }
+        self.q1, self.q2 = sorted(self.answers, key=int)
+
+    async def test_paper_autosave_status_and_submit(self):
+        await self.async_client.aforce_login(self.student)
+        urls = {name: reverse(f'api_{name}', args=[self.test.id]) for name in ('test_paper', 'autosave_answers', 'attempt_status', 'submit_test')}
+
+        paper = (await self.async_client.get(urls['test_paper'])).json()
+        self.assertEqual(len(paper['questions']), 2)
+        self.assertNotIn('is_correct', paper['questions'][0]['answers'][0])
+        self.assertEqual((await self.async_client.get(urls['attempt_status'])).json(), {'status': 'not_started'})
+
+        data = {'snapshot_version': paper['version'], f'question_{self.q1}': self.answers[self.q1]['4']}
+        self.assertEqual((await self.async_client.post(urls['autosave_answers'], data)).json(), {'saved': 1, 'answered': 1})
+        status = (await self.async_client.get(urls['attempt_status'])).json()
+        self.assertEqual((status['status'], status['answered']), ('in_progress', 1))
+
+        # The autosaved answer counts at submission together with the posted one
+        data = {'snapshot_version': paper['version'], f'question_{self.q2}': self.answers[self.q2]['6']}
+        self.assertEqual((await self.async_client.post(urls['submit_test'], data)).json()['score_achieved'], 2)
+        result = await StudentResult.objects.aget(student=self.student)
+        self.assertEqual((result.status, result.snapshot_version), ('Completed', paper['version']))
+
+        self.assertEqual((await self.async_client.post(urls['submit_test'], data)).status_code, 409)
+        self.assertEqual((await self.async_client.get(urls['test_paper'])).status_code, 403)
+        self.assertEqual((await self.async_client.get(urls['attempt_status'])).json()['status'], 'completed')
+
+    async def test_submission_is_graded_against_the_served_version(self):
+        await self.async_client.aforce_login(self.student)
+        urls = {name: reverse(f'api_{name}', args=[self.test.id]) for name in ('test_paper', 'autosave_answers', 'submit_test')}
+        self.assertEqual((await self.async_client.get(urls['test_paper'])).json()['version'], 1)
+        # The test is republished (version 2) while the student sits version 1
+        await sync_to_async(publish_test_snapshot)(self.test)
+
+        data = {'snapshot_version': 2, f'question_{self.q1}': self.answers[self.q1]['4']}
+        self.assertEqual((await self.async_client.post(urls['autosave_answers'], data)).status_code, 409)
+        self.assertEqual((await self.async_client.post(urls['submit_test'], data)).status_code, 409)
+        data['snapshot_version'] = 1
+        await self.async_client.post(urls['submit_test'], data)
+        result = await StudentResult.objects.aget(student=self.student)
+        self.assertEqual((result.snapshot_version, result.score_achieved), (1, 1))
+
+    async def test_other_roles_are_refused(self):
+        teacher = await CustomUser.objects.aget(username='teacher')
+        await self.async_client.aforce_login(teacher)
+        response = await self.async_client.get(reverse('api_test_paper', args=[self.test.id]))
+        self.assertEqual(response.status_code, 403)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class AdmissionControlTests(TestCase):
+    def setUp(self):
+        caches['default'].clear()
+        self.clock = FakeClock()
+
+    def test_tickets_are_admitted_in_order_as_tokens_refill(self):
+        controller = AdmissionController('quiz', rate=1, burst=2, clock=self.clock)
+        tickets = [controller.take_ticket() for _ in range(5)]
+        self.assertEqual([controller.position(ticket) for ticket in tickets], [0, 0, 1, 2, 3])
+        self.assertEqual(controller.counters(), {'admitted': 2, 'queued': 3})
+
+        self.clock.now = 1.5
+        self.assertEqual([controller.position(ticket) for ticket in tickets], [0, 0, 0, 1, 2])
+        self.clock.now = 60
+        self.assertEqual(controller.counters(), {'admitted': 5, 'queued': 0})
+
+    def test_peek_reads_without_admitting(self):
+        controller = AdmissionController('quiz', rate=1, burst=1, clock=self.clock)
+        self.assertIsNone(controller.peek())
+        tickets = [controller.take_ticket() for _ in range(3)]
+        state = caches['default'].get_many(['core.admission:quiz:issued', 'core.admission:quiz:epoch'])
+        for _ in range(3):
+            self.assertEqual(controller.peek(), {'admitted': 1, 'queued': 2})
+        self.assertEqual(caches['default'].get_many(list(state)), state)
+        self.assertEqual(controller.position(tickets[-1]), 2)
+
+    def test_workers_sharing_the_cache_share_one_queue(self):
+        # Two workers' controllers interleaving: tickets stay unique and reads never admit anyone
+        workers = [AdmissionController('quiz', rate=1, burst=2, clock=self.clock) for _ in range(2)]
+        tickets = [workers[i % 2].take_ticket() for i in range(6)]
+        self.assertEqual(tickets, [1, 2, 3, 4, 5, 6])
+        for _ in range(3):
+            self.assertEqual([workers[1].counters(), workers[0].counters()], [{'admitted': 2, 'queued': 4}] * 2)
+
+        # After a long idle spell the bucket holds only `burst` tokens again
+        self.clock.now = 3600
+        late = [workers[0].take_ticket() for _ in range(4)]
+        self.assertEqual([workers[1].position(ticket) for ticket in tickets + late], [0] * 8 + [1, 2])
+
+    def test_status_polling_does_not_issue_tickets_for_unavailable_tests(self):
+        teacher = CustomUser.objects.create(username='teacher', role='Teacher')
+        subject = Subject.objects.create(name='Maths', created_by=teacher)
+        draft = Test.objects.create(test_name='Draft', subject=subject, created_by=teacher)
+        self.client.force_login(CustomUser.objects.create(username='student', role='Student'))
+        self.assertEqual(self.client.get(reverse('admission_status', args=[draft.id])).status_code, 404)
+        self.assertFalse(AdmissionController(draft.id).has_state())
+
+    @override_settings(ADMISSION_RATE=1, ADMISSION_BURST=1)
+    def test_students_over_the_limit_get_the_queue_page(self):
+        teacher = CustomUser.objects.create(username='teacher', role='Teacher')
+        subject = Subject.objects.create(name='Maths', created_by=teacher)
+        test = Test.objects.create(test_name='Quiz', subject=subject, created_by=teacher, status='Published')
+        for username, template in (('first', 'core/take_test.html'), ('second', 'core/admission_queue.html')):
+            self.client.force_login(CustomUser.objects.create(username=username, role='Student'))
+            self.assertTemplateUsed(self.client.get(reverse('take_test', args=[test.id])), template)
+        with CaptureQueriesContext(connection) as queries:
+            status = self.client.get(reverse('admission_status', args=[test.id])).json()
+        self.assertEqual(status, {'admitted': False, 'position': 1})
+        # Polling only touches the session; the user and the queue come from the cache
+        self.assertFalse([q for q in queries.captured_queries if 'core_' in q['sql']])
+
+    def simulate_exam_start(self, controller, students=1000, workers=8, service_time=0.2):
+        """
+        All students open the test within one second. Queued students poll every 2-4 s.
+        Admitted students' take_test requests are served by `workers` workers taking `service_time` each.
+        Returns the latency of each admitted take_test request.
+        """
+        rng = random.Random(0)
+        free_at = [0.0] * workers
+        latencies = []
+        events = [(rng.random(), student, None) for student in range(students)]
+        heapq.heapify(events)
+        while events:
+            self.clock.now, student, ticket = heapq.heappop(events)
+            if ticket is None:
+                ticket = controller.take_ticket()
+            if controller.enabled and controller.position(ticket):
+                heapq.heappush(events, (self.clock.now + 2 + rng.random() * 2, student, ticket))
+                continue
+            start = max(self.clock.now, heapq.heappop(free_at))
+            heapq.heappush(free_at, start + service_time)
+            latencies.append(start + service_time - self.clock.now)
+        return sorted(latencies)
+
+    def test_admitted_students_p99_latency_stays_under_target(self):
+        target = 1.0  # Seconds, five service times
+        admitted = self.simulate_exam_start(AdmissionController('quiz', rate=30, burst=10, clock=self.clock))
+        self.assertEqual(len(admitted), 1000)
+        self.assertLess(admitted[989], target)
+
+        # Without admission control the same storm queues on the workers
+        self.clock.now = 0.0
+        unthrottled = self.simulate_exam_start(AdmissionController('open', rate=0, burst=0, clock=self.clock))
+        self.assertGreater(unthrottled[989], target * 10)
+
+
+class QueryBudgetMiddlewareTests(TestCase):
+    def test_requests_over_budget_are_logged_with_their_costs(self):
+        budgets = dict(settings.QUERY_BUDGET_DEFAULTS, response_bytes=100)
+        with self.settings(QUERY_BUDGET_DEFAULTS=budgets), self.assertLogs('core.slow_requests', 'WARNING') as logs:
+            self.client.get(reverse('login'))
+        record = logs.records[0]
+        self.assertIn('login over budget: response_bytes', record.getMessage())
+        self.assertGreater(record.template_ms, 0)
+        self.assertGreater(record.response_bytes, 100)
+
+    def test_strict_mode_fails_the_request(self):
+        student = CustomUser.objects.create(username='student', role='Student')
+        self.client.force_login(student)
+        with self.settings(QUERY_BUDGET_STRICT=True), patch.dict(QUERY_BUDGETS, {'student_dashboard': {'queries': 1}}):
+            with self.assertRaisesMessage(QueryBudgetExceeded, 'student_dashboard over budget: queries'):
+                self.client.get(reverse('student_dashboard'))
+
+    async def test_async_requests_stay_async_and_are_measured(self):
+        self.assertTrue(iscoroutinefunction(QueryBudgetMiddleware(async_get_response)))
+        student = await CustomUser.objects.acreate(username='student', role='Student')
+        await self.async_client.aforce_login(student)
+        with patch.dict(QUERY_BUDGETS, {'api_attempt_status': {'queries': 0}}), self.assertLogs('core.slow_requests', 'WARNING') as logs:
+            await self.async_client.get(reverse('api_attempt_status', args=[1]))
+        self.assertGreater(logs.records[0].queries, 0)
+
+    async def test_concurrent_async_requests_count_only_their_own_queries(self):
+        middleware = QueryBudgetMiddleware(run_queries)
+        requests = [RequestFactory().get(f'/{count}/') for count in (1, 20)]
+        budgets = dict(settings.QUERY_BUDGET_DEFAULTS, queries=0)
+        with self.settings(QUERY_BUDGET_DEFAULTS=budgets), self.assertLogs('core.slow_requests', 'WARNING') as logs:
+            await asyncio.gather(*(middleware(request) for request in requests))
+        self.assertEqual(sorted((record.path, record.queries) for record in logs.records), [('/1/', 1), ('/20/', 20)])
+
+
+async def async_get_response(request):
+    return HttpResponse()
+
+
+async def run_queries(request):
+    """An async view running as many queries as its path says, yielding to other requests between them."""
+    for _ in range(int(request.path.strip('/'))):
+        await CustomUser.objects.filter(id=0).aexists()
+        await asyncio.sleep(0)
+    return HttpResponse()
+
+
+def excel_upload(name, rows):
+    """An in-memory .xlsx upload with `rows` (the first row is the header)."""
+    workbook = openpyxl.Workbook()
+    for row in rows:
+        workbook.active.append(row)
+    content = BytesIO()
+    workbook.save(content)
+    return SimpleUploadedFile(name, content.getvalue())
+
+
+@override_settings(AUTH_USER_CACHE_TTL=0, QUERY_BUDGET_STRICT=True)
+class ViewQueryCountTests(TestCase):
+    """
+    Every route in core/urls.py, for every role allowed to use it, must run the same number of queries
+    however many tests, questions, students and results exist. Requests run in strict budget mode,
+    so each must also stay within its QUERY_BUDGETS entry.
+    """
+
+    def setUp(self):
+        self.admin = CustomUser.objects.create(username='admin', role='Admin')
+        self.teacher = CustomUser.objects.create(username='teacher', role='Teacher')
+        self.student = CustomUser.objects.create(
+            username='student', role='Student', password=make_password('secret', hasher=student_password_hasher())
+        )
+        self.seeded = 0
+
+    def seed(self, scale):
+        """
+        Add `scale` published tests of `scale` questions each, `scale` students who completed all of them
+        (plus an archived attempt each), and completed results for self.student on all but the newest test,
+        which becomes self.target.
+        """
+        subject = Subject.objects.create(name=f'Subject {self.seeded}', created_by=self.teacher)
+        tests = []
+        for i in range(scale):
+            test = Test.objects.create(
+                test_name=f'Quiz {self.seeded}.{i}', subject=subject, created_by=self.teacher, status='Published'
+            )
+            create_questions(test, [
+                (f'Question {self.seeded}.{i}.{j}', [('Right', True), ('Wrong', False)]) for j in range(scale)
+            ], 1)
+            publish_test_snapshot(test)
+            tests.append(test)
+        students = CustomUser.objects.bulk_create(
+            [CustomUser(username=f'student{self.seeded}.{i}', role='Student') for i in range(scale)]
+        )
+        now = timezone.now()
+        StudentResult.objects.bulk_create([
+            StudentResult(student=student, test=test, status='Completed', score_achieved=1, total_score=25, completion_date=now)
+            for student in students for test in tests
+        ] + [
+            StudentResult(student=self.student, test=test, status='Completed', score_achieved=1, total_score=25, completion_date=now)
+            for test in tests[:-1]
+        ])
+        ArchivedStudentResult.objects.bulk_create([
+            ArchivedStudentResult(student=student, test=tests[0], status='Completed', completion_date=now - timedelta(days=1000))
+            for student in students + [self.student]
+        ])
+        # Bulk inserts send no post_save
+        sync_eligibility(test_ids=[test.id for test in tests])
+        refresh_attempt_state(student_ids=[self.student.id])
+        self.seeded += 1
+        self.scale = scale
+        self.target = tests[-1]
+        self.result = StudentResult.objects.filter(test=self.target).exclude(student=self.student).first()
+
+    def edit_data(self):
+        """An edit_test POST that resubmits the target test unchanged."""
+        data = {
+            'test_name': self.target.test_name, 'subject': self.target.subject_id, 'total_time_minutes': 60,
+            'status': 'Published', 'default_points_value': 1, 'question_id': [], 'question_text': [],
+        }
+        for i, question in enumerate(self.target.questions.prefetch_related('answers')):
+            data['question_id'].append(question.id)
+            data['question_text'].append(question.question_text)
+            answers = list(question.answers.all())
+            data[f'question_{i}_answer_id'] = [answer.id for answer in answers]
+            data[f'question_{i}_answer_text'] = [answer.answer_text for answer in answers]
+            data[f'question_{i}_is_correct'] = [j for j, answer in enumerate(answers) if answer.is_correct]
+        return data
+
+    def changed_edit_data(self):
+        """An edit_test POST that rewords one question and one of its answers."""
+        data = self.edit_data()
+        data['question_text'][0] += ' (reworded)'
+        data['question_0_answer_text'][0] += ' (reworded)'
+        return data
+
+    def answer_data(self):
+        answers = Answer.objects.filter(question__test=self.target, is_correct=True)
+        return dict({f'question_{answer.question_id}': answer.id for answer in answers}, snapshot_version=1)
+
+    def create_data(self):
+        """A create_test POST with as many questions as the current seed scale."""
+        data = {
+            'test_name': 'New', 'subject': self.target.subject_id, 'total_time_minutes': 30, 'status': 'Published',
+            'default_points_value': 1, 'question_text': [f'New question {i}' for i in range(self.scale)],
+        }
+        for i in range(self.scale):
+            data[f'question_{i}_answer_text'] = ['Right', 'Wrong']
+            data[f'question_{i}_is_correct'] = ['0']
+        return data
+
+    def import_test_data(self):
+        return {
+            'test_name': 'Imported', 'subject': self.target.subject_id, 'total_time_minutes': 30, 'default_points_value': 1,
+            'excel_file': excel_upload('test.xlsx', [
+                ["Question Text (Only 'MCQ' supported)", 'Answer 1 Text', 'Answer 1 Correct', 'Answer 2 Text', 'Answer 2 Correct'],
+            ] + [[f'Imported question {i}', 'Right', True, 'Wrong', False] for i in range(self.scale)]),
+        }
+
+    def import_students_data(self):
+        """A student import with one already existing username and as many new students (and groups) as the seed scale."""
+        return {
+            'excel_file': excel_upload('students.xlsx', [
+                ['student_id', 'full_name', 'passport_series', 'course', 'group', 'direction'],
+                ['student', 'Existing Student', 'AB1234567', '1', 'A', 'Maths'],
+            ] + [[f'import{self.seeded}.{i}', 'New Student', 'AB1234567', f'C{self.seeded}', f'G{self.seeded}.{i}', f'D{self.seeded}']
+         for i in range(self.scale)]),
+        }
+
+    def routes(self):
+        """(url name, role, method, args, data) for every route; callables are evaluated after seeding."""
+        target = lambda: [self.target.id]
+        result = lambda: [self.result.id]
+        routes = [
+            ('login', None, 'get', [], None),
+            ('login', None, 'post', [], {'username': 'student', 'password': 'secret'}),
+            ('logout', 'Student', 'get', [], None),
+        ]
+        for role in ('Admin', 'Teacher', 'Student'):
+            routes.append(('dashboard', role, 'get', [], None))
+        for role in ('Admin', 'Teacher'):
+            routes += [
+                ('admindashboard', role, 'get', [], None),
+                ('export_student_results', role, 'get', [], {'include_archived': '1'}),
+                ('export_student_results_csv', role, 'get', [], {'include_archived': '1'}),
+                ('group_results', role, 'get', [], lambda: {'by': 'group', 'test': self.target.id}),
+            ]
+        routes += [
+            ('delete_student_result', 'Admin', 'get', result, None),
+            ('delete_student_result', 'Admin', 'post', result, {}),
+            ('retake_test', 'Admin', 'post', result, {}),
+            ('bulk_results', 'Admin', 'get', [], None),
+            ('bulk_results', 'Admin', 'post', [], lambda: {'action': 'reopen', 'test': self.target.id}),
+            ('import_students', 'Admin', 'get', [], None),
+            ('import_students', 'Admin', 'post', [], self.import_students_data),
+            ('download_sample_student_excel', 'Admin', 'get', [], None),
+            ('metrics', 'Admin', 'get', [], None),
+            ('teacher_dashboard', 'Teacher', 'get', [], None),
+            ('create_test', 'Teacher', 'get', [], None),
+            ('create_test', 'Teacher', 'post', [], self.create_data),
+            ('search_questions', 'Teacher', 'get', [], {'q': 'question', 'teacher': 'me'}),
+            ('import_test', 'Teacher', 'get', [], None),
+            ('import_test', 'Teacher', 'post', [], self.import_test_data),
+            ('download_sample_excel', 'Teacher', 'get', [], None),
+            ('edit_test', 'Teacher', 'get', target, None),
+            ('edit_test', 'Teacher', 'post', target, self.edit_data),
+            ('edit_test', 'Teacher', 'post', target, self.changed_edit_data),
+            ('regrade_test', 'Teacher', 'get', target, None),
+            ('regrade_test', 'Teacher', 'post', target, {}),
+            ('assign_test', 'Teacher', 'get', target, None),
+            ('assign_test', 'Teacher', 'post', target, {'kind': 'student', 'name': 'student'}),
+            ('delete_test', 'Teacher', 'get', target, None),
+            ('delete_test', 'Teacher', 'post', target, {}),
+            ('student_dashboard', 'Student', 'get', [], {'include_archived': '1'}),
+            ('take_test', 'Student', 'get', target, None),
+            ('admission_status', 'Student', 'get', target, None),
+            ('submit_test', 'Student', 'post', target, self.answer_data),
+            ('api_test_paper', 'Student', 'get', target, None),
+            ('api_autosave_answers', 'Student', 'post', target, self.answer_data),
+            ('api_attempt_status', 'Student', 'get', target, None),
+            ('api_submit_test', 'Student', 'post', target, self.answer_data),
+        ]
+        return routes
+
+    def count_queries(self, name, role, method, args, data):
+        args = args() if callable(args) else args
+        data = data() if callable(data) else data
+        users = {'Admin': self.admin, 'Teacher': self.teacher, 'Student': self.student}
+        if role:
+            self.client.force_login(users[role])
+        caches['default'].clear()
+        clear_snapshot_cache()
+        with CaptureQueriesContext(connection) as ctx:
+            response = getattr(self.client, method)(reverse(name, args=args), data)
+        self.assertLess(response.status_code, 400, f'{method.upper()} {name} as {role}')
+        self.assertNotIn('error', [message.tags for message in get_messages(response.wsgi_request)])
+        self.client.logout()
+        return len(ctx.captured_queries)
+
+    def test_every_route_is_covered(self):
+        covered = {name for name, *_ in self.routes()}
+        self.assertEqual(covered, {pattern.name for pattern in urlpatterns})
+
+    def test_query_counts_do_not_grow_with_data(self):
+        for route in self.routes():
+            name, role, method = route[:3]
+            with self.subTest(route=name, role=role, method=method):
+                self.seed(2)
+                small = self.count_queries(*route)
+                self.seed(6)
+                self.assertEqual(small, self.count_queries(*route))
+
+
+class GenerateDataTests(TestCase):
+    def test_generates_consistent_data_and_importable_workbooks(self):
+        with tempfile.TemporaryDirectory() as directory:
+            call_command(
+                'generate_data', subjects=2, teachers=2, students=20, tests=5, questions=3, results=150,
+                seed=1, workbooks=directory, workbook_rows=4, stdout=StringIO(),
+            )
+            self.assertEqual(CustomUser.objects.filter(role='Student').count(), 20)
+            self.assertEqual(Question.objects.count(), 15)
+            self.assertEqual(Answer.objects.filter(is_correct=True).count(), 15)
+            self.assertEqual(StudentResult.objects.count(), 150)
+            completed = StudentResult.objects.filter(status='Completed')
+            self.assertFalse(completed.filter(score_achieved__gt=3).exists())
+            self.assertFalse(completed.filter(completion_date=None).exists())
+            # Every account shares one hash, and it is the student policy's
+            student = CustomUser.objects.filter(role='Student').first()
+            self.assertEqual(authenticate(username=student.username, password='AB1234567'), student)
+
+            self.client.force_login(CustomUser.objects.create(username='admin', role='Admin'))
+            with open(os.path.join(directory, 'students.xlsx'), 'rb') as workbook:
+                self.client.post(reverse('import_students'), {'excel_file': workbook})
+            self.assertEqual(CustomUser.objects.filter(username__startswith='gen_import_').count(), 4)
+
+
+class LoadTestExamTests(TestCase):
+    def test_every_student_completes_the_exam(self):
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, 'run.json')
+            call_command('loadtest_exam', students=2, processes=1, questions=2, output=output, stdout=StringIO())
+            with open(output) as source:
+                report = json.load(source)
+        self.assertEqual(report['completed_flows'], 2)
+        self.assertEqual({endpoint: stats['errors'] for endpoint, stats in report['endpoints'].items()}, {
+            'login': 0, 'student_dashboard': 0, 'take_test': 0, 'submit_test': 0,
+        })
+        self.assertFalse(CustomUser.objects.filter(username__startswith='__loadtest_').exists())
+        self.assertFalse(Test.objects.exists())
+
+    def test_a_failed_seed_is_cleaned_up(self):
+        with patch('core.management.commands.loadtest_exam.create_questions', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                call_command('loadtest_exam', students=2, processes=1, stdout=StringIO())
+        self.assertFalse(CustomUser.objects.filter(username__startswith='__loadtest_').exists())
+        self.assertFalse(Subject.objects.exists())
+
+
+class MetricsTests(TestCase):
+    def test_totals_add_up_worker_files(self):
+        with tempfile.TemporaryDirectory() as directory:
+            registry = Registry(directory)
+            requests = Counter('requests_total', 'Requests.', registry=registry)
+            latency = Histogram('latency_seconds', 'Latency.', buckets=(0.1, 1), registry=registry)
+            requests.inc(outcome='ok')
+            latency.observe(0.05)
+            latency.observe(5)
+            # Another worker's file, as written by its flush
+            with open(os.path.join(directory, '99999.json'), 'w') as other:
+                other.write(json.dumps({
+                    'requests_total': {json.dumps([['outcome', 'ok']]): 2},
+                    'latency_seconds': {'[]': [0, 1, 0, 0.5]},
+                }))
+            text = registry.render()
+        self.assertIn('# TYPE requests_total counter\nrequests_total{outcome="ok"} 3.0\n', text)
+        self.assertIn('latency_seconds_bucket{le="0.1"} 1\nlatency_seconds_bucket{le="1.0"} 2\n', text)
+        self.assertIn('latency_seconds_bucket{le="+Inf"} 3\nlatency_seconds_sum 5.55\nlatency_seconds_count 3\n', text)
+
+    def test_workers_that_exited_keep_their_counts_but_not_their_gauges(self):
+        exited = subprocess.run([sys.executable, '-c', 'import os; print(os.getpid())'], capture_output=True, text=True)
+        with tempfile.TemporaryDirectory() as directory:
+            registry = Registry(directory)
+            requests = Counter('requests_total', 'Requests.', registry=registry)
+            in_flight = Gauge('in_flight', 'Requests in flight.', registry=registry)
+            requests.inc()
+            in_flight.inc()
+            with open(os.path.join(directory, f'{exited.stdout.strip()}.json'), 'w') as other:
+                other.write(json.dumps({'requests_total': {'[]': 2}, 'in_flight': {'[]': 3}}))
+            totals = registry.collect()
+        self.assertEqual(totals, {'requests_total': {'[]': 3}, 'in_flight': {'[]': 1}})
+
+    def test_endpoint_reports_exam_activity_to_admins_only(self):
+        teacher = CustomUser.objects.create(username='teacher', role='Teacher')
+        student = CustomUser.objects.create(username='student', role='Student')
+        test = Test.objects.create(
+            test_name='Quiz', subject=Subject.objects.create(name='Maths', created_by=teacher),
+            created_by=teacher, status='Published',
+        )
+        create_questions(test, [('What is 2 + 2?', [('4', True), ('5', False)])], 1)
+        caches['default'].clear()
+        active = REGISTRY.collect().get(ACTIVE_ATTEMPTS.name, {}).get('[]', 0)
+
+        self.client.force_login(student)
+        self.client.get(reverse('take_test', args=[test.id]))
+        self.client.get(reverse('take_test', args=[test.id]))  # A reload is the same attempt
+        self.assertEqual(REGISTRY.collect()[ACTIVE_ATTEMPTS.name]['[]'], active + 1)
+        self.client.post(reverse('submit_test', args=[test.id]), {'snapshot_version': 1})
+        self.assertEqual(REGISTRY.collect()[ACTIVE_ATTEMPTS.name]['[]'], active)
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
+
+        self.client.force_login(CustomUser.objects.create(username='admin', role='Admin'))
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response['Content-Type'], 'text/plain; version=0.0.4; charset=utf-8')
+        self.assertContains(response, 'exam_take_test_total{outcome="served"}')
+        self.assertContains(response, 'exam_grading_seconds_count')
+        self.assertContains(response, f'exam_admission_admitted{{test_id="{test.id}"}} 1.0')
+
+
+class LazyImportTests(SimpleTestCase):
+    def test_importing_views_does_not_load_spreadsheet_libraries(self):
+        # A fresh interpreter: in this one the test suite has already imported them
+        probe = 'import json, sys, django; django.setup(); import core.views, core.async_views; print(json.dumps(sorted(sys.modules)))'
+        output = subprocess.run(
+            [sys.executable, '-c', probe], cwd=settings.BASE_DIR, capture_output=True, text=True, check=True,
+            env=dict(os.environ, DJANGO_SETTINGS_MODULE='ExamSystem.settings'),
+        ).stdout
+        loaded = {name.split('.')[0] for name in json.loads(output.strip().splitlines()[-1])}
+        self.assertEqual(loaded & set(MODULES_IMPORTED_LAZILY), set())
+        self.assertIn('core', loaded)
+
+
+@override_settings(ADMISSION_RATE=0)
+class RegradeTests(TestCase):
+    def setUp(self):
+        clear_snapshot_cache()
+        self.teacher = CustomUser.objects.create(username='teacher', role='Teacher')
+        subject = Subject.objects.create(name='Maths', created_by=self.teacher)
+        self.client.force_login(self.teacher)
+        self.client.post(reverse('create_test'), {
+            'test_name': 'Quiz', 'subject': subject.id, 'total_time_minutes': 30, 'status': 'Published',
+            'default_points_value': 1,
+            'question_text': ['What is 2 + 2?', 'What is 3 + 3?'],
+            'question_0_answer_text': ['4', '5'],
+            'question_0_is_correct': ['1'],  # Wrong: '5' is marked correct
+            'question_1_answer_text': ['6', '7'],
+            'question_1_is_correct': ['0'],
+        })
+        self.test = Test.objects.get()
+        q1, q2 = self.test.questions.order_by('id')
+        self.answers = {answer.answer_text: answer for answer in Answer.objects.all()}
+
+        # Three students submit against the wrong key
+        for name, picks in (('right', ('4', '6')), ('wrong', ('5', '6')), ('blank', ())):
+            student = CustomUser.objects.create(username=name, role='Student')
+            self.client.force_login(student)
+            data = {f'question_{question.id}': self.answers[pick].id for question, pick in zip((q1, q2), picks)}
+            self.client.post(reverse('submit_test', args=[self.test.id]), dict(data, snapshot_version=1))
+        # One attempt from before responses were stored, and one archived attempt
+        StudentResult.objects.create(student=self.teacher, test=self.test, status='Completed', score_achieved=2)
+        ArchivedStudentResult.objects.create(
+            student=self.teacher, test=self.test, status='Completed', score_achieved=2, snapshot_version=1,
+            responses={str(q1.id): str(self.answers['5'].id), str(q2.id): str(self.answers['6'].id)},
+        )
+
+        # The teacher fixes the key: '4' is correct
+        self.client.force_login(self.teacher)
+        self.client.post(reverse('edit_test', args=[self.test.id]), {
+            'test_name': 'Quiz', 'subject': subject.id, 'total_time_minutes': 30, 'status': 'Published',
+            'default_points_value': 1,
+            'question_id': [q1.id, q2.id],
+            'question_text': ['What is 2 + 2?', 'What is 3 + 3?'],
+            'question_0_answer_id': [self.answers['4'].id, self.answers['5'].id],
+            'question_0_answer_text': ['4', '5'],
+            'question_0_is_correct': ['0'],
+            'question_1_answer_id': [self.answers['6'].id, self.answers['7'].id],
+            'question_1_answer_text': ['6', '7'],
+            'question_1_is_correct': ['0'],
+        })
+
+    def scores(self):
+        return dict(StudentResult.objects.values_list('student__username', 'score_achieved'))
+
+    def test_preview_then_regrade_with_audit(self):
+        self.assertEqual(self.scores(), {'right': 1, 'wrong': 2, 'blank': 0, 'teacher': 2})
+
+        response = self.client.get(reverse('regrade_test', args=[self.test.id]))
+        self.assertContains(response, '3 of 5 submitted attempt(s) will get a new score.')
+        self.assertContains(response, '1 attempt(s) were submitted before answers were stored')
+
+        self.client.post(reverse('regrade_test', args=[self.test.id]))
+        self.assertEqual(self.scores(), {'right': 2, 'wrong': 1, 'blank': 0, 'teacher': 2})
+        self.assertEqual(ArchivedStudentResult.objects.get().score_achieved, 1)
+
+        audit = RegradeAudit.objects.get()
+        self.assertEqual((audit.performed_by, audit.attempts_checked, audit.attempts_changed, audit.attempts_skipped),
+                         (self.teacher, 5, 3, 1))
+        right = StudentResult.objects.get(student__username='right')
+        self.assertEqual(audit.changes['results'][str(right.id)], [1, 2])
+        self.assertEqual(RegradePlan(self.test).changed, 0)
+
+    def test_other_teachers_cannot_regrade(self):
+        self.client.force_login(CustomUser.objects.create(username='other', role='Teacher'))
+        self.client.post(reverse('regrade_test', args=[self.test.id]))
+        self.assertFalse(RegradeAudit.objects.exists())
+
+    def test_command(self):
+        out = StringIO()
+        call_command('regrade_test', self.test.id, '--dry-run', stdout=out)
+        self.assertIn('3 of 5 attempt(s), 1 skipped (no stored responses) would change', out.getvalue())
+        call_command('regrade_test', self.test.id, stdout=out)
+        self.assertEqual(RegradeAudit.objects.get().attempts_changed, 3)
+
+
+class QuestionSearchTests(TestCase):
+    def setUp(self):
+        self.teacher = CustomUser.objects.create(username='teacher', role='Teacher')
+        self.other_teacher = CustomUser.objects.create(username='other', role='Teacher')
+        self.maths = Subject.objects.create(name='Maths', created_by=self.teacher)
+        self.physics = Subject.objects.create(name='Physics', created_by=self.other_teacher)
+        self.algebra = Test.objects.create(test_name='Algebra', subject=self.maths, created_by=self.teacher, total_time_minutes=30)
+        self.mechanics = Test.objects.create(test_name='Mechanics', subject=self.physics, created_by=self.other_teacher, total_time_minutes=30)
+        create_questions(self.algebra, [
+            ('Solve the quadratic equation x^2 = 4', [('x = 2 or x = -2', True), ('x = 4', False)]),
+            ('Which number is prime?', [('7', True), ('9', False)]),
+            ('Pick the linear function', [('f(x) = 2x + 1', True), ('f(x) = x^2, a quadratic', False)]),
+        ], 1)
+        create_questions(self.mechanics, [('State Newton\'s second law of motion', [('F = ma', True)])], 1)
+
+    def texts(self, *args, **kwargs):
+        return [question.question_text for question in search_questions(*args, **kwargs)]
+
+    def test_ranked_search_over_questions_and_answers(self):
+        # A match in the question text ranks above a match in an answer only
+        self.assertEqual(self.texts('quadratic'), ['Solve the quadratic equation x^2 = 4', 'Pick the linear function'])
+        self.assertEqual(self.texts('quad'), self.texts('quadratic'))  # The last word is a prefix
+        self.assertEqual(self.texts('quadratic prime'), [])  # Every word must match
+        self.assertEqual(self.texts('newton law'), ["State Newton's second law of motion"])
+        self.assertEqual(self.texts('NEAR( "OR" *'), [])  # FTS5 syntax is matched literally, not parsed
+        self.assertEqual(self.texts(''), [])
+
+    def test_filters(self):
+        self.assertEqual(len(self.texts('x', subject_id=self.maths.id)), 2)
+        self.assertEqual(self.texts('x', teacher_id=self.other_teacher.id), [])
+        self.assertEqual(self.texts('law', subject_id=self.physics.id, teacher_id=self.other_teacher.id),
+                         ["State Newton's second law of motion"])
+        self.assertEqual(len(self.texts('x', limit=1)), 1)
+
+    def test_index_follows_saves_edits_and_deletes(self):
+        answer = Answer.objects.get(answer_text='7')
+        answer.answer_text = 'seventeen'
+        answer.save()
+        self.assertEqual(self.texts('seventeen'), ['Which number is prime?'])
+
+        question = Question.objects.get(question_text='Which number is prime?')
+        question.question_text = 'Which integer is prime?'
+        question.save()
+        self.assertEqual(self.texts('integer'), ['Which integer is prime?'])
+
+        # The test editor writes with bulk_update and set-based deletes
+        self.client.force_login(self.teacher)
+        questions = list(self.algebra.questions.order_by('id').prefetch_related('answers'))
+        data = {
+            'test_name': 'Algebra', 'subject': self.maths.id, 'total_time_minutes': 30, 'status': 'Draft',
+            'default_points_value': 1, 'question_id': [], 'question_text': [],
+        }
+        for i, kept in enumerate(questions[1:]):
+            answers = list(kept.answers.all())
+            data['question_id'].append(kept.id)
+            data['question_text'].append(kept.question_text.replace('prime', 'a prime number'))
+            data[f'question_{i}_answer_id'] = [answer.id for answer in answers]
+            data[f'question_{i}_answer_text'] = [answer.answer_text + ' (edited)' for answer in answers]
+            data[f'question_{i}_is_correct'] = ['0']
+        self.client.post(reverse('edit_test', args=[self.algebra.id]), data)
+
+        self.assertEqual(self.texts('edited number'), ['Which integer is a prime number?'])
+        self.assertEqual(self.texts('equation'), [])  # Deleted by the edit
+
+        Question.objects.filter(test=self.mechanics).delete()
+        self.assertEqual(self.texts('newton'), [])
+
+    def test_deleted_answers_leave_the_index(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Answer.objects.get(answer_text='F = ma').delete()
+            Answer.objects.filter(question__test=self.algebra, is_correct=False).delete()
+        self.assertEqual(self.texts('ma'), [])
+        self.assertEqual(self.texts('9'), [])
+        self.assertEqual(self.texts('quadratic'), ['Solve the quadratic equation x^2 = 4'])
+        self.assertEqual(self.texts('7'), ['Which number is prime?'])
+
+    def test_view(self):
+        self.client.force_login(self.teacher)
+        response = self.client.get(reverse('search_questions'), {'q': 'newton'})
+        self.assertEqual(response.json()['results'], [{
+            'id': Question.objects.get(test=self.mechanics).id,
+            'question_text': "State Newton's second law of motion",
+            'points_value': 1,
+            'test': 'Mechanics',
+            'subject': 'Physics',
+            'teacher': 'other',
+            'answers': [{'answer_text': 'F = ma', 'is_correct': True}],
+        }])
+        response = self.client.get(reverse('search_questions'), {'q': 'newton', 'teacher': 'me'})
+        self.assertEqual(response.json()['results'], [])
+
+        self.client.force_login(CustomUser.objects.create(username='student', role='Student'))
+        self.assertNotEqual(self.client.get(reverse('search_questions'), {'q': 'newton'}).status_code, 200)
+
+    def test_migration_builds_the_index_like_the_live_code(self):
+        # Migration 0010 carries frozen SQL; dropping the index and re-running it must give the same matches
+        migration = importlib.import_module('core.migrations.0010_question_search')
+        editor = SimpleNamespace(connection=connection, execute=lambda sql: connection.cursor().execute(sql))
+        before = [self.texts(query) for query in ('quadratic', 'newton law', 'ma', 'x')]
+        migration.drop_search_index(django_apps, editor)
+        migration.create_search_index(django_apps, editor)
+        self.assertEqual([self.texts(query) for query in ('quadratic', 'newton law', 'ma', 'x')], before)
+
+    def test_admin_search_and_rebuild(self):
+        self.client.force_login(CustomUser.objects.create(username='admin', role='Admin', is_staff=True, is_superuser=True))
+        response = self.client.get(reverse('admin:core_question_changelist'), {'q': 'ma'})
+        self.assertEqual([question.question_text for question in response.context['cl'].result_list],
+                         ["State Newton's second law of motion"])
+
+        with connection.cursor() as cursor:
+            cursor.execute('DELETE FROM core_question_search')
+        self.assertEqual(self.texts('newton'), [])
+        call_command('rebuild_question_search', stdout=StringIO())
+        self.assertEqual(self.texts('newton'), ["State Newton's second law of motion"])
+
+
+class CohortTests(TestCase):
+    def setUp(self):
+        self.admin = CustomUser.objects.create(username='admin', role='Admin')
+        teacher = CustomUser.objects.create(username='teacher', role='Teacher')
+        subject = Subject.objects.create(name='Maths', created_by=teacher)
+        self.test = Test.objects.create(test_name='Quiz', subject=subject, created_by=teacher, status='Published')
+        self.client.force_login(self.admin)
+
+    def test_saving_a_student_resolves_cohorts(self):
+        student = CustomUser.objects.create(username='s1', role='Student', student_groups=' CS-101 ', course=2, student_direction='Law')
+        self.assertEqual((student.cohort_group.name, student.cohort_course.name, student.cohort_direction.name), ('CS-101', '2', 'Law'))
+        other = CustomUser.objects.create(username='s2', role='Student', student_groups='CS-101')
+        self.assertEqual(other.cohort_group_id, student.cohort_group_id)
+        self.assertIsNone(other.cohort_course)
+
+        student.student_groups = ''
+        student.save()
+        self.assertIsNone(CustomUser.objects.get(id=student.id).cohort_group)
+        self.assertEqual(StudentGroup.objects.count(), 1)
+
+    def test_import_resolves_cohorts_in_bulk(self):
+        CustomUser.objects.create(username='old', role='Student', student_groups='CS-101')
+        self.client.post(reverse('import_students'), {'excel_file': excel_upload('students.xlsx', [
+            ['student_id', 'full_name', 'passport_series', 'course', 'group', 'direction'],
+            ['1001', 'Ali Valiyev', 'AB1234567', 1, 'CS-101', 'Computer Science'],
+            ['1002', 'Vali Aliyev', 'AB7654321', 2, 'MA-201', 'Mathematics'],
+            ['1003', 'Hasan Husanov', 'AB1111111', 1, 'MA-201', 'Mathematics'],
+        ])})
+        students = {student.username: student for student in CustomUser.objects.select_related(
+            'cohort_group', 'cohort_course', 'cohort_direction').filter(username__in=['1001', '1002', '1003'])}
+        self.assertEqual(students['1001'].cohort_group.name, 'CS-101')
+        self.assertEqual(students['1002'].cohort_group_id, students['1003'].cohort_group_id)
+        self.assertEqual(sorted(Course.objects.values_list('name', flat=True)), ['1', '2'])
+        self.assertEqual(sorted(Direction.objects.values_list('name', flat=True)), ['Computer Science', 'Mathematics'])
+        self.assertEqual(StudentGroup.objects.count(), 2)
+
+    def test_group_results_in_one_query(self):
+        for i, (group, score) in enumerate([('A', 4), ('A', 6), ('B', 3), (None, 1)]):
+            student = CustomUser.objects.create(username=f'student{i}', role='Student', student_groups=group, course='1')
+            StudentResult.objects.create(student=student, test=self.test, status='Completed', score_achieved=score, total_score=10)
+        StudentResult.objects.create(student=CustomUser.objects.get(username='student0'), test=self.test)  # Pending
+
+        with self.assertNumQueries(1):
+            rows = group_result_summary('group', self.test)
+        self.assertEqual([(row['name'], row['students'], row['attempts'], row['average_score'], row['best_score'])
+                          for row in rows], [('A', 2, 2, 5.0, 6), ('B', 1, 1, 3.0, 3), (None, 1, 1, 1.0, 1)])
+        self.assertEqual([(row['name'], row['attempts']) for row in group_result_summary('course')], [('1', 4)])
+
+        response = self.client.get(reverse('group_results'), {'by': 'group', 'test': self.test.id})
+        self.assertContains(response, '<td>5.00</td>', html=True)
+
+
+class EligibilityTests(TestCase):
+    def setUp(self):
+        self.teacher = CustomUser.objects.create(username='teacher', role='Teacher')
+        self.subject = Subject.objects.create(name='Maths', created_by=self.teacher)
+        self.test = Test.objects.create(test_name='Quiz', subject=self.subject, created_by=self.teacher, status='Published')
+        self.ali = CustomUser.objects.create(username='ali', role='Student', student_groups='CS-101', course='1', student_direction='Law')
+        self.vali = CustomUser.objects.create(username='vali', role='Student', student_groups='MA-201', course='2', student_direction='Law')
+
+    def eligible(self, test=None):
+        return set(TestEligibility.objects.filter(test=test or self.test).values_list('student__username', flat=True))
+
+    def test_assignments_restrict_an_open_test(self):
+        self.assertEqual(self.eligible(), {'ali', 'vali'})
+        TestAssignment.objects.create(test=self.test, student_group=self.ali.cohort_group)
+        self.assertEqual(self.eligible(), {'ali'})
+        TestAssignment.objects.create(test=self.test, course=self.vali.cohort_course)
+        self.assertEqual(self.eligible(), {'ali', 'vali'})
+
+        # Moving a student to another group and unpublishing the test both resync
+        self.ali.student_groups = 'MA-201'
+        self.ali.save()
+        self.assertEqual(self.eligible(), {'vali'})
+        self.test.status = 'Draft'
+        self.test.save()
+        self.assertEqual(self.eligible(), set())
+
+        TestAssignment.objects.filter(course__isnull=False).get().delete()
+        self.test.status = 'Published'
+        self.test.save()
+        self.assertEqual(self.eligible(), set())
+        TestAssignment.objects.get().delete()
+        self.assertEqual(self.eligible(), {'ali', 'vali'})
+
+    def test_assign_view(self):
+        self.client.force_login(self.teacher)
+        url = reverse('assign_test', args=[self.test.id])
+        self.client.post(url, {'kind': 'direction', 'name': ' Law '})
+        self.client.post(url, {'kind': 'student', 'name': 'ali'})
+        response = self.client.post(url, {'kind': 'group', 'name': 'Nope'}, follow=True)
+        self.assertContains(response, "No group named &#x27;Nope&#x27;.")
+        self.assertEqual(TestAssignment.objects.count(), 2)
+        self.assertEqual(response.context['eligible_count'], 2)
+
+        self.client.post(url, {'action': 'remove', 'assignment': TestAssignment.objects.get(direction__isnull=False).id})
+        self.assertEqual(self.eligible(), {'ali'})
+
+    def test_can_start_follows_results(self):
+        self.assertTrue(eligible_test(self.ali, self.test.id).can_start)
+        result = StudentResult.objects.create(student=self.ali, test=self.test, status='Completed', score_achieved=3)
+        self.assertFalse(eligible_test(self.ali, self.test.id).can_start)
+        self.assertTrue(eligible_test(self.vali, self.test.id).can_start)
+
+        # A retake reopens the test; deleting the result through the admin view does too
+        retake = StudentResult.objects.create(student=self.ali, test=self.test)
+        self.assertTrue(eligible_test(self.ali, self.test.id).can_start)
+        with self.captureOnCommitCallbacks(execute=True):
+            retake.delete()
+        self.assertFalse(eligible_test(self.ali, self.test.id).can_start)
+        self.client.force_login(CustomUser.objects.create(username='admin', role='Admin'))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('delete_student_result', args=[result.id]))
+        self.assertTrue(eligible_test(self.ali, self.test.id).can_start)
+
+    def test_deleting_results_in_the_admin_reopens_the_test(self):
+        first = StudentResult.objects.create(student=self.ali, test=self.test, status='Completed', score_achieved=3)
+        second = StudentResult.objects.create(student=self.vali, test=self.test, status='Completed', score_achieved=4)
+        self.client.force_login(CustomUser.objects.create(username='root', role='Admin', is_staff=True, is_superuser=True))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('admin:core_studentresult_delete', args=[first.id]), {'post': 'yes'})
+        self.assertTrue(eligible_test(self.ali, self.test.id).can_start)
+        self.assertFalse(eligible_test(self.vali, self.test.id).can_start)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('admin:core_studentresult_changelist'), {
+                'action': 'delete_selected', '_selected_action': [second.id], 'post': 'yes',
+            })
+        self.assertFalse(StudentResult.objects.exists())
+        self.assertTrue(eligible_test(self.vali, self.test.id).can_start)
+
+    def test_dashboard_and_gate_are_single_lookups(self):
+        other = Test.objects.create(test_name='Other', subject=self.subject, created_by=self.teacher, status='Published')
+        TestAssignment.objects.create(test=other, student=self.vali)
+        Test.objects.create(test_name='Draft', subject=self.subject, created_by=self.teacher, status='Draft')
+
+        with self.assertNumQueries(1):
+            self.assertEqual([test.subject.name for test in eligible_tests(self.ali)], ['Maths'])
+        with self.assertNumQueries(1):
+            self.assertIsNone(eligible_test(self.ali, other.id))
+        self.assertEqual([test.test_name for test in eligible_tests(self.vali)], ['Quiz', 'Other'])
+
+        self.client.force_login(self.ali)
+        response = self.client.get(reverse('take_test', args=[other.id]))
+        self.assertRedirects(response, reverse('student_dashboard'))
+        self.assertEqual(list(response.wsgi_request._messages)[0].message, 'Test does not exist or is not available.')
+
+    def test_sync_matches_brute_force(self):
+        CustomUser.objects.create(username='omar', role='Student', student_groups='CS-101', course='2')
+        Test.objects.create(test_name='Draft', subject=self.subject, created_by=self.teacher)
+        for kind, name in [('group', 'CS-101'), ('direction', 'Law')]:
+            test = Test.objects.create(test_name=kind, subject=self.subject, created_by=self.teacher, status='Published')
+            TestAssignment.objects.create(test=test, **{
+                {'group': 'student_group', 'direction': 'direction'}[kind]: (StudentGroup if kind == 'group' else Direction).objects.get(name=name),
+            })
+        # Rows dropped behind the signals' back are rebuilt by a full sync
+        TestEligibility.objects.all().delete()
+        call_command('sync_eligibility', stdout=StringIO())
+
+        expected = {
+            ('ali', 'Quiz'), ('vali', 'Quiz'), ('omar', 'Quiz'),
+            ('ali', 'group'), ('omar', 'group'),
+            ('ali', 'direction'), ('vali', 'direction'),
+        }
+        self.assertEqual(set(TestEligibility.objects.values_list('student__username', 'test__test_name')), expected)
@@ -1,5 +1,26 @@
 from django.urls import path
-from . import views
+from . import async_views, views
+
+# Per-view request budgets for QueryBudgetMiddleware, keyed by URL name. Keys missing here fall back to
+# settings.QUERY_BUDGET_DEFAULTS. Keep 'queries' independent of data volume: a view whose count grows
+# with the number of rows has an N+1 and should be fixed, not given a larger budget.
+QUERY_BUDGETS = {
+    'admindashboard': {'queries': 10},
+    'export_student_results': {'queries': 8, 'db_ms': 2000, 'template_ms': None},
+    'export_student_results_csv': {'queries': 8, 'db_ms': 2000, 'template_ms': None},
+    'bulk_results': {'queries': 12},
+    'teacher_dashboard': {'queries': 10},
+    'edit_test': {'queries': 27},  # Saving applies the diff, re-indexes the questions for search and publishes a new snapshot
+    'regrade_test': {'db_ms': 5000},  # Reads and rewrites every attempt of the test
+    'assign_test': {'queries': 15},  # Adding or removing an assignment resyncs the test's eligibility
+    'search_questions': {'queries': 8, 'db_ms': 250},
+    'student_dashboard': {'queries': 10},
+    'take_test': {'queries': 25},  # Includes publishing a snapshot lazily on first access
+    'admission_status': {'queries': 6, 'db_ms': 50},  # Checks eligibility before issuing the first ticket
+    'metrics': {'queries': 6},
+    'api_test_paper': {'queries': 10},
+    'api_attempt_status': {'queries': 8, 'db_ms': 50},
+}
 
 urlpatterns = [
     # Authentication URLs
@@ -14,17 +35,32 @@ urlpatterns = [
     path('export-results-csv/', views.export_student_results_csv, name='export_student_results_csv'),
     path('result/<int:result_id>/delete/', views.delete_student_result_view, name='delete_student_result'),
     path('result/<int:result_id>/retake/', views.retake_test_view, name='retake_test'),
+    path('results/bulk/', views.bulk_results_view, name='bulk_results'),
+    path('results/groups/', views.group_results_view, name='group_results'),
+    path('students/import/', views.import_students_view, name='import_students'),
+    path('students/import/sample/', views.download_sample_student_excel, name='download_sample_student_excel'),
+    path('metrics/', views.metrics_view, name='metrics'),
     
     # Teacher URLs
     path('teacher/dashboard/', views.teacher_dashboard_view, name='teacher_dashboard'),
     path('teacher/test/create/', views.create_test_view, name='create_test'),
+    path('teacher/questions/search/', views.search_questions_view, name='search_questions'),
     path('teacher/test/import/', views.import_test_view, name='import_test'),
     path('teacher/test/import/sample/', views.download_sample_excel, name='download_sample_excel'),
     path('teacher/test/<int:test_id>/edit/', views.edit_test_view, name='edit_test'),
+    path('teacher/test/<int:test_id>/regrade/', views.regrade_test_view, name='regrade_test'),
+    path('teacher/test/<int:test_id>/assign/', views.assign_test_view, name='assign_test'),
     path('teacher/test/<int:test_id>/delete/', views.delete_test_view, name='delete_test'),
     
     # Student URLs
     path('student/dashboard/', views.student_dashboard_view, name='student_dashboard'),
     path('student/test/<int:test_id>/', views.take_test_view, name='take_test'),
     path('student/test/<int:test_id>/submit/', views.submit_test_view, name='submit_test'),
+    path('student/test/<int:test_id>/admission/', views.admission_status_view, name='admission_status'),
+
+    # Async exam API (see core/async_views.py)
+    path('api/test/<int:test_id>/paper/', async_views.test_paper_api, name='api_test_paper'),
+    path('api/test/<int:test_id>/autosave/', async_views.autosave_answers_api, name='api_autosave_answers'),
+    path('api/test/<int:test_id>/status/', async_views.attempt_status_api, name='api_attempt_status'),
+    path('api/test/<int:test_id>/submit/', async_views.submit_test_api, name='api_submit_test'),
 ]
\ No newline at end of file
@@ -1,18 +1,33 @@
-import pandas as pd # For Excel reading
 import csv
 from django.shortcuts import render, redirect
 from django.contrib.auth import authenticate, login
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.http import HttpResponseForbidden, HttpResponse
-from .models import CustomUser, Test, Subject, StudentResult, Question, Answer
-from .decorators import role_required, redirect_based_on_role
-import openpyxl # type: ignore
-import csv
+from django.db import transaction
+from django.http import HttpResponseBadRequest, HttpResponseForbidden, HttpResponse, JsonResponse
+from .models import CustomUser, Test, TestAssignment, Subject, StudentResult, RegradeAudit
+from .decorators import role_required, redirect_based_on_role, use_primary, use_replica
+from .hashers import make_student_password
+from .question_bank import warn_about_duplicates
+from .question_search import search_questions
+from .regrade import RegradePlan, apply_regrade
+from .admission import admit_student, has_ticket
+from . import metrics, spreadsheets
+from .cohorts import SUMMARY_KINDS, assign_cohorts, group_result_summary
+from .eligibility import ASSIGNMENT_TARGETS, assign_test, eligible_test, eligible_tests, sync_eligibility
+from .archive import export_rows, student_history
+from .authoring import build_test_edit_diff, apply_test_edit_diff, create_questions, parse_new_questions
+from .bulk_results import (
+    clear_results, confirms_preview, preview_clear, preview_reopen, preview_token, reopen_test_for_cohort,
+)
+from .snapshots import (
+    current_test_snapshot, graded_snapshot, publish_test_snapshot, remember_served_snapshot, served_snapshot_version,
+)
 from django.utils import timezone
 
 
 @role_required(['Teacher'])
+@metrics.IMPORT_SECONDS.time(kind='test')
 def import_test_view(request):
     """
     View for teachers to import tests from an Excel file.
@@ -39,56 +54,52 @@ def import_test_view(request):
             return redirect('import_test')
 
         try:
-            # Create the Test object first
-            test = Test.objects.create(
-                test_name=test_name,
-                subject=subject,
-                created_by=request.user,
-                total_time_minutes=int(total_time),
-                status='Draft' # Imported tests are initially in Draft
-            )
-
-            df = pd.read_excel(excel_file)
+            df = spreadsheets.read_excel(excel_file)
 
             # Expected columns: 'Question Text', 'Question Type', 'Answer 1 Text', 'Answer 1 Correct', ...
             # I will assume a structure where answers are in columns like 'Answer X Text' and 'Answer X Correct'
             
+            questions = []
             for index, row in df.iterrows():
                 question_text = row.get("Question Text (Only 'MCQ' supported)")
-                question_type = row.get('Question Type', 'MCQ').upper() # Default to MCQ, but will enforce MCQ below
 
                 if not question_text:
                     messages.warning(request, f'Skipping row {index + 2} due to missing question text.')
                     continue
-                
-                # Ensure only MCQ questions are imported (even if Excel specified otherwise)
-                question = Question.objects.create(
-                    test=test,
-                    question_text=question_text,
-                    question_type='MCQ', # Always 'MCQ' as per requirement
-                    points_value=int(default_points_value) # Use the default points value from the form
-                )
 
                 # Process answers (assuming up to 6 answers per question)
+                answers = []
                 for i in range(1, 7): # Check for Answer 1 to Answer 6
                     answer_text = row.get(f'Answer {i} Text')
                     is_correct = row.get(f'Answer {i} Correct', False) # Default to False
 
                     if answer_text:
-                        Answer.objects.create(
-                            question=question,
-                            answer_text=answer_text,
-                            is_correct=bool(is_correct) # Ensure boolean
-                        )
+                        answers.append((answer_text, bool(is_correct))) # Ensure boolean
+
+                # Only MCQ questions are imported (even if Excel specified otherwise)
+                questions.append((question_text, answers))
+
+            # Create the test and all of its questions in one transaction, so a failure leaves nothing behind
+            with transaction.atomic():
+                test = Test.objects.create(
+                    test_name=test_name,
+                    subject=subject,
+                    created_by=request.user,
+                    total_time_minutes=int(total_time),
+                    status='Draft' # Imported tests are initially in Draft
+                )
+                content_hashes = create_questions(test, questions, int(default_points_value)) # Use the default points value from the form
+            metrics.IMPORTS.inc(kind='test', outcome='success')
+            metrics.IMPORT_ROWS.inc(len(questions), kind='test')
+
+            warn_about_duplicates(request, content_hashes, exclude_test=test)
             
             messages.success(request, f'Test "{test_name}" imported successfully with {df.shape[0]} questions!')
             return redirect('teacher_dashboard')
 
         except Exception as e:
+            metrics.IMPORTS.inc(kind='test', outcome='failure')
             messages.error(request, f'Error importing test: {e}')
-            # If test was created but then an error occurred with questions, delete the test
-            if 'test' in locals() and test.questions.count() == 0:
-                test.delete()
             return redirect('import_test')
 
     # For GET request, display the form
@@ -108,7 +119,9 @@ def login_view(request):
         username = request.POST.get('username')
         password = request.POST.get('password')
         
-        user = authenticate(request, username=username, password=password)
+        with metrics.LOGIN_SECONDS.time():
+            user = authenticate(request, username=username, password=password)
+        metrics.LOGINS.inc(outcome='failure' if user is None else 'success')
         
         if user is not None:
             login(request, user)
@@ -154,6 +167,7 @@ def dashboard_view(request):
 
 
 @role_required(['Admin', 'Teacher'])
+@use_replica
 def admin_dashboard_view(request):
     """
     Admin dashboard view - accessible by Admin and Teacher (for admin-like functions)
@@ -164,8 +178,8 @@ def admin_dashboard_view(request):
     total_subjects = Subject.objects.count()
     total_results = StudentResult.objects.count()
     
-    # Get all student results
-    student_results = StudentResult.objects.all()
+    # Get all student results, with the student and test each row shows
+    student_results = StudentResult.objects.select_related('student', 'test')
     
     context = {
         'total_users': total_users,
@@ -179,13 +193,15 @@ def admin_dashboard_view(request):
 
 
 @role_required(['Admin', 'Teacher'])
+@use_replica
+@metrics.EXPORT_SECONDS.time(format='xlsx')
 def export_student_results_xls(request):
     """
     Export all student results to an Excel file.
     """
-    results = StudentResult.objects.all()
+    results = export_rows(include_archived=request.GET.get('include_archived') == '1')
     
-    wb = openpyxl.Workbook()
+    wb = spreadsheets.new_workbook()
     ws = wb.active
     ws.title = "Student Results"
     
@@ -195,13 +211,14 @@ def export_student_results_xls(request):
     
     # Add data rows
     for result in results:
+        username, test_name, score_achieved, total_score, time_taken, completion_date = result
         ws.append([
-            result.student.username,
-            result.test.test_name,
-            result.score_achieved,
-            result.total_score,
-            result.time_taken,
-            result.completion_date.strftime('%Y-%m-%d %H:%M:%S')
+            username,
+            test_name,
+            score_achieved,
+            total_score,
+            time_taken,
+            completion_date.strftime('%Y-%m-%d %H:%M:%S') if completion_date else ''
         ])
         
     response = HttpResponse(
@@ -209,16 +226,19 @@ def export_student_results_xls(request):
     )
     response['Content-Disposition'] = 'attachment; filename=student_results.xlsx'
     wb.save(response)
+    metrics.EXPORTS.inc(format='xlsx')
     
     return response
 
 
 @role_required(['Admin', 'Teacher'])
+@use_replica
+@metrics.EXPORT_SECONDS.time(format='csv')
 def export_student_results_csv(request):
     """
     Export all student results to a CSV file.
     """
-    results = StudentResult.objects.all()
+    results = export_rows(include_archived=request.GET.get('include_archived') == '1')
     
     response = HttpResponse(content_type='text/csv')
     response['Content-Disposition'] = 'attachment; filename=student_results.csv'
@@ -229,14 +249,16 @@ def export_student_results_csv(request):
     
     # Add data rows
     for result in results:
+        username, test_name, score_achieved, total_score, time_taken, completion_date = result
         writer.writerow([
-            result.student.username,
-            result.test.test_name,
-            result.score_achieved,
-            result.total_score,
-            result.time_taken,
-            result.completion_date.strftime('%Y-%m-%d %H:%M:%S')
+            username,
+            test_name,
+            score_achieved,
+            total_score,
+            time_taken,
+            completion_date.strftime('%Y-%m-%d %H:%M:%S') if completion_date else ''
         ])
+    metrics.EXPORTS.inc(format='csv')
         
     return response
 
@@ -247,7 +269,7 @@ def teacher_dashboard_view(request):
     Teacher dashboard view
     """
     # Get tests created by this teacher
-    teacher_tests = Test.objects.filter(created_by=request.user)
+    teacher_tests = Test.objects.filter(created_by=request.user).select_related('subject')
     
     # Get subjects created by this teacher
     teacher_subjects = Subject.objects.filter(created_by=request.user)
@@ -265,15 +287,17 @@ def student_dashboard_view(request):
     """
     Student dashboard view
     """
-    # Get available subjects and tests
-    available_tests = Test.objects.filter(status='Published')
+    # Published tests open to everyone or assigned to the student's cohorts (see core/eligibility.py)
+    available_tests = eligible_tests(request.user)
     
-    # Get student's results
-    student_results = StudentResult.objects.filter(student=request.user)
+    # Get student's results; older attempts live in the archive and are shown on request
+    include_archived = request.GET.get('include_archived') == '1'
+    student_results = student_history(request.user, include_archived=include_archived)
     
     context = {
         'available_tests': available_tests,
         'student_results': student_results,
+        'include_archived': include_archived,
         'user_role': request.user.role
     }
     return render(request, 'core/student_dashboard.html', context)
@@ -301,41 +325,23 @@ def create_test_view(request):
         # Get the default points value for all questions
         default_points_value = int(request.POST.get('default_points_value', 1))
 
-        # Create the test
-        test = Test.objects.create(
-            test_name=test_name,
-            subject=subject,
-            created_by=request.user,
-            total_time_minutes=int(total_time),
-            status=status
-        )
-        
-        # Process questions and answers
-        question_texts = request.POST.getlist('question_text')
-        
-        for i, question_text in enumerate(question_texts):
-            if question_text.strip():  # Only create if question text is not empty
-                from .models import Question, Answer # DIAGNOSTIC IMPORT
-                
-                question = Question.objects.create(
-                    test=test,
-                    question_text=question_text,
-                    question_type='MCQ', # Always MCQ as per requirement
-                    points_value=default_points_value # Use the default points value
-                )
-                
-                # Process answers for this question
-                answer_texts = request.POST.getlist(f'question_{i}_answer_text')
-                is_correct_list = request.POST.getlist(f'question_{i}_is_correct')
-                
-                for j, answer_text in enumerate(answer_texts):
-                    if answer_text.strip():  # Only create if answer text is not empty
-                        is_correct = str(j) in is_correct_list  # Check if this answer is marked as correct
-                        Answer.objects.create(
-                            question=question,
-                            answer_text=answer_text,
-                            is_correct=is_correct
-                        )
+        # Build all questions and answers in memory, then persist the whole test in one transaction
+        questions = parse_new_questions(request.POST)
+
+        with transaction.atomic():
+            test = Test.objects.create(
+                test_name=test_name,
+                subject=subject,
+                created_by=request.user,
+                total_time_minutes=int(total_time),
+                status=status
+            )
+            content_hashes = create_questions(test, questions, default_points_value)
+
+        if test.status == 'Published':
+            publish_test_snapshot(test)
+
+        warn_about_duplicates(request, content_hashes, exclude_test=test)
         
         messages.success(request, 'Test created successfully!')
         return redirect('teacher_dashboard')
@@ -349,31 +355,80 @@ def create_test_view(request):
     return render(request, 'core/create_test.html', context)
 
 
+@role_required(['Admin', 'Teacher'])
+def search_questions_view(request):
+    """
+    Ranked full-text search over the question bank, as JSON, so teachers can reuse questions before writing new ones.
+    GET parameters: q, and optionally subject (id), teacher (id, or "me") and limit.
+    """
+    def optional_id(name):
+        value = request.GET.get(name, '')
+        if value == 'me':
+            return request.user.id
+        return int(value) if value.isdigit() else None
+
+    limit = request.GET.get('limit', '')
+    questions = search_questions(
+        request.GET.get('q', ''),
+        subject_id=optional_id('subject'),
+        teacher_id=optional_id('teacher'),
+        limit=int(limit) if limit.isdigit() else 20,
+    )
+    return JsonResponse({'results': [
+        {
+            'id': question.id,
+            'question_text': question.question_text,
+            'points_value': question.points_value,
+            'test': question.test.test_name,
+            'subject': question.test.subject.name,
+            'teacher': question.test.created_by.username,
+            'answers': [
+                {'answer_text': answer.answer_text, 'is_correct': answer.is_correct} for answer in question.answers.all()
+            ],
+        }
+        for question in questions
+    ]})
+
+
 @role_required(['Student'])
+@metrics.TAKE_TEST_SECONDS.time()
 def take_test_view(request, test_id):
     """
     View for students to take a test
     """
-    try:
-        test = Test.objects.get(id=test_id, status='Published')  # Only published tests
-    except Test.DoesNotExist:
+    # One indexed lookup: is the test published and open to this student, and may they start it
+    # (no completed attempt, or a pending retake)?
+    eligibility = eligible_test(request.user, test_id)
+    if eligibility is None:
+        metrics.TAKE_TEST_REQUESTS.inc(outcome='refused')
         messages.error(request, 'Test does not exist or is not available.')
         return redirect('student_dashboard')
+    test = eligibility.test
 
-    # Check if the student has already completed this test or has a pending retake
-    pending_results = StudentResult.objects.filter(student=request.user, test=test, status='Pending')
-    completed_results = StudentResult.objects.filter(student=request.user, test=test, status='Completed')
+    # Students are served the frozen snapshot, never the live question rows
+    published = current_test_snapshot(test)
 
-    if completed_results.exists() and not pending_results.exists():
-        messages.error(request, f"You have already completed the test for {test.subject.name} and no retake attempt is currently available.")
+    if not eligibility.can_start:
+        metrics.TAKE_TEST_REQUESTS.inc(outcome='refused')
+        messages.error(request, f"You have already completed the test for {published.test['subject_name']} and no retake attempt is currently available.")
         return redirect('student_dashboard')
     
     # If a pending result exists, or if no results exist (first attempt), proceed.
+
+    # When the whole cohort opens the test at once, students beyond the admission rate wait in a FIFO queue
+    admitted, position = admit_student(request, test.id)
+    if not admitted:
+        metrics.TAKE_TEST_REQUESTS.inc(outcome='queued')
+        context = {
+            'test': published.test,
+            'position': position,
+            'user_role': request.user.role
+        }
+        return render(request, 'core/admission_queue.html', context)
     
     # Get questions for the test
-    from django.db.models import Q
     import random
-    all_questions = list(test.questions.all())
+    all_questions = list(published.questions)
     
     # Randomly select up to 25 questions
     if len(all_questions) > 25:
@@ -382,16 +437,37 @@ def take_test_view(request, test_id):
         questions = all_questions
     
     random.shuffle(questions)  # Randomize the selected questions
+    # Submissions are graded against this version, whatever the form posts back
+    remember_served_snapshot(request.session, published)
+    metrics.TAKE_TEST_REQUESTS.inc(outcome='served')
+    metrics.attempt_started(request, test.id)
     
     context = {
-        'test': test,
+        'test': published.test,
         'questions': questions,
+        'snapshot_version': published.version,
         'user_role': request.user.role
     }
     return render(request, 'core/take_test.html', context)
 
 
 @role_required(['Student'])
+def admission_status_view(request, test_id):
+    """
+    Cheap endpoint polled by the admission queue page: the student's queue position, without touching the database
+    once they hold a ticket. Tickets are only issued to students eligible to start the test, as in take_test_view.
+    """
+    if not has_ticket(request, test_id):
+        eligibility = eligible_test(request.user, test_id)
+        if eligibility is None or not eligibility.can_start:
+            return JsonResponse({'error': 'Test does not exist or is not available.'}, status=404)
+    admitted, position = admit_student(request, test_id)
+    return JsonResponse({'admitted': admitted, 'position': position})
+
+
+@role_required(['Student'])
+@use_primary
+@metrics.SUBMIT_SECONDS.time()
 def submit_test_view(request, test_id):
     """
     View to handle test submission and scoring
@@ -399,58 +475,77 @@ def submit_test_view(request, test_id):
     if request.method != 'POST':
         return redirect('student_dashboard')
     
-    try:
-        test = Test.objects.get(id=test_id, status='Published')
-    except Test.DoesNotExist:
+    eligibility = eligible_test(request.user, test_id)
+    if eligibility is None:
         messages.error(request, 'Test does not exist or is not available.')
         return redirect('student_dashboard')
-    
+    test = eligibility.test
+
+    # Grade against the snapshot version the student was served, even if the test was edited since.
+    # The version comes from the server (session, else the pending attempt); a paper posting another one is stale.
+    version = served_snapshot_version(request.session, test.id)
+    if version is None:
+        version = StudentResult.objects.filter(
+            student=request.user, test=test, status='Pending'
+        ).values_list('snapshot_version', flat=True).first()
+    published = graded_snapshot(test, version)
+    if request.POST.get('snapshot_version', str(published.version)) != str(published.version):
+        messages.error(request, 'This test paper is out of date. Please open the test again.')
+        return redirect('student_dashboard')
+
     # Calculate score
-    score = 0
-    total_score = 0
-    
-    for question in test.questions.all():
-        total_score += question.points_value
-        selected_answer_id = request.POST.get(f'question_{question.id}')
-        
-        if selected_answer_id:
-            try:
-                selected_answer = Answer.objects.get(id=selected_answer_id, question=question)
-                if selected_answer.is_correct:
-                    score += question.points_value
-            except Answer.DoesNotExist:
-                pass  # Invalid answer ID, skip
+    responses = {
+        question_id: request.POST.get(f'question_{question_id}')
+        for question_id in published.answer_key
+    }
+    with metrics.GRADING_SECONDS.time():
+        score, total_score = published.grade(responses)
+    # Stored with the result so it can be re-graded later
+    answered = {question_id: answer for question_id, answer in responses.items() if answer}
     
     # Save or update the result
-    from django.utils import timezone
     completion_time = request.POST.get('time_taken', 0)  # Time in seconds
     
-    # Try to find an existing pending result for this student and test
-    student_result = StudentResult.objects.filter(
-        student=request.user, 
-        test=test, 
-        status='Pending'
-    ).first()
     total_score = 25
-    if student_result:
-        # Update the existing pending result
-        student_result.score_achieved = score
-        student_result.total_score = total_score
-        student_result.time_taken = int(completion_time)
-        student_result.completion_date = timezone.now()
-        student_result.status = 'Completed'
-        student_result.save()
-    else:
-        # Create a new result if no pending one exists (e.g., first attempt)
-        StudentResult.objects.create(
-            student=request.user,
-            test=test,
-            score_achieved=score,
-            total_score=total_score,
-            time_taken=int(completion_time),
-            completion_date=timezone.now(),
-            status='Completed'
-        )
+
+    # Keep the write transaction short: grading is done above, only the result row is touched here.
+    # In high-concurrency SQLite mode this is a BEGIN IMMEDIATE transaction.
+    with transaction.atomic():
+        # Try to find an existing pending result for this student and test
+        student_result = StudentResult.objects.filter(
+            student=request.user, 
+            test=test, 
+            status='Pending'
+        ).first()
+        if student_result:
+            # Update the existing pending result
+            student_result.score_achieved = score
+            student_result.total_score = total_score
+            student_result.time_taken = int(completion_time)
+            student_result.completion_date = timezone.now()
+            student_result.status = 'Completed'
+            student_result.responses = dict(student_result.responses, **answered)
+            student_result.snapshot_version = published.version
+            student_result.save()
+        elif not eligibility.can_start:
+            # Completed already, and no retake is pending
+            messages.error(request, 'You have already completed this test.')
+            return redirect('student_dashboard')
+        else:
+            # Create a new result if no pending one exists (e.g., first attempt)
+            StudentResult.objects.create(
+                student=request.user,
+                test=test,
+                score_achieved=score,
+                total_score=total_score,
+                time_taken=int(completion_time),
+                completion_date=timezone.now(),
+                status='Completed',
+                responses=answered,
+                snapshot_version=published.version,
+            )
+    metrics.SUBMISSIONS.inc()
+    metrics.attempt_finished(request, test.id)
     
     messages.success(request, f'Test submitted successfully! Your score: {score}/{total_score}')
     return redirect('student_dashboard')
@@ -485,133 +580,22 @@ def edit_test_view(request, test_id):
             messages.error(request, 'Invalid subject selected.')
             return redirect('edit_test', test_id=test.id)
 
-        test.save()
-
         # Get the default points value for all questions
         default_points_value = int(request.POST.get('default_points_value', 1))
 
-        # Update questions and answers
-        # Safely convert question_ids to integers, ignoring any non-integer or empty strings
-        parsed_question_ids = []
-        for q_id_str in request.POST.getlist('question_id'):
-            if q_id_str: # Ensure it's not an empty string before attempting conversion
-                try:
-                    parsed_question_ids.append(int(q_id_str))
-                except ValueError:
-                    messages.warning(request, f"Invalid question ID encountered and skipped: '{q_id_str}'.")
-        
-        question_texts = request.POST.getlist('question_text')
-        
-        # Delete questions that are not in the form
-        # Ensure that parsed_question_ids is not empty to avoid issues with exclude if no valid IDs are present
-        if parsed_question_ids:
-            test.questions.exclude(id__in=parsed_question_ids).delete()
-        else:
-            # If no question IDs are submitted, it means all existing questions should be deleted
-            # This handles cases where all questions might be removed from the frontend
-            if not question_texts: # Only delete all if no new question texts are provided either
-                test.questions.all().delete()
-
-        # Before iterating, ensure question_ids used for indexing matches the parsed_question_ids length
-        # This part of the code needs to be careful because question_ids and question_texts are parallel lists
-        # We need to map `question_texts` to `parsed_question_ids` based on their original order from POST
-        # If a question_id was invalid, it was skipped, so the index in question_texts won't directly map.
-        # A more robust approach might be to associate question_id with question_text in the loop.
-        
-        # Let's re-think the loop for updating/creating questions.
-        # We need to iterate through the submitted question_texts and try to match them with existing questions
-        # or create new ones.
-        
-        existing_question_ids = set(test.questions.values_list('id', flat=True))
-        
-        for i, question_text in enumerate(question_texts):
-            # Check if there's a corresponding question_id from the form data
-            # Use request.POST.getlist('question_id') directly here to match indices with question_texts
-            # and then validate/parse the ID within the loop.
-            submitted_question_id_str = request.POST.getlist('question_id')[i] if i < len(request.POST.getlist('question_id')) else ''
-            
-            question_obj = None
-            if submitted_question_id_str:
-                try:
-                    submitted_question_id = int(submitted_question_id_str)
-                    if submitted_question_id in existing_question_ids:
-                        question_obj = test.questions.get(id=submitted_question_id)
-                except (ValueError, Question.DoesNotExist):
-                    messages.warning(request, f"Submitted question ID '{submitted_question_id_str}' was invalid or did not exist. Treating as new question.")
-            
-            if question_text.strip(): # Only process if question text is not empty
-                if question_obj:
-                    # Update existing question
-                    question_obj.question_text = question_text
-                    question_obj.question_type = 'MCQ' # Enforce MCQ
-                    question_obj.points_value = default_points_value # Use the default points value
-                    question_obj.save()
-                else:
-                    # Create new question
-                    question_obj = Question.objects.create(
-                        test=test,
-                        question_text=question_text,
-                        question_type='MCQ', # Enforce MCQ
-                        points_value=default_points_value # Use the default points value
-                    )
-
-                # Update answers for the question
-                # This part assumes answers are submitted per question based on their index.
-                # It's important that the frontend sends answer data correctly aligned with question data.
-                answer_ids_for_question = request.POST.getlist(f'question_{i}_answer_id')
-                answer_texts_for_question = request.POST.getlist(f'question_{i}_answer_text')
-                correct_answers_for_question = request.POST.getlist(f'question_{i}_is_correct')
-                
-                # Filter out invalid answer IDs for this specific question
-                parsed_answer_ids = []
-                for ans_id_str in answer_ids_for_question:
-                    if ans_id_str:
-                        try:
-                            parsed_answer_ids.append(int(ans_id_str))
-                        except ValueError:
-                            messages.warning(request, f"Invalid answer ID encountered and skipped: '{ans_id_str}'.")
-
-                # Delete answers that are not in the form for this question
-                if parsed_answer_ids:
-                    question_obj.answers.exclude(id__in=parsed_answer_ids).delete()
-                else:
-                    # If no answer IDs are submitted for this question, delete all existing answers for it
-                    if not answer_texts_for_question:
-                        question_obj.answers.all().delete()
-
-                for j, answer_text in enumerate(answer_texts_for_question):
-                    submitted_answer_id_str = answer_ids_for_question[j] if j < len(answer_ids_for_question) else ''
-                    is_correct = str(j) in correct_answers_for_question
-
-                    answer_obj = None
-                    if submitted_answer_id_str:
-                        try:
-                            submitted_answer_id = int(submitted_answer_id_str)
-                            answer_obj = question_obj.answers.get(id=submitted_answer_id)
-                        except (ValueError, Answer.DoesNotExist):
-                            messages.warning(request, f"Submitted answer ID '{submitted_answer_id_str}' was invalid or did not exist. Treating as new answer.")
-
-                    if answer_text.strip(): # Only process if answer text is not empty
-                        if answer_obj:
-                            # Update existing answer
-                            answer_obj.answer_text = answer_text
-                            answer_obj.is_correct = is_correct
-                            answer_obj.save()
-                        else:
-                            # Create new answer
-                            Answer.objects.create(
-                                question=question_obj,
-                                answer_text=answer_text,
-                                is_correct=is_correct
-                            )
-            else:
-                # If question_text is empty, and it was an existing question, ensure it's deleted.
-                # This case should ideally be handled by the initial test.questions.exclude logic
-                # but adding a safeguard here for a submitted_question_id that might not have a text.
-                if question_obj and question_obj.id in existing_question_ids:
-                    question_obj.delete()
+        # Parse the submission once into created/updated/deleted questions and answers,
+        # then apply it with bulk writes so the query count does not grow with test size
+        diff = build_test_edit_diff(test, request.POST, default_points_value)
+        for warning in diff.warnings:
+            messages.warning(request, warning)
 
+        with transaction.atomic():
+            test.save()
+            apply_test_edit_diff(diff)
 
+        # Students mid-exam keep the version they were served; new papers get the edited one
+        if test.status == 'Published':
+            publish_test_snapshot(test)
 
         messages.success(request, 'Test updated successfully!')
         return redirect('teacher_dashboard')
@@ -620,12 +604,80 @@ def edit_test_view(request, test_id):
     subjects = Subject.objects.filter(created_by=request.user)
     context = {
         'test': test,
+        'questions': list(test.questions.prefetch_related('answers')),
         'subjects': subjects,
         'user_role': request.user.role
     }
     return render(request, 'core/edit_test.html', context)
 
 
+@role_required(['Teacher'])
+@use_primary
+def regrade_test_view(request, test_id):
+    """
+    Re-grade all submitted attempts of a test after its answer key was corrected.
+    GET previews how many scores change; the POST applies it and records a RegradeAudit.
+    """
+    try:
+        test = Test.objects.get(id=test_id, created_by=request.user)
+    except Test.DoesNotExist:
+        messages.error(request, 'Test not found or you do not have permission to re-grade it.')
+        return redirect('teacher_dashboard')
+
+    plan = RegradePlan(test)
+    if request.method == 'POST':
+        audit = apply_regrade(plan, performed_by=request.user)
+        messages.success(request, f"Re-graded '{test.test_name}': {audit.attempts_changed} of {audit.attempts_checked} score(s) changed.")
+        return redirect('teacher_dashboard')
+
+    context = {
+        'test': test,
+        'plan': plan,
+        'audits': RegradeAudit.objects.filter(test=test).select_related('performed_by').order_by('-created_at')[:10],
+        'user_role': request.user.role
+    }
+    return render(request, 'core/regrade_test.html', context)
+
+
+@role_required(['Teacher'])
+@use_primary
+def assign_test_view(request, test_id):
+    """
+    Restrict a test to student groups, courses, directions or single students.
+    A test without assignments is open to every student.
+    """
+    try:
+        test = Test.objects.get(id=test_id, created_by=request.user)
+    except Test.DoesNotExist:
+        messages.error(request, 'Test not found or you do not have permission to assign it.')
+        return redirect('teacher_dashboard')
+
+    if request.method == 'POST':
+        if request.POST.get('action') == 'remove':
+            # Deleted one by one so the post_delete receiver resyncs eligibility
+            for assignment in TestAssignment.objects.filter(test=test, id=request.POST.get('assignment')):
+                assignment.delete()
+                messages.success(request, 'Assignment removed.')
+        elif request.POST.get('kind') in ASSIGNMENT_TARGETS:
+            try:
+                assign_test(test, request.POST['kind'], request.POST.get('name', ''))
+                messages.success(request, 'Assignment added.')
+            except ValueError as e:
+                messages.error(request, str(e))
+        return redirect('assign_test', test_id=test.id)
+
+    context = {
+        'test': test,
+        'assignments': TestAssignment.objects.filter(test=test).select_related(
+            'student_group', 'course', 'direction', 'student'
+        ).order_by('created_at'),
+        'kinds': ASSIGNMENT_TARGETS,
+        'eligible_count': test.eligible_students.count(),
+        'user_role': request.user.role
+    }
+    return render(request, 'core/assign_test.html', context)
+
+
 @role_required(['Teacher'])
 def delete_test_view(request, test_id):
     """
@@ -651,12 +703,13 @@ def delete_test_view(request, test_id):
 
 
 @role_required(['Admin'])
+@use_primary
 def delete_student_result_view(request, result_id):
     """
     View to delete a student result, allowing them to retake the test.
     """
     try:
-        result = StudentResult.objects.get(id=result_id)
+        result = StudentResult.objects.select_related('student', 'test').get(id=result_id)
     except StudentResult.DoesNotExist:
         messages.error(request, 'Student result not found.')
         return redirect('admindashboard')
@@ -675,13 +728,14 @@ def delete_student_result_view(request, result_id):
 
 
 @role_required(['Admin'])
+@use_primary
 def retake_test_view(request, result_id):
     """
     View to initiate a test retake by creating a new pending student result.
     The previous result is preserved.
     """
     try:
-        original_result = StudentResult.objects.get(id=result_id)
+        original_result = StudentResult.objects.select_related('student', 'test').get(id=result_id)
     except StudentResult.DoesNotExist:
         messages.error(request, 'Original student result not found.')
         return redirect('admindashboard')
@@ -700,12 +754,100 @@ def retake_test_view(request, result_id):
     return redirect('admindashboard')
 
 
+@role_required(['Admin'])
+@use_primary
+def bulk_results_view(request):
+    """
+    View for admins to reopen a test or clear results for a whole group, course or direction.
+    The first POST previews how many students or results are affected; Confirm applies exactly that preview,
+    carried in a signed token, and previews again if the form was changed in between.
+    """
+    params = request.POST if request.method == 'POST' else request.GET
+    action = params.get('action', 'reopen')
+    filters = {
+        'group': params.get('group', '').strip(),
+        'course': params.get('course', '').strip(),
+        'direction': params.get('direction', '').strip(),
+    }
+    status = params.get('status', '')
+    test = None
+    if params.get('test'):
+        try:
+            test = Test.objects.filter(id=int(params['test'])).first()
+        except ValueError:
+            test = None
+        if test is None:
+            return HttpResponseBadRequest('Unknown test.')
+    operation = dict(filters, action=action, test=test and test.id, status=status)
+    confirmed = 'confirm' in request.POST and confirms_preview(request.POST.get('preview_token', ''), operation)
+    if 'confirm' in request.POST and not confirmed:
+        messages.error(request, 'The form changed since the preview, or the preview expired. Check the new preview before confirming.')
+
+    preview_count = None
+    if request.method == 'POST':
+        if action == 'reopen' and test is None:
+            messages.error(request, 'Select the test to reopen.')
+        elif action == 'reopen':
+            if confirmed:
+                created = reopen_test_for_cohort(test, **filters)
+                messages.success(request, f"Reopened '{test.test_name}' for {created} student(s).")
+                return redirect('admindashboard')
+            preview_count = preview_reopen(test, **filters)
+        elif action == 'clear':
+            try:
+                if confirmed:
+                    deleted = clear_results(test, status, **filters)
+                    messages.success(request, f'Deleted {deleted} result(s).')
+                    return redirect('admindashboard')
+                preview_count = preview_clear(test, status, **filters)
+            except ValueError:
+                messages.error(request, 'Choose a test, status or cohort before clearing results.')
+        else:
+            messages.error(request, 'Unknown action.')
+
+    context = {
+        'tests': Test.objects.only('id', 'test_name').order_by('test_name'),
+        'selected_test': test,
+        'action': action,
+        'status': status,
+        'filters': filters,
+        'preview_count': preview_count,
+        'preview_token': None if preview_count is None else preview_token(operation),
+        'user_role': request.user.role
+    }
+    return render(request, 'core/bulk_results.html', context)
+
+
+@role_required(['Admin', 'Teacher'])
+@use_replica
+def group_results_view(request):
+    """
+    Result aggregates per student group, course or direction, optionally for one test, from one grouped query.
+    """
+    kind = request.GET.get('by', 'group')
+    if kind not in SUMMARY_KINDS:
+        kind = 'group'
+    test = None
+    if request.GET.get('test', '').isdigit():
+        test = Test.objects.filter(id=request.GET['test']).first()
+
+    context = {
+        'rows': group_result_summary(kind, test),
+        'kind': kind,
+        'kinds': list(SUMMARY_KINDS),
+        'tests': Test.objects.only('id', 'test_name').order_by('test_name'),
+        'selected_test': test,
+        'user_role': request.user.role
+    }
+    return render(request, 'core/group_results.html', context)
+
+
 @role_required(['Teacher'])
 def download_sample_excel(request):
     """
     Generates and serves a sample Excel file for test import.
     """
-    wb = openpyxl.Workbook()
+    wb = spreadsheets.new_workbook()
     ws = wb.active
     ws.title = "Questions and Answers"
 
@@ -738,6 +880,7 @@ def download_sample_excel(request):
 
 
 @role_required(['Admin'])
+@metrics.IMPORT_SECONDS.time(kind='students')
 def import_students_view(request):
     """
     View for admins to import students from an Excel file.
@@ -754,41 +897,55 @@ def import_students_view(request):
             return redirect('import_students')
 
         try:
-            df = pd.read_excel(excel_file)
+            df = spreadsheets.read_excel(excel_file)
             
             required_columns = ['student_id', 'full_name', 'passport_series', 'course', 'group', 'direction']
             if not all(col in df.columns for col in required_columns):
                 messages.error(request, f'Excel file must contain the following columns: {", ".join(required_columns)}')
                 return redirect('import_students')
 
+            # One query for the usernames already taken and one batched insert, however long the file is
+            existing = set(CustomUser.objects.filter(
+                username__in=[str(student_id) for student_id in df['student_id']]
+            ).values_list('username', flat=True))
+            new_students = []
             for index, row in df.iterrows():
-                student_id = row['student_id']
+                student_id = str(row['student_id'])
                 full_name = row['full_name']
                 passport_series = row['passport_series']
                 course = row['course']
                 group = row['group']
                 direction = row['direction']
 
-                if CustomUser.objects.filter(username=student_id).exists():
+                if student_id in existing:
                     messages.warning(request, f'Student with ID {student_id} already exists. Skipping.')
                     continue
+                existing.add(student_id)
 
-                user = CustomUser.objects.create_user(
+                # Hashed with the student policy: cheaper to import and to verify at exam start
+                new_students.append(CustomUser(
                     username=student_id,
-                    password=str(passport_series),
+                    password=make_student_password(str(passport_series)),
                     role='Student',
                     student_id=student_id,
                     student_full_name=full_name,
                     course=course,
                     student_groups=group,
                     student_direction=direction
-                )
-                user.save()
+                ))
+            # Groups, courses and directions resolved with one lookup each, new ones created in bulk
+            assign_cohorts(new_students)
+            CustomUser.objects.bulk_create(new_students, batch_size=500)
+            # bulk_create sends no post_save: open the published tests to the new students here
+            sync_eligibility(student_ids=[student.id for student in new_students])
+            metrics.IMPORTS.inc(kind='students', outcome='success')
+            metrics.IMPORT_ROWS.inc(len(new_students), kind='students')
 
             messages.success(request, f'Successfully imported {len(df)} students.')
             return redirect('admindashboard')
 
         except Exception as e:
+            metrics.IMPORTS.inc(kind='students', outcome='failure')
             messages.error(request, f'Error importing students: {e}')
             return redirect('import_students')
 
@@ -800,7 +957,7 @@ def download_sample_student_excel(request):
     """
     Generates and serves a sample Excel file for student import.
     """
-    wb = openpyxl.Workbook()
+    wb = spreadsheets.new_workbook()
     ws = wb.active
     ws.title = "Students"
 
@@ -819,3 +976,11 @@ def download_sample_student_excel(request):
     wb.save(response)
     return response
 
+
+
+@role_required(['Admin'])
+def metrics_view(request):
+    """
+    Exam metrics of all worker processes in the Prometheus text format (see core/metrics.py).
+    """
+    return HttpResponse(metrics.REGISTRY.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
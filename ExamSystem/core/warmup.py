@@ -0,0 +1,37 @@
+import time
+
+from django.conf import settings
+from django.contrib.auth.hashers import check_password, make_password
+from django.db import connections
+from django.template.loader import get_template
+from django.urls import get_resolver
+
+from .hashers import student_password_hasher
+from .models import Test
+from .snapshots import current_test_snapshot
+
+# Pages every examinee requests in the first minute of an exam
+EXAM_START_TEMPLATES = ('core/login.html', 'core/student_dashboard.html', 'core/take_test.html')
+
+
+def warm_up():
+    """
+    Pay the one-off per-process costs before the exam starts instead of on the first logins:
+    URL resolver, templates, password hashers, a database connection and the snapshots of published tests.
+    Returns the seconds spent per step.
+    """
+    timings = {}
+
+    def step(name, func):
+        started = time.perf_counter()
+        func()
+        timings[name] = time.perf_counter() - started
+
+    step('urls', lambda: get_resolver().url_patterns)
+    step('templates', lambda: [get_template(name) for name in EXAM_START_TEMPLATES])
+    step('hashers', lambda: check_password('warm-up', make_password('warm-up', hasher=student_password_hasher())))
+    published = Test.objects.filter(status='Published').order_by('-updated_at')[:settings.TEST_SNAPSHOT_CACHE_SIZE]
+    step('snapshots', lambda: [current_test_snapshot(test) for test in published])
+    # Forked workers must not share the connection opened above
+    connections.close_all()
+    return timings